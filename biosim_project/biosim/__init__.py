@@ -2,3 +2,9 @@
 
 __author__ = 'Kristian Frafjord'
 __email__ = 'krfr@nmbu.no'
+__version__ = '1.1'
+
+# Version of the simulated dynamics and of the stored run state. Bump it
+# whenever a change gives other results for the same run specification, so
+# results cached by biosim.sweep are not reused.
+ENGINE_VERSION = 5
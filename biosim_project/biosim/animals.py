@@ -13,20 +13,30 @@ __email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
 
 class Animal(object):
     """
-    Superclass "Animal" for herbivores and carnivores
+    Superclass "Animal" for herbivores and carnivores.
+    Animals get their id from the island they are placed on, unique within
+    that island (see Island.assign_ids). Animals not on an island have the
+    id None.
     """
 
     params = None
 
-    def __init__(self, weight=None, age=0, coordinates=(1, 1)):
+    def __init__(self, weight=None, age=0, coordinates=(1, 1), rng=np.random,
+                 params=None):
         """
         :param weight: Default None results in gaussian distribution of weight
         :param age: The starting age of animal
         :param coordinates: Starting coordinates of the animal
+        :param rng: Random number generator used to draw the weight
+        :param params: Parameter dictionary of the simulation the animal
+        belongs to. Default None uses the class parameters.
         """
+        if params is not None:
+            self.params = params
+        self.id = None
         if weight is None:
-            self.weight = np.random.normal(self.params["w_birth"],
-                                           self.params["sigma_birth"])
+            self.weight = rng.normal(self.params["w_birth"],
+                                     self.params["sigma_birth"])
         else:
             self.weight = weight
         self.age = age
@@ -35,6 +45,35 @@ class Animal(object):
         self.coordinates = coordinates
         self.has_moved = False
 
+    @classmethod
+    def many(cls, weights, ages, coordinates=(1, 1), params=None,
+             first_id=None):
+        """
+        Makes many animals of the class in one cell at once, without
+        calling the constructor for each.
+
+        :param weights: Sequence of weights
+        :param ages: Sequence of ages, as long as weights
+        :param coordinates: Coordinates of the cell
+        :param params: Parameter dictionary, as for the constructor
+        :param first_id: Optional id of the first animal, the others get
+        consecutive ids. Default None leaves the ids None.
+        :return: List of animals
+        """
+        animals = []
+        for offset, (weight, age) in enumerate(zip(weights, ages)):
+            animal = cls.__new__(cls)
+            if params is not None:
+                animal.params = params
+            animal.id = None if first_id is None else first_id + offset
+            animal.weight = weight
+            animal.age = age
+            animal.update_fitness()
+            animal.coordinates = coordinates
+            animal.has_moved = False
+            animals.append(animal)
+        return animals
+
     def ageing(self):
         """
         Increment age by one per year
@@ -59,21 +98,23 @@ class Animal(object):
                                               (self.weight -
                                                self.params["w_half"]))))
 
-    def death(self):
+    def death(self, rng=np.random):
         """
         Calculates if the animal dies or not based on fitness and set parameters
 
+        :param rng: Random number generator
         :return: True if the animal dies, False otherwise
         """
         probability = self.params["omega"] * (1 - self.fitness)
-        return probability > np.random.random()
+        return probability > rng.random_sample()
 
-    def breeding(self, individuals):
+    def breeding(self, individuals, rng=np.random):
         """
         Calculates if the animal will give birth based on animals present in
         cell, weight of animal and set parameters
 
         :param individuals: number of individuals in cell
+        :param rng: Random number generator
         :return: Returns birth weight if it gives birth or None.
         """
 
@@ -86,9 +127,9 @@ class Animal(object):
             if probability > 1:
                 probability = 1
 
-        if probability > np.random.random():
-            birth_weight = np.random.normal(self.params["w_birth"],
-                                            self.params["sigma_birth"])
+        if probability > rng.random_sample():
+            birth_weight = rng.normal(self.params["w_birth"],
+                                      self.params["sigma_birth"])
             if birth_weight >= self.weight:
                 return None
             elif birth_weight <= 0:
@@ -99,26 +140,28 @@ class Animal(object):
         else:
             return None
 
-    def check_migrate(self):
+    def check_migrate(self, rng=np.random):
         """
         Check if the animal wants to migrate based on set parameters
 
+        :param rng: Random number generator
         :return: True if animal will migrate
         """
-        return self.params["mu"] * self.fitness > np.random.random()
+        return self.params["mu"] * self.fitness > rng.random_sample()
 
-    def migrate(self, _list):
+    def migrate(self, _list, rng=np.random):
         """
         Calculates if the herbivore will migrate and returns either the new
         coordinates or the current coordinates.
 
         :param _list: Nested list of tuples with surrounding positions as first
         element and relative food as second element.
+        :param rng: Random number generator
         :return: New coordinates for the animal if it migrates or the old
         if it does not.
         """
         p = 0
-        random = np.random.random()
+        random = rng.random_sample()
         _sum = 0
         for cell in _list:
             _sum += math.exp(self.params["lambda"] * cell[1])
@@ -129,10 +172,10 @@ class Animal(object):
                 self.coordinates = cell[0]
                 return cell[0]
 
-    @classmethod
-    def set_parameters(cls, new_params):
+    @staticmethod
+    def check_parameters(new_params):
         """
-        Updates parameters. Raises ValueError if values are invalid
+        Raises ValueError if any of the given parameter values are invalid
 
         :param new_params: New set of parameters as dictionary
         """
@@ -149,6 +192,15 @@ class Animal(object):
                     raise ValueError('Given value for "{}" '
                                      'must be: [0 <= {} <= 1]'
                                      .format(parameter, parameter))
+
+    @classmethod
+    def set_parameters(cls, new_params):
+        """
+        Updates parameters. Raises ValueError if values are invalid
+
+        :param new_params: New set of parameters as dictionary
+        """
+        cls.check_parameters(new_params)
         cls.params.update(new_params)
 
 
@@ -163,8 +215,9 @@ class Herbivore(Animal):
               "omega": 0.4, "F": 10.0,
               "DeltaPhiMax": None}
 
-    def __init__(self, weight=None, age=0, coordinates=(1, 1)):
-        Animal.__init__(self, weight, age, coordinates)
+    def __init__(self, weight=None, age=0, coordinates=(1, 1), rng=np.random,
+                 params=None):
+        Animal.__init__(self, weight, age, coordinates, rng, params)
 
     def feeding(self, available_food):
         """
@@ -197,16 +250,20 @@ class Carnivore(Animal):
               "omega": 0.9, "F": 50.0,
               "DeltaPhiMax": 10}
 
-    def __init__(self, weight=None, age=0, coordinates=(1, 1)):
-        Animal.__init__(self, weight, age, coordinates)
+    def __init__(self, weight=None, age=0, coordinates=(1, 1), rng=np.random,
+                 params=None):
+        Animal.__init__(self, weight, age, coordinates, rng, params)
 
-    def feeding(self, herbivores):
+    def feeding(self, herbivores, rng=np.random, kills=None):
         """
         Calculate if the carnivore will feed based on its own fitness and
         the fitness of the herbivore, and gain weight. Removes eaten
         herbivores.
 
         :param herbivores: List of herbivores in cell
+        :param rng: Random number generator
+        :param kills: Optional list, (carnivore, herbivore) is appended to it
+        for each herbivore killed
         :return: Updated list of herbivores in cell after eating
         """
         eaten = 0
@@ -215,8 +272,10 @@ class Carnivore(Animal):
         f = self.params["F"]
         for herbivore in herbivores:
             if (self.fitness - herbivore.fitness) < d_phi_m:
-                if np.random.random() < (self.fitness - herbivore.fitness)\
+                if rng.random_sample() < (self.fitness - herbivore.fitness)\
                         / d_phi_m:
+                    if kills is not None:
+                        kills.append((self, herbivore))
                     if herbivore.weight <= (f - eaten):
                         self.weight += beta * herbivore.weight
                         self.update_fitness()
@@ -0,0 +1,383 @@
+# -*- Utf-8 -*-
+
+import numpy as np
+from biosim.parameters import Parameters
+
+"""
+Batched module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+SPECIES = {"herbivores": "Herbivore", "carnivores": "Carnivore"}
+COLUMNS = (("replica", int), ("cell", int), ("age", int), ("weight", float))
+
+
+def group_starts(groups):
+    """
+    :param groups: Sorted array of group numbers
+    :return: Boolean array, True for the first element of each group
+    """
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    return first
+
+
+def group_ranges(starts, counts):
+    """
+    Concatenates the index ranges [start, start + count).
+
+    :param starts: Array with the first index of each range
+    :param counts: Array with the length of each range
+    :return: Array with all the indices, range by range
+    """
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(np.sum(counts))
+
+
+class BatchedIsland(object):
+    """
+    Class object: BatchedIsland.
+    Simulates many replicas of the same island at once. Every animal of
+    every replica is a row in a few flat arrays (replica, cell, age, weight),
+    and the food is an array with one row per replica, so each phase of a
+    year is one vectorized operation over all replicas. Each replica has its
+    own Parameters instance, read when the BatchedIsland is made.
+        - <var> = BatchedIsland(island_map, replicas=10, seed=1)
+        - <var>.add_population(population)
+        - <var>.one_year()
+
+    The rules are those of Island, with two simplifications in carnivore
+    feeding: a carnivore uses its fitness from the start of its hunt, and
+    tries the herbivores of its cell from the lowest fitness up. All
+    replicas draw from one random number generator, so results do not
+    equal those of Island with the same seed.
+    """
+
+    def __init__(self, island_map, replicas=1, seed=None, parameters=None):
+        """
+        :param island_map: Map of island as string of "biomes"
+        :param replicas: Number of replicas, ignored if parameters are given
+        :param seed: Seed for the random number generator of all replicas
+        :param parameters: Optional list with a Parameters instance for each
+        replica, default is a copy of the class parameters for each
+        """
+        geography = [list(row) for row in
+                     island_map.replace(" ", "").split("\n")]
+        if len(set(len(row) for row in geography)) != 1:
+            raise ValueError('All rows of the map must have the same length!')
+        types = np.array(geography)
+        for letter in np.unique(types):
+            if letter not in "JSDMO":
+                raise ValueError('"{}" is not properly defined! '
+                                 'Use capital letters.'.format(letter))
+        self.shape = types.shape
+        self.num_cells = types.size
+        if parameters is None:
+            parameters = [Parameters() for _ in range(replicas)]
+        self.parameters = list(parameters)
+        self.replicas = len(self.parameters)
+        self.rng = np.random.RandomState(seed)
+        self.year = 0
+
+        passable = ~np.in1d(types.ravel(), ["M", "O"])
+        self.neighbours = np.full((self.num_cells, 4), -1, dtype=int)
+        self.num_neighbours = np.zeros(self.num_cells, dtype=int)
+        for cell in range(self.num_cells):
+            y, x = divmod(cell, self.shape[1])
+            for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                if 0 <= y + dy < self.shape[0] and 0 <= x + dx < self.shape[1]:
+                    neighbour = (y + dy) * self.shape[1] + x + dx
+                    if passable[neighbour]:
+                        self.neighbours[cell, self.num_neighbours[cell]] = \
+                            neighbour
+                        self.num_neighbours[cell] += 1
+
+        self.params = {}
+        for species, name in SPECIES.items():
+            names = self.parameters[0].animal_params[name]
+            self.params[species] = {
+                key: np.array([p.animal_params[name][key]
+                               for p in self.parameters], dtype=float)
+                for key in names}
+        jungle = (types == "J").ravel()
+        savannah = (types == "S").ravel()
+        landscape = [p.landscape_params for p in self.parameters]
+        self.fmax = (np.outer([p["J"]["fmax"] for p in landscape], jungle) +
+                     np.outer([p["S"]["fmax"] for p in landscape], savannah)
+                     ).astype(float)
+        self.alpha = (np.outer(np.ones(self.replicas), jungle) +
+                      np.outer([p["S"]["alpha"] for p in landscape], savannah))
+        self.food = self.fmax.copy()
+        self.animals = {species: {column: np.zeros(0, dtype=dtype)
+                                  for column, dtype in COLUMNS}
+                        for species in SPECIES}
+
+    def add_population(self, population, replicas=None):
+        """
+        Adds given population to cells, see BioSim.add_population.
+
+        :param population: list of populations
+        :param replicas: List of replicas to add the population to, default
+        is all replicas
+        """
+        if replicas is None:
+            replicas = range(self.replicas)
+        new = {species: [] for species in SPECIES}
+        for species in population:
+            y, x = [n - 1 for n in species['loc']]
+            if not (0 <= y < self.shape[0] and 0 <= x < self.shape[1]):
+                raise ValueError('Location {} is outside the island!'
+                                 .format(species['loc']))
+            cell = y * self.shape[1] + x
+            for ani in species['pop']:
+                name = ani['species'].lower() + 's'
+                if name not in SPECIES:
+                    raise ValueError('"{}" is not an animal species!'
+                                     .format(ani['species']))
+                for replica in replicas:
+                    new[name].append((replica, cell, ani['age'],
+                                      ani['weight']))
+        for species, rows in new.items():
+            if rows:
+                self.append(species, *zip(*rows))
+
+    def append(self, species, replica, cell, age, weight):
+        """
+        Adds animals of one species, given column by column.
+        """
+        animals = self.animals[species]
+        for (column, dtype), values in zip(COLUMNS,
+                                           (replica, cell, age, weight)):
+            animals[column] = np.concatenate(
+                (animals[column], np.asarray(values, dtype=dtype)))
+
+    def keep(self, species, mask):
+        """
+        Removes the animals of one species where mask is False.
+        """
+        animals = self.animals[species]
+        for column in animals:
+            animals[column] = animals[column][mask]
+
+    def param(self, species, name):
+        """
+        :return: Array with the value of a parameter for each animal of a
+        species, taken from the animal's replica
+        """
+        return self.params[species][name][self.animals[species]["replica"]]
+
+    def groups(self, species):
+        """
+        :return: Array with the number of the (replica, cell) group of each
+        animal of a species
+        """
+        animals = self.animals[species]
+        return animals["replica"] * self.num_cells + animals["cell"]
+
+    def fitness(self, species):
+        """
+        :return: Array with the fitness of each animal of a species
+        """
+        animals = self.animals[species]
+        p = lambda name: self.param(species, name)
+        return (1.0 / (1.0 + np.exp(p("phi_age") *
+                                    (animals["age"] - p("a_half"))))) * \
+               (1.0 / (1.0 + np.exp(-p("phi_weight") *
+                                    (animals["weight"] - p("w_half")))))
+
+    def grow(self):
+        """
+        Grows food in all Jungle and Savannah cells of all replicas.
+        """
+        self.food += self.alpha * (self.fmax - self.food)
+
+    def feed_herbivores(self):
+        """
+        Herbivores eat "F" in order of fitness, highest first, until the food
+        in their cell runs out.
+        """
+        herbivores = self.animals["herbivores"]
+        if len(herbivores["cell"]) == 0:
+            return
+        groups = self.groups("herbivores")
+        order = np.lexsort((-self.fitness("herbivores"), groups))
+        groups = groups[order]
+        appetite = self.param("herbivores", "F")[order]
+        demand = np.cumsum(appetite) - appetite
+        base = np.maximum.accumulate(np.where(group_starts(groups), demand, 0))
+        food = self.food.reshape(-1)
+        eaten = np.clip(food[groups] - (demand - base), 0, appetite)
+        herbivores["weight"][order] += \
+            self.param("herbivores", "beta")[order] * eaten
+        food -= np.bincount(groups, eaten, minlength=food.size)
+        np.maximum(food, 0, out=food)
+
+    def feed_carnivores(self):
+        """
+        Carnivores hunt in order of fitness, highest first. All carnivores
+        with the same rank in their cell hunt at once.
+        """
+        herbivores = self.animals["herbivores"]
+        carnivores = self.animals["carnivores"]
+        if len(herbivores["cell"]) == 0 or len(carnivores["cell"]) == 0:
+            return
+        herbivore_fitness = self.fitness("herbivores")
+        herbivore_groups = self.groups("herbivores")
+        prey_order = np.lexsort((herbivore_fitness, herbivore_groups))
+        alive = np.ones(len(prey_order), dtype=bool)
+
+        carnivore_fitness = self.fitness("carnivores")
+        carnivore_groups = self.groups("carnivores")
+        hunt_order = np.lexsort((-carnivore_fitness, carnivore_groups))
+        first = group_starts(carnivore_groups[hunt_order])
+        positions = np.arange(len(hunt_order))
+        ranks = positions - np.maximum.accumulate(np.where(first, positions,
+                                                           0))
+        delta_phi_max = self.param("carnivores", "DeltaPhiMax")
+        appetite = self.param("carnivores", "F")
+        beta = self.param("carnivores", "beta")
+
+        for rank in range(ranks.max() + 1):
+            hunters = hunt_order[ranks == rank]
+            prey = prey_order[alive[prey_order]]
+            prey_groups = herbivore_groups[prey]
+            starts = np.searchsorted(prey_groups, carnivore_groups[hunters],
+                                     'left')
+            counts = np.searchsorted(prey_groups, carnivore_groups[hunters],
+                                     'right') - starts
+            if np.sum(counts) == 0:
+                break
+            hunter = np.repeat(np.arange(len(hunters)), counts)
+            target = prey[group_ranges(starts, counts)]
+            difference = (carnivore_fitness[hunters][hunter] -
+                          herbivore_fitness[target])
+            limit = delta_phi_max[hunters][hunter]
+            probability = np.where(difference < limit, difference / limit, 0)
+            kill = self.rng.random_sample(len(target)) < probability
+            weight = np.where(kill, herbivores["weight"][target], 0)
+            before = np.cumsum(weight) - weight
+            hunting = counts > 0
+            before -= np.repeat(before[(np.cumsum(counts) - counts)[hunting]],
+                                counts[hunting])
+            hunger = appetite[hunters][hunter] - before
+            kill &= hunger > 0
+            eaten = np.where(kill, np.minimum(weight, hunger), 0)
+            carnivores["weight"][hunters] += beta[hunters] * np.bincount(
+                hunter, eaten, minlength=len(hunters))
+            alive[target[kill]] = False
+        self.keep("herbivores", alive)
+
+    def feeding(self):
+        """
+        Runs herbivore feeding, then carnivore feeding, in all cells.
+        """
+        self.feed_herbivores()
+        self.feed_carnivores()
+
+    def procreation(self):
+        """
+        Each animal gives birth with the probability of Animal.breeding, with
+        the number of animals in its cell at the start of procreation.
+        """
+        for species in SPECIES:
+            animals = self.animals[species]
+            if len(animals["cell"]) == 0:
+                continue
+            groups = self.groups(species)
+            others = np.bincount(groups)[groups] - 1
+            p = lambda name: self.param(species, name)
+            probability = np.minimum(1, p("gamma") * self.fitness(species) *
+                                     others)
+            probability[animals["weight"] <
+                        p("zeta") * (p("w_birth") + p("sigma_birth"))] = 0
+            parents = np.flatnonzero(self.rng.random_sample(len(groups)) <
+                                     probability)
+            birth_weight = self.rng.normal(p("w_birth")[parents],
+                                           p("sigma_birth")[parents])
+            born = (birth_weight > 0) & (birth_weight < animals["weight"]
+                                         [parents])
+            parents = parents[born]
+            birth_weight = birth_weight[born]
+            animals["weight"][parents] -= p("xi")[parents] * birth_weight
+            self.append(species, animals["replica"][parents],
+                        animals["cell"][parents], np.zeros(len(parents)),
+                        birth_weight)
+
+    def migration(self):
+        """
+        Each animal migrates with probability "mu" * fitness, to one of the
+        passable neighbouring cells chosen at random.
+        """
+        for species in SPECIES:
+            animals = self.animals[species]
+            cells = animals["cell"]
+            moves = (self.rng.random_sample(len(cells)) <
+                     self.param(species, "mu") * self.fitness(species))
+            choice = (self.rng.random_sample(len(cells)) *
+                      self.num_neighbours[cells]).astype(int)
+            moves &= self.num_neighbours[cells] > 0
+            cells[moves] = self.neighbours[cells[moves], choice[moves]]
+
+    def aging(self):
+        """
+        Increments the age of all animals.
+        """
+        for species in SPECIES:
+            self.animals[species]["age"] += 1
+
+    def loss_of_weight(self):
+        """
+        All animals lose "eta" * weight.
+        """
+        for species in SPECIES:
+            weight = self.animals[species]["weight"]
+            weight -= self.param(species, "eta") * weight
+
+    def death(self):
+        """
+        Each animal dies with probability "omega" * (1 - fitness).
+        """
+        for species in SPECIES:
+            probability = (self.param(species, "omega") *
+                           (1 - self.fitness(species)))
+            dies = probability > self.rng.random_sample(len(probability))
+            self.keep(species, ~dies)
+
+    def counts(self):
+        """
+        :return: Array of shape (replicas, 2, rows, columns) with the number
+        of herbivores and carnivores in each cell of each replica
+        """
+        counts = [np.bincount(self.groups(species),
+                              minlength=self.replicas * self.num_cells)
+                  .reshape((self.replicas,) + self.shape)
+                  for species in ("herbivores", "carnivores")]
+        return np.stack(counts, axis=1)
+
+    def totals(self):
+        """
+        :return: Array of shape (replicas, 2) with the number of herbivores
+        and carnivores in each replica
+        """
+        return np.stack([np.bincount(self.animals[species]["replica"],
+                                     minlength=self.replicas)
+                         for species in ("herbivores", "carnivores")], axis=1)
+
+    def one_year(self):
+        """
+        Simulates one year on all replicas.
+
+        :return: Array with the number of animals in each cell, see counts
+        """
+        self.grow()
+        self.feeding()
+        self.procreation()
+        self.migration()
+        self.aging()
+        self.loss_of_weight()
+        self.death()
+        self.year += 1
+        return self.counts()
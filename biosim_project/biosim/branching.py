@@ -0,0 +1,74 @@
+# -*- Utf-8 -*-
+
+import multiprocessing
+from biosim.parameters import Parameters
+from biosim.termination import TerminationPolicy
+
+"""
+Branching module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+_base = None
+
+
+def run_branch(branch, sim=None):
+    """
+    Forks a simulation and runs one branch of it.
+
+    :param branch: Dictionary with the keys
+        - "years": Number of years to simulate
+        - "seed": Optional new seed
+        - "parameters": Optional dictionary mapping "Herbivore",
+          "Carnivore", "J" and "S" to parameter dictionaries
+        - "ini_pop": Optional population to add, as for BioSim
+        - "termination": Optional dictionary of TerminationPolicy arguments
+    :param sim: BioSim instance to fork, default is the simulation given to
+    run_branches
+    :return: Dictionary with arrays of the number of "herbivores" and
+    "carnivores" after each year, as from biosim.scenario.run_scenario
+    """
+    fork = (sim or _base).fork(branch.get("seed"))
+    for name, params in branch.get("parameters", {}).items():
+        if name in Parameters.animal_classes:
+            fork.set_animal_parameters(name, params)
+        else:
+            fork.set_landscape_parameters(name, params)
+    fork.add_population(branch.get("ini_pop", []))
+
+    return fork.run(branch["years"],
+                    termination=TerminationPolicy.from_spec(branch))
+
+
+def run_branches(sim, branches, processes=None):
+    """
+    Runs many branches of a simulation in parallel. The worker processes are
+    forked from this process after the simulation is stored in a module
+    global, so they get it copy-on-write instead of having it sent to them.
+    Each worker forks its own copy for every branch.
+
+    :param sim: BioSim instance, e.g. after a warm-up
+    :param branches: List of branch dictionaries, see run_branch
+    :param processes: Number of worker processes, default is the number of
+    CPUs
+    :return: List of results, see run_branch
+    """
+    global _base
+    _base = sim
+    if sim.parallel is not None:
+        sim.parallel.collect()
+    parallel = sim.parallel
+    sim.parallel = None
+    try:
+        pool = multiprocessing.Pool(processes)
+        try:
+            return pool.map(run_branch, branches)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _base = None
+        sim.parallel = parallel
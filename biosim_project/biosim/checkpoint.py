@@ -0,0 +1,269 @@
+# -*- Utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import Queue
+import numpy as np
+from biosim.animals import Herbivore, Carnivore
+from biosim.parameters import Parameters
+
+"""
+Checkpoint module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+FORMAT_VERSION = 2
+SPECIES = (("herbivores", Herbivore), ("carnivores", Carnivore))
+ANIMAL_COLUMNS = ("cell", "row", "col", "age", "weight", "fitness", "id")
+FLOAT_COLUMNS = ("weight", "fitness")
+
+
+def capture(sim):
+    """
+    Copies the state of a simulation into arrays. Animals are stored column
+    by column, species by species, in the order of the cells and of the
+    animals in each cell. The parameters in effect are always stored, the
+    class parameters if the island has none of its own. The animals are
+    copied one by one in Python on the calling thread, also when the
+    checkpoint is written by a CheckpointWriter, so the simulation waits
+    for this copy.
+
+    :param sim: BioSim instance
+    :return: Tuple (manifest, arrays), where manifest is a dictionary that
+    can be written as JSON and arrays is a dictionary of numpy arrays
+    """
+    island = sim.island
+    streams = island.streams
+    parameters = island.parameters or Parameters()
+    name, key, position, has_gauss, cached_gaussian = island.rng.get_state()
+    manifest = {"version": FORMAT_VERSION,
+                "island_map": sim.island_map,
+                "shape": list(island.island.shape),
+                "year": island.year,
+                "years_sim": sim.years_sim,
+                "next_id": island.next_id,
+                "seed": None if streams is None else streams.seed,
+                "common_random_numbers": (streams is not None and
+                                          streams.slots),
+                "rng": {"name": name, "position": position,
+                        "has_gauss": has_gauss,
+                        "cached_gaussian": cached_gaussian},
+                "parameters": {"animals": parameters.animal_params,
+                               "landscapes": parameters.landscape_params}}
+    arrays = {"rng_key": key, "food": island.food()}
+    for grid in ("fmax", "alpha"):
+        if getattr(island, grid) is not None:
+            arrays[grid] = getattr(island, grid)
+    for species, _ in SPECIES:
+        animals = [(index, animal) for index, cell
+                   in enumerate(island.island.flat)
+                   for animal in getattr(cell, species)]
+        values = {"cell": [index for index, _ in animals],
+                  "row": [animal.coordinates[0] for _, animal in animals],
+                  "col": [animal.coordinates[1] for _, animal in animals],
+                  "age": [animal.age for _, animal in animals],
+                  "weight": [animal.weight for _, animal in animals],
+                  "fitness": [animal.fitness for _, animal in animals],
+                  "id": [animal.id for _, animal in animals]}
+        for column in ANIMAL_COLUMNS:
+            dtype = float if column in FLOAT_COLUMNS else np.int64
+            arrays[species + "_" + column] = np.array(values[column],
+                                                      dtype=dtype)
+    return manifest, arrays
+
+
+def write(path, manifest, arrays):
+    """
+    Writes a checkpoint directory with "manifest.json" and one .npy file per
+    array. The directory is written under a temporary name and renamed
+    when complete, so a checkpoint is never left half written.
+
+    :param path: Directory of the checkpoint, replaced if it exists
+    :param manifest: Dictionary written as JSON
+    :param arrays: Dictionary of numpy arrays
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    temporary = tempfile.mkdtemp(dir=parent)
+    for name, values in arrays.items():
+        np.save(os.path.join(temporary, name + '.npy'), values)
+    with open(os.path.join(temporary, 'manifest.json'), 'w') as f:
+        json.dump(dict(manifest, arrays=sorted(arrays)), f, indent=1,
+                  sort_keys=True)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.rename(temporary, path)
+
+
+def save_checkpoint(sim, path):
+    """
+    Saves the state of a simulation.
+
+    :param sim: BioSim instance
+    :param path: Directory of the checkpoint
+    """
+    write(path, *capture(sim))
+
+
+def read(path, mmap_mode=None):
+    """
+    Reads a checkpoint directory.
+
+    :param path: Directory of the checkpoint
+    :param mmap_mode: Optional mode for memory mapping the arrays, e.g. 'r'
+    :return: Tuple (manifest, arrays)
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest["version"] > FORMAT_VERSION:
+        raise ValueError('Checkpoint format version {} is newer than {}!'
+                         .format(manifest["version"], FORMAT_VERSION))
+    arrays = {name: np.load(os.path.join(path, name + '.npy'),
+                            mmap_mode=mmap_mode)
+              for name in manifest["arrays"]}
+    return manifest, arrays
+
+
+def load_checkpoint(path):
+    """
+    Restores a simulation saved with save_checkpoint. The restored
+    simulation continues exactly as the saved one would have. Animals keep
+    their ids, except in checkpoints of format version 1 which have none;
+    their animals get new ids in the order they are stored.
+
+    :param path: Directory of the checkpoint
+    :return: BioSim instance
+    """
+    from biosim.simulation import BioSim
+    manifest, arrays = read(path)
+    parameters = None
+    if manifest["parameters"] is not None:
+        parameters = Parameters()
+        for species, params in manifest["parameters"]["animals"].items():
+            parameters.animal_params[species].update(params)
+        for landscape, params in manifest["parameters"][
+                "landscapes"].items():
+            parameters.landscape_params[landscape].update(params)
+    sim = BioSim(manifest["island_map"], [], manifest["seed"],
+                 arrays.get("fmax"), arrays.get("alpha"), parameters,
+                 manifest["common_random_numbers"])
+    island = sim.island
+    island.year = manifest["year"]
+    sim.years_sim = manifest["years_sim"]
+    state = manifest["rng"]
+    island.rng.set_state((str(state["name"]), arrays["rng_key"],
+                          state["position"], state["has_gauss"],
+                          state["cached_gaussian"]))
+    for cell, food in zip(island.island.flat, arrays["food"].flat):
+        cell.available_food_herb = food
+    cells = island.island.reshape(-1)
+    restored = []
+    for species, cls in SPECIES:
+        params = island.animal_params(cls.__name__)
+        columns = [arrays[species + "_" + column].tolist()
+                   for column in ANIMAL_COLUMNS[:-1]]
+        ids = arrays.get(species + "_id")
+        ids = [None] * len(columns[0]) if ids is None else ids.tolist()
+        for index, row, col, age, weight, fitness, animal_id in zip(
+                *(columns + [ids])):
+            animal = cls(weight, age, (row, col), params=params)
+            animal.fitness = fitness
+            animal.id = animal_id
+            getattr(cells[index], species).append(animal)
+            restored.append(animal)
+    ids = [animal.id for animal in restored if animal.id is not None]
+    island.next_id = manifest.get("next_id", max(ids) + 1 if ids else 0)
+    island.assign_ids(restored)
+    return sim
+
+
+class CheckpointWriter(object):
+    """
+    Class object: CheckpointWriter.
+    Writes checkpoints in a background thread. The state is copied on the
+    calling thread when a checkpoint is submitted (see capture), so the
+    simulation can go on while it is written.
+        - <var> = CheckpointWriter()
+        - <var>.submit(sim, path)
+        - <var>.close() waits for all checkpoints to be written
+    """
+
+    def __init__(self):
+        self.queue = Queue.Queue()
+        self.errors = []
+        self.thread = threading.Thread(target=self.work)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def work(self):
+        """
+        Writes submitted checkpoints until None is submitted.
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                write(*item)
+            except Exception as error:
+                self.errors.append(error)
+
+    def submit(self, sim, path):
+        """
+        Copies the state of a simulation and queues it for writing.
+
+        :param sim: BioSim instance
+        :param path: Directory of the checkpoint
+        """
+        manifest, arrays = capture(sim)
+        self.queue.put((path, manifest, arrays))
+
+    def close(self):
+        """
+        Waits until all checkpoints are written. Raises the first error met
+        while writing, if any.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+
+class PeriodicCheckpoint(object):
+    """
+    Class object: PeriodicCheckpoint.
+    Recorder writing a checkpoint every <interval> years, named after the
+    year, e.g. "year00100".
+        - sim.add_recorder(PeriodicCheckpoint(directory, 100))
+    """
+
+    def __init__(self, directory, interval, writer=None):
+        """
+        :param directory: Directory the checkpoints are written in
+        :param interval: Number of years between checkpoints
+        :param writer: Optional CheckpointWriter, default writes directly
+        """
+        self.directory = directory
+        self.interval = interval
+        self.writer = writer
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __call__(self, sim):
+        """
+        Writes a checkpoint if the year is a multiple of the interval.
+
+        :param sim: BioSim instance after a year
+        """
+        if sim.island.year % self.interval == 0:
+            path = os.path.join(self.directory,
+                                'year{:05d}'.format(sim.island.year))
+            if self.writer is None:
+                save_checkpoint(sim, path)
+            else:
+                self.writer.submit(sim, path)
@@ -0,0 +1,286 @@
+# -*- Utf-8 -*-
+
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+import os
+import socket
+import threading
+import Queue
+import numpy as np
+from biosim.scenario import scenario_years
+from biosim.termination import TerminationPolicy
+
+"""
+Distributed module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def worker(address, authkey, family=None, block=10):
+    """
+    Connects to a Coordinator and runs the specifications it hands out until
+    told to stop. Yearly totals are sent back in blocks of <block> years.
+    A run that raises an exception is reported to the coordinator as an
+    error, and the worker goes on with the next run.
+
+    :param address: Address of the coordinator, (host, port) for TCP or a
+    path for Unix sockets
+    :param authkey: Shared secret of the coordinator
+    :param family: 'AF_INET' or 'AF_UNIX', default is taken from address
+    :param block: Number of years sent back in each message
+    """
+    connection = Client(address, family, authkey=authkey)
+    try:
+        while True:
+            connection.send(("ready",))
+            message = connection.recv()
+            if message[0] == "stop":
+                break
+            _, task, spec = message
+            try:
+                policy = TerminationPolicy.from_spec(spec)
+                years = []
+                for totals in scenario_years(spec, policy):
+                    years.append(totals)
+                    if len(years) == block:
+                        connection.send(("years", task,
+                                         np.array(years, dtype=np.int32)))
+                        years = []
+            except Exception as error:
+                connection.send(("error", task, '{}: {}'.format(
+                    type(error).__name__, error)))
+                continue
+            if years:
+                connection.send(("years", task,
+                                 np.array(years, dtype=np.int32)))
+            stop = None if policy is None else (policy.year, policy.reason)
+            connection.send(("done", task, stop))
+    finally:
+        connection.close()
+
+
+class Coordinator(object):
+    """
+    Class object: Coordinator.
+    Hands out run specifications (see biosim.scenario.build_simulation) to
+    workers connecting over TCP or Unix sockets, and collects the yearly
+    number of herbivores and carnivores they send back. If a worker is lost
+    in the middle of a run, the run is given to another worker, up to
+    <max_attempts> times. A run that raises an exception in the worker is
+    failed at once, as it would fail on any worker, and its error message
+    is kept in <var>.errors.
+    Messages from workers are unpickled, so anyone knowing the authkey can
+    run code in this process. The default authkey is random; give workers
+    on other machines the key over a secure channel.
+        - <var> = Coordinator(specs)
+        - <var>.start() to accept workers in the background (optional)
+        - start workers with worker(<var>.address, <var>.authkey)
+        - results = <var>.run()
+    """
+
+    def __init__(self, specs, address=('localhost', 0), family=None,
+                 authkey=None, max_attempts=3):
+        """
+        :param specs: List of run specifications
+        :param address: Address to listen on. Default is a free TCP port on
+        localhost, use None with family 'AF_UNIX' for a Unix socket
+        :param family: 'AF_INET' or 'AF_UNIX', default is taken from address
+        :param authkey: Shared secret workers must know, default is 32
+        random bytes
+        :param max_attempts: Number of times a run is tried before giving up
+        """
+        self.specs = list(specs)
+        self.authkey = os.urandom(32) if authkey is None else authkey
+        self.max_attempts = max_attempts
+        self.listener = Listener(address, family, authkey=self.authkey)
+        self.address = self.listener.address
+        self.tasks = Queue.Queue()
+        for task in range(len(self.specs)):
+            self.tasks.put(task)
+        self.attempts = [0] * len(self.specs)
+        self.results = [None] * len(self.specs)
+        self.failed = []
+        self.errors = {}
+        self.remaining = len(self.specs)
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.closing = False
+        self.acceptor = None
+        if self.remaining == 0:
+            self.finished.set()
+
+    def complete(self, task, result):
+        """
+        Stores the result of a task, None if it failed.
+        """
+        with self.lock:
+            if result is None:
+                self.failed.append(task)
+            else:
+                self.results[task] = result
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.finished.set()
+
+    def lost(self, task):
+        """
+        Gives a task to another worker, or marks it as failed.
+        """
+        with self.lock:
+            self.attempts[task] += 1
+            retry = self.attempts[task] < self.max_attempts
+        if retry:
+            self.tasks.put(task)
+        else:
+            self.complete(task, None)
+
+    def next_task(self):
+        """
+        Waits for a task to hand out.
+
+        :return: Task index, or None when all tasks are finished
+        """
+        while not self.finished.is_set():
+            try:
+                return self.tasks.get(timeout=0.05)
+            except Queue.Empty:
+                pass
+        return None
+
+    def serve(self, connection):
+        """
+        Hands out tasks to one worker until all tasks are finished.
+        """
+        task = None
+        totals = []
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == "ready":
+                    task = self.next_task()
+                    if task is None:
+                        connection.send(("stop",))
+                        break
+                    totals = []
+                    connection.send(("run", task, self.specs[task]))
+                elif message[0] == "years":
+                    totals.append(message[2])
+                elif message[0] == "done":
+                    years = np.concatenate(
+                        totals + [np.zeros((0, 2), dtype=np.int32)]).T
+                    result = {"herbivores": years[0], "carnivores": years[1]}
+                    if message[2] is not None:
+                        result["stopped"], result["reason"] = message[2]
+                    self.complete(task, result)
+                    task = None
+                elif message[0] == "error":
+                    with self.lock:
+                        self.errors[task] = message[2]
+                    self.complete(task, None)
+                    task = None
+        except (EOFError, IOError):
+            if task is not None:
+                self.lost(task)
+        finally:
+            connection.close()
+
+    def accept(self):
+        """
+        Accepts workers and serves each of them in its own thread, until all
+        tasks are finished or the listener is closed.
+        """
+        while not self.finished.is_set() and not self.closing:
+            try:
+                connection = self.listener.accept()
+            except (EOFError, IOError, multiprocessing.AuthenticationError):
+                if self.closing:
+                    break
+                continue
+            if self.closing:
+                connection.close()
+                break
+            thread = threading.Thread(target=self.serve, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def wake(self):
+        """
+        Connects to the listener once without the handshake, so an acceptor
+        blocked in accept() returns.
+        """
+        family = (socket.AF_INET if isinstance(self.address, tuple)
+                  else socket.AF_UNIX)
+        connection = socket.socket(family)
+        try:
+            connection.connect(self.address)
+        except socket.error:
+            pass
+        finally:
+            connection.close()
+
+    def start(self):
+        """
+        Starts accepting workers in the background.
+        """
+        if self.acceptor is None:
+            self.acceptor = threading.Thread(target=self.accept)
+            self.acceptor.daemon = True
+            self.acceptor.start()
+
+    def run(self, timeout=None):
+        """
+        Serves workers until all runs are finished, then stops accepting
+        workers and closes the listener.
+
+        :param timeout: Optional number of seconds to wait
+        :return: List with a result dictionary for each specification, with
+        arrays of "herbivores" and "carnivores" per year, as from
+        biosim.scenario.run_scenario. Failed runs, and runs not finished
+        before the timeout, are None and their indices are listed in
+        <var>.failed. Runs that raised an exception have their error
+        message in <var>.errors.
+        """
+        self.start()
+        self.finished.wait(timeout)
+        self.closing = True
+        self.wake()
+        self.acceptor.join()
+        self.listener.close()
+        with self.lock:
+            unfinished = [task for task, result in enumerate(self.results)
+                          if result is None and task not in self.failed]
+            self.failed.extend(unfinished)
+        return self.results
+
+
+def run_local(specs, workers=2, family=None, max_attempts=3):
+    """
+    Runs specifications on worker processes on this machine, using the
+    socket protocol.
+
+    :param specs: List of run specifications
+    :param workers: Number of worker processes
+    :param family: 'AF_INET' (default) or 'AF_UNIX'
+    :param max_attempts: Number of times a run is tried before giving up
+    :return: List of results, see Coordinator.run. If all worker processes
+    die, the runs left are failed.
+    """
+    address = None if family == 'AF_UNIX' else ('localhost', 0)
+    coordinator = Coordinator(specs, address, family,
+                              max_attempts=max_attempts)
+    processes = [multiprocessing.Process(
+        target=worker, args=(coordinator.address, coordinator.authkey))
+        for _ in range(workers)]
+    for process in processes:
+        process.daemon = True
+        process.start()
+    coordinator.start()
+    while not coordinator.finished.wait(0.1):
+        if not any(process.is_alive() for process in processes):
+            break
+    results = coordinator.run(0)
+    for process in processes:
+        process.join()
+    return results
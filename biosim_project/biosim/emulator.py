@@ -0,0 +1,226 @@
+# -*- Utf-8 -*-
+
+import numpy as np
+from biosim.sweep import sweep
+
+"""
+Emulator module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+OUTPUTS = ("herbivores", "carnivores", "extinction")
+
+
+def summarize(runs, burn_in=0.5):
+    """
+    Summarizes the runs of one parameter set.
+
+    :param runs: List of run results with "herbivores" and "carnivores"
+    arrays, one per seed
+    :param burn_in: Part of each run left out of the mean population
+    :return: Dictionary with the mean number of "herbivores" and
+    "carnivores" after the burn-in, and the share of runs where a species
+    present at the start had died out at the end ("extinction")
+    """
+    summary = {"herbivores": [], "carnivores": [], "extinction": []}
+    for run in runs:
+        extinct = False
+        for species in ("herbivores", "carnivores"):
+            series = np.asarray(run[species])
+            start = int(len(series) * burn_in)
+            summary[species].append(np.mean(series[start:]))
+            extinct |= bool(np.any(series > 0) and series[-1] == 0)
+        summary["extinction"].append(extinct)
+    return {output: float(np.mean(values))
+            for output, values in summary.items()}
+
+
+class GaussianProcess(object):
+    """
+    Class object: GaussianProcess.
+    Gaussian process regression with a squared exponential kernel. Inputs
+    are scaled to [0, 1] and outputs to zero mean and unit variance. The
+    length scale and noise level are chosen from a grid by the marginal
+    likelihood.
+        - <var> = GaussianProcess()
+        - <var>.fit(inputs, outputs)
+        - mean, std = <var>.predict(new_inputs)
+    """
+
+    length_scales = (0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+    noise_levels = (1e-6, 1e-4, 1e-2, 1e-1)
+
+    def __init__(self):
+        self.inputs = None
+        self.low = None
+        self.span = None
+        self.mean = 0.0
+        self.scale = 1.0
+        self.length_scale = None
+        self.noise = None
+        self.cholesky = None
+        self.weights = None
+
+    def normalize(self, inputs):
+        """
+        :return: Inputs scaled by the range of the training inputs
+        """
+        return (np.atleast_2d(inputs) - self.low) / self.span
+
+    def kernel(self, first, second, length_scale):
+        """
+        :return: Matrix of the kernel between two sets of scaled inputs
+        """
+        distances = (np.sum(first ** 2, axis=1)[:, None] +
+                     np.sum(second ** 2, axis=1)[None, :] -
+                     2 * np.dot(first, second.T))
+        return np.exp(-0.5 * np.maximum(distances, 0) / length_scale ** 2)
+
+    def fit(self, inputs, outputs):
+        """
+        Trains the process.
+
+        :param inputs: Array of shape (points, dimensions)
+        :param outputs: Array of shape (points,)
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=float))
+        outputs = np.asarray(outputs, dtype=float)
+        self.low = inputs.min(axis=0)
+        self.span = np.where(inputs.max(axis=0) > self.low,
+                             inputs.max(axis=0) - self.low, 1.0)
+        self.inputs = self.normalize(inputs)
+        self.mean = outputs.mean()
+        self.scale = outputs.std() or 1.0
+        targets = (outputs - self.mean) / self.scale
+
+        best = None
+        for length_scale in self.length_scales:
+            kernel = self.kernel(self.inputs, self.inputs, length_scale)
+            for noise in self.noise_levels:
+                try:
+                    cholesky = np.linalg.cholesky(
+                        kernel + noise * np.eye(len(targets)))
+                except np.linalg.LinAlgError:
+                    continue
+                weights = np.linalg.solve(
+                    cholesky.T, np.linalg.solve(cholesky, targets))
+                likelihood = (-0.5 * np.dot(targets, weights) -
+                              np.sum(np.log(np.diag(cholesky))))
+                if best is None or likelihood > best[0]:
+                    best = likelihood, length_scale, noise, cholesky, weights
+        _, self.length_scale, self.noise, self.cholesky, self.weights = best
+
+    def predict(self, inputs):
+        """
+        :param inputs: Array of shape (points, dimensions)
+        :return: Tuple of arrays (mean, standard deviation) at the inputs
+        """
+        inputs = self.normalize(np.asarray(inputs, dtype=float))
+        cross = self.kernel(inputs, self.inputs, self.length_scale)
+        mean = np.dot(cross, self.weights)
+        solved = np.linalg.solve(self.cholesky, cross.T)
+        variance = np.maximum(1 - np.sum(solved ** 2, axis=0), 0)
+        return (self.mean + self.scale * mean,
+                self.scale * np.sqrt(variance))
+
+
+class Emulator(object):
+    """
+    Class object: Emulator.
+    Predicts summaries of runs (see summarize) from parameters, with one
+    Gaussian process per summary. Trained from sweep results, and refined
+    by running the candidate parameter sets the emulator is least sure of.
+        - <var> = Emulator([("Herbivore", "mu"), ("J", "fmax")])
+        - <var>.add_runs(sweep(...))
+        - <var>.predict({"Herbivore": {"mu": 0.3}, "J": {"fmax": 700}})
+    """
+
+    def __init__(self, inputs, burn_in=0.5):
+        """
+        :param inputs: List of (name, parameter) the emulator uses as input,
+        name is "Herbivore", "Carnivore", "J" or "S"
+        :param burn_in: Part of each run left out of the mean populations
+        """
+        self.inputs = list(inputs)
+        self.burn_in = burn_in
+        self.runs = {}
+        self.processes = {}
+
+    def vector(self, parameters):
+        """
+        :param parameters: Parameter dictionary, see
+        biosim.sweep.parameter_grid
+        :return: Tuple with the value of each input
+        """
+        return tuple(float(parameters[name][parameter])
+                     for name, parameter in self.inputs)
+
+    def add_runs(self, runs):
+        """
+        Adds sweep results and trains the emulator again.
+
+        :param runs: List of results from biosim.sweep.sweep
+        """
+        for run in runs:
+            self.runs.setdefault(self.vector(run["parameters"]), []).append(
+                run)
+        self.fit()
+
+    def fit(self):
+        """
+        Trains one Gaussian process for each summary, with the runs of each
+        parameter set summarized over the seeds.
+        """
+        points = sorted(self.runs)
+        summaries = [summarize(self.runs[point], self.burn_in)
+                     for point in points]
+        for output in OUTPUTS:
+            process = GaussianProcess()
+            process.fit(points, [summary[output] for summary in summaries])
+            self.processes[output] = process
+
+    def predict(self, parameters):
+        """
+        :param parameters: Parameter dictionary, or list of them
+        :return: Dictionary mapping each summary to (mean, standard
+        deviation), as arrays when given a list
+        """
+        single = isinstance(parameters, dict)
+        if single:
+            parameters = [parameters]
+        points = np.array([self.vector(p) for p in parameters])
+        predictions = {}
+        for output, process in self.processes.items():
+            mean, std = process.predict(points)
+            if output == "extinction":
+                mean = np.clip(mean, 0, 1)
+            predictions[output] = (mean[0], std[0]) if single else (mean,
+                                                                     std)
+        return predictions
+
+    def refine(self, spec, candidates, seeds, directory, points=1,
+               processes=None):
+        """
+        Runs the candidates the emulator is least sure of and adds them.
+        The uncertainty of a candidate is the sum over the summaries of the
+        predicted standard deviation relative to the spread of the summary.
+
+        :param spec: Run specification, see biosim.scenario.build_simulation
+        :param candidates: List of parameter dictionaries to choose from
+        :param seeds: Seeds to run each chosen candidate with
+        :param directory: Cache directory of the sweep
+        :param points: Number of candidates to run
+        :param processes: Number of worker processes
+        :return: The chosen candidates
+        """
+        predictions = self.predict(list(candidates))
+        uncertainty = np.zeros(len(candidates))
+        for output, (_, std) in predictions.items():
+            uncertainty += std / self.processes[output].scale
+        chosen = [candidates[index]
+                  for index in np.argsort(-uncertainty)[:points]]
+        self.add_runs(sweep(spec, chosen, seeds, directory, processes))
+        return chosen
@@ -0,0 +1,205 @@
+# -*- Utf-8 -*-
+
+import multiprocessing
+import numpy as np
+from biosim.scenario import run_scenario
+
+"""
+Ensemble module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class StreamingStatistics(object):
+    """
+    Class object: StreamingStatistics.
+    Mean, variance and quantiles of a time series over many runs, updated
+    one run at a time without keeping the runs. Mean and variance use
+    Welford's method, quantiles the P-square estimator of Jain and
+    Chlamtac, both computed for all years at once. A run may be shorter
+    than num_years, it then only counts for its first years, and
+    <var>.counts has the number of runs in each year.
+        - <var> = StreamingStatistics(num_years)
+        - <var>.update(series) for each run
+    """
+
+    def __init__(self, num_years, quantiles=(0.05, 0.5, 0.95)):
+        """
+        :param num_years: Length of the longest series
+        :param quantiles: Probabilities of the estimated quantiles
+        """
+        self.num_years = num_years
+        self.quantiles = tuple(quantiles)
+        self.count = 0
+        self.counts = np.zeros(num_years, dtype=int)
+        self.mean = np.zeros(num_years)
+        self.sum_squares = np.zeros(num_years)
+        self.first = np.full((5, num_years), np.nan)
+        num = len(self.quantiles)
+        self.heights = np.zeros((num, num_years, 5))
+        self.positions = np.zeros((num, num_years, 5))
+        p = np.array(self.quantiles)[:, None]
+        self.desired = np.hstack([np.ones_like(p), 1 + 2 * p, 1 + 4 * p,
+                                  3 + 2 * p, 5 * np.ones_like(p)])
+        self.increments = np.hstack([np.zeros_like(p), p / 2, p,
+                                     (1 + p) / 2, np.ones_like(p)])
+
+    def update(self, series):
+        """
+        Adds one run.
+
+        :param series: Array with one value per year, for at most num_years
+        years
+        """
+        x = np.asarray(series, dtype=float)
+        years = len(x)
+        self.count += 1
+        self.counts[:years] += 1
+        counts = self.counts[:years]
+        delta = x - self.mean[:years]
+        self.mean[:years] += delta / counts
+        self.sum_squares[:years] += delta * (x - self.mean[:years])
+
+        early = np.nonzero(counts <= 5)[0]
+        self.first[counts[early] - 1, early] = x[early]
+        started = early[counts[early] == 5]
+        if len(started):
+            self.heights[:, started] = np.sort(self.first[:, started].T,
+                                               axis=1)
+            self.positions[:, started] = np.arange(1, 6)
+        later = np.nonzero(counts > 5)[0]
+        if len(later):
+            for j in range(len(self.quantiles)):
+                self.update_markers(j, x[later], later)
+
+    def update_markers(self, j, x, years):
+        """
+        P-square update of the markers of one quantile for some years.
+
+        :param j: Index of the quantile
+        :param x: Array with the new value for each of the years
+        :param years: Array with the indices of the years
+        """
+        q = self.heights[j, years]
+        n = self.positions[j, years]
+        desired = (self.desired[j][None, :] + (self.counts[years] - 5)[
+            :, None] * self.increments[j][None, :])
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        k = np.sum(x[:, None] >= q[:, 1:4], axis=1)
+        n += np.arange(5)[None, :] > k[:, None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i in (1, 2, 3):
+                d = desired[:, i] - n[:, i]
+                move = (((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) |
+                        ((d <= -1) & (n[:, i - 1] - n[:, i] < -1)))
+                s = np.sign(d)
+                parabolic = q[:, i] + s / (n[:, i + 1] - n[:, i - 1]) * (
+                    (n[:, i] - n[:, i - 1] + s) * (q[:, i + 1] - q[:, i]) /
+                    (n[:, i + 1] - n[:, i]) +
+                    (n[:, i + 1] - n[:, i] - s) * (q[:, i] - q[:, i - 1]) /
+                    (n[:, i] - n[:, i - 1]))
+                neighbour = np.where(s > 0, i + 1, i - 1)
+                rows = np.arange(len(x))
+                linear = q[:, i] + s * (q[rows, neighbour] - q[:, i]) / (
+                    n[rows, neighbour] - n[:, i])
+                inside = (q[:, i - 1] < parabolic) & (parabolic < q[:, i + 1])
+                new = np.where(inside, parabolic, linear)
+                q[:, i] = np.where(move, new, q[:, i])
+                n[:, i] += np.where(move, s, 0)
+        self.heights[j, years] = q
+        self.positions[j, years] = n
+
+    @property
+    def variance(self):
+        """Sample variance for each year, 0 for years with fewer than two
+        runs."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.counts > 1,
+                            self.sum_squares / (self.counts - 1), 0.0)
+
+    def quantile(self, probability):
+        """
+        Returns the estimated quantile for each year.
+
+        :param probability: One of the probabilities given at construction
+        :return: Array with one estimate per year, NaN for years without runs
+        """
+        j = self.quantiles.index(probability)
+        estimate = self.heights[j, :, 2].copy()
+        few = self.counts < 5
+        if np.any(few):
+            exact = np.full(self.num_years, np.nan)
+            for year in np.nonzero(few & (self.counts > 0))[0]:
+                exact[year] = np.percentile(
+                    self.first[:self.counts[year], year], 100 * probability)
+            estimate[few] = exact[few]
+        return estimate
+
+
+def run_ensemble(spec, seeds, processes=None,
+                 quantiles=(0.05, 0.5, 0.95)):
+    """
+    Runs one scenario for many seeds on a process pool, without
+    visualization, and merges the yearly totals into streaming statistics.
+    Runs stopped early by a termination policy only count for the years
+    they ran, except runs where every animal died out, which count as zero
+    for the remaining years. "contributing" has the number of runs in the
+    statistics of each year.
+
+    :param spec: Run specification, see biosim.scenario.build_simulation.
+    Its seed is replaced by each of the seeds.
+    :param seeds: List of seeds
+    :param processes: Number of worker processes, default is the number of
+    CPUs
+    :param quantiles: Probabilities of the estimated quantiles
+    :return: Dictionary with "years", "runs", "contributing", "stopped"
+    (array with the year each run stopped, the number of years if it did
+    not) and "reasons" (number of runs stopped for each reason), and for
+    "herbivores" and "carnivores" a dictionary with the arrays "mean", "std"
+    and one array per quantile probability, NaN for years without runs
+    """
+    specs = []
+    for seed in seeds:
+        run_spec = dict(spec)
+        run_spec["seed"] = seed
+        specs.append(run_spec)
+    statistics = {"herbivores": StreamingStatistics(spec["years"], quantiles),
+                  "carnivores": StreamingStatistics(spec["years"], quantiles)}
+    stopped = []
+    reasons = {}
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap(run_scenario, specs):
+            extinct = (len(result["herbivores"]) and
+                       result["herbivores"][-1] == 0 and
+                       result["carnivores"][-1] == 0)
+            for species in statistics:
+                series = result[species]
+                if extinct:
+                    series = np.concatenate((series, np.zeros(
+                        spec["years"] - len(series), dtype=series.dtype)))
+                statistics[species].update(series)
+            stopped.append(result.get("stopped") or spec["years"])
+            if result.get("reason") is not None:
+                reasons[result["reason"]] = reasons.get(result["reason"],
+                                                        0) + 1
+    finally:
+        pool.close()
+        pool.join()
+
+    contributing = statistics["herbivores"].counts.copy()
+    summary = {"years": np.arange(1, spec["years"] + 1), "runs": len(specs),
+               "contributing": contributing, "stopped": np.array(stopped),
+               "reasons": reasons}
+    for species, stats in statistics.items():
+        summary[species] = {"mean": np.where(contributing > 0, stats.mean,
+                                             np.nan),
+                            "std": np.where(contributing > 0,
+                                            np.sqrt(stats.variance), np.nan)}
+        for probability in quantiles:
+            summary[species][probability] = stats.quantile(probability)
+    return summary
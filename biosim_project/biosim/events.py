@@ -0,0 +1,219 @@
+# -*- Utf-8 -*-
+
+import numpy as np
+from biosim.animals import Herbivore
+from biosim.checkpoint import read
+
+"""
+Events module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+SPECIES = ("herbivores", "carnivores")
+EVENT_FIELDS = {
+    "births": [("year", np.int32), ("species", np.int8), ("id", np.int64),
+               ("parent", np.int64), ("cell", np.int32),
+               ("weight", np.float64)],
+    "deaths": [("year", np.int32), ("species", np.int8), ("id", np.int64),
+               ("cell", np.int32), ("weight", np.float64)],
+    "kills": [("year", np.int32), ("id", np.int64), ("killer", np.int64),
+              ("cell", np.int32), ("weight", np.float64)],
+    "migrations": [("year", np.int32), ("species", np.int8),
+                   ("id", np.int64), ("source", np.int32),
+                   ("destination", np.int32)]}
+
+
+def species_code(animal):
+    """
+    :return: 0 for herbivores and 1 for carnivores
+    """
+    return 0 if isinstance(animal, Herbivore) else 1
+
+
+class EventLog(object):
+    """
+    Class object: EventLog.
+    Records births, deaths, kills and migrations on an island as typed
+    arrays, one record array per kind of event. Cells are numbered row by
+    row, and years are the year being simulated (island.year before it is
+    incremented). Events are collected as rows during a year and stored as
+    one record array per kind when the next year starts, so the arrays are
+    in year order.
+        - <var> = sim.record_events()
+        - <var>.arrays("births") returns the births as a record array
+        - <var>.save(path), EventLog.load(path)
+    """
+
+    def __init__(self):
+        self.chunks = {kind: [] for kind in EVENT_FIELDS}
+        self.rows = {kind: [] for kind in EVENT_FIELDS}
+        self.year = None
+
+    def add(self, kind, year, rows):
+        """
+        Adds rows of one kind of event in a year.
+        """
+        if year != self.year:
+            self.flush()
+            self.year = year
+        self.rows[kind].extend(rows)
+
+    def flush(self):
+        """
+        Stores the rows collected so far as record arrays.
+        """
+        for kind, rows in self.rows.items():
+            if rows:
+                self.chunks[kind].append(np.array(rows,
+                                                  dtype=EVENT_FIELDS[kind]))
+                self.rows[kind] = []
+
+    def births(self, year, cell, newborns):
+        """
+        :param newborns: List of (parent, newborn), see
+        Landscape.breeding_cycle
+        """
+        self.add("births", year,
+                 [(year, species_code(child), child.id, parent.id, cell,
+                   child.weight) for parent, child in newborns])
+
+    def deaths(self, year, cell, dead):
+        """
+        :param dead: List of animals, see Landscape.death_cycle
+        """
+        self.add("deaths", year, [(year, species_code(animal), animal.id,
+                                   cell, animal.weight) for animal in dead])
+
+    def kills(self, year, cell, kills):
+        """
+        :param kills: List of (carnivore, herbivore), see
+        Landscape.feeding_cycle
+        """
+        self.add("kills", year, [(year, herbivore.id, carnivore.id, cell,
+                                  herbivore.weight)
+                                 for carnivore, herbivore in kills])
+
+    def migrations(self, year, source, moves):
+        """
+        :param source: Cell the animals leave
+        :param moves: List of (destination cell, animal)
+        """
+        self.add("migrations", year, [(year, species_code(animal),
+                                       animal.id, source, destination)
+                                      for destination, animal in moves])
+
+    def arrays(self, kind):
+        """
+        :param kind: "births", "deaths", "kills" or "migrations"
+        :return: numpy record array with the events of that kind
+        """
+        self.flush()
+        chunks = self.chunks[kind]
+        if not chunks:
+            return np.zeros(0, dtype=EVENT_FIELDS[kind])
+        if len(chunks) > 1:
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    def save(self, path):
+        """
+        Saves the log as a compressed .npz file.
+        """
+        np.savez_compressed(path, **{kind: self.arrays(kind)
+                                     for kind in EVENT_FIELDS})
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a log saved with save.
+
+        :return: EventLog instance
+        """
+        log = cls()
+        with np.load(path) as data:
+            for kind in EVENT_FIELDS:
+                log.chunks[kind].append(data[kind])
+        return log
+
+
+def year_slices(events, start, stop):
+    """
+    :param events: Record array of events with a "year" field
+    :param start: First year
+    :param stop: Year after the last year
+    :return: List of the record arrays of the events in each year
+    """
+    years = events["year"]
+    if np.any(years[1:] < years[:-1]):
+        events = events[np.argsort(years, kind="mergesort")]
+        years = events["year"]
+    bounds = np.searchsorted(years, np.arange(start, stop + 1)).tolist()
+    return [events[low:high] for low, high in zip(bounds[:-1], bounds[1:])]
+
+
+def replay(checkpoint, log, year):
+    """
+    Reconstructs which animals were on the island after a year, from a
+    checkpoint of an earlier year and the events logged since, without
+    simulating. Ages and cells are exact. Weights are those at the
+    checkpoint or at birth, as feeding, weightloss and procreation are not
+    logged.
+
+    :param checkpoint: Directory of a checkpoint with animal ids, written at
+    or before the year
+    :param log: EventLog of the simulation after the checkpoint
+    :param year: Year to reconstruct, the island.year of the wanted state
+    :return: Dictionary mapping "herbivores" and "carnivores" to
+    dictionaries of arrays "id", "cell", "age" and "weight", in id order
+    """
+    manifest, arrays = read(checkpoint)
+    start = manifest["year"]
+    if year < start:
+        raise ValueError('Checkpoint of year {} is after year {}!'
+                         .format(start, year))
+    if "herbivores_id" not in arrays:
+        raise ValueError('Checkpoint has no animal ids!')
+    # Animals are kept as [cell, year of birth, weight], the age after
+    # <year> is year - year of birth
+    animals = [{} for _ in SPECIES]
+    for code, species in enumerate(SPECIES):
+        for animal_id, cell, age, weight in zip(
+                arrays[species + "_id"].tolist(),
+                arrays[species + "_cell"].tolist(),
+                arrays[species + "_age"].tolist(),
+                arrays[species + "_weight"].tolist()):
+            animals[code][animal_id] = [cell, start - age, weight]
+
+    events = {kind: year_slices(log.arrays(kind), start, year)
+              for kind in EVENT_FIELDS}
+    for index, current in enumerate(range(start, year)):
+        for animal_id in events["kills"][index]["id"].tolist():
+            animals[0].pop(animal_id, None)
+        births = events["births"][index]
+        for code, animal_id, cell, weight in zip(
+                births["species"].tolist(), births["id"].tolist(),
+                births["cell"].tolist(), births["weight"].tolist()):
+            animals[code][animal_id] = [cell, current, weight]
+        moves = events["migrations"][index]
+        for code, animal_id, destination in zip(
+                moves["species"].tolist(), moves["id"].tolist(),
+                moves["destination"].tolist()):
+            animals[code][animal_id][0] = destination
+        deaths = events["deaths"][index]
+        for code, animal_id in zip(deaths["species"].tolist(),
+                                   deaths["id"].tolist()):
+            animals[code].pop(animal_id, None)
+
+    state = {}
+    for code, species in enumerate(SPECIES):
+        ids = sorted(animals[code])
+        columns = np.array([animals[code][i] for i in ids],
+                           dtype=float).reshape(-1, 3)
+        state[species] = {"id": np.array(ids, dtype=np.int64),
+                          "cell": columns[:, 0].astype(int),
+                          "age": year - columns[:, 1].astype(int),
+                          "weight": columns[:, 2]}
+    return state
@@ -0,0 +1,225 @@
+# -*- Utf-8 -*-
+
+import json
+import os
+import numpy as np
+
+"""
+History module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class HistoryStore(object):
+    """
+    Class object: HistoryStore.
+    On-disk history of the number of herbivores and carnivores and the
+    fodder in every cell, year by year. Years are kept in chunks of
+    <chunk_years> years, each chunk in its own file: .npy files that are
+    read memory mapped, or compressed .npz files. Only the chunk being
+    filled is kept in memory.
+        - <var> = HistoryStore(directory, shape) to write a new store
+        - sim.add_recorder(<var>) appends every simulated year
+        - <var>.close() writes the last chunk
+        - <var> = HistoryStore.open(directory) to read
+        - <var>.cell(y, x), <var>.year(year), <var>.region(rows, cols)
+    """
+
+    def __init__(self, directory, shape, chunk_years=100, compress=False):
+        """
+        :param directory: Directory of the store, made if missing
+        :param shape: Shape (rows, columns) of the island
+        :param chunk_years: Number of years in each chunk
+        :param compress: Write compressed .npz chunks instead of .npy
+        """
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.chunk_years = chunk_years
+        self.compress = compress
+        self.first_year = None
+        self.length = 0
+        self.buffer = None
+        self.loaded = (None, None)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @classmethod
+    def open(cls, directory):
+        """
+        Opens a store written earlier. More years can be appended.
+
+        :param directory: Directory of the store
+        :return: HistoryStore instance
+        """
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        store = cls(directory, manifest["shape"], manifest["chunk_years"],
+                    manifest["compress"])
+        store.first_year = manifest["first_year"]
+        store.length = manifest["length"]
+        used = store.length % store.chunk_years
+        if used:
+            partial = store.chunk(store.length // store.chunk_years)
+            store.buffer = store.new_buffer()
+            for stored, part in zip(store.buffer, partial):
+                stored[:used] = part
+        return store
+
+    def path(self, index, name=None):
+        """
+        :param index: Number of the chunk
+        :param name: "counts" or "fodder" for the .npy files of a chunk
+        :return: Path of a file of the chunk
+        """
+        if self.compress:
+            return os.path.join(self.directory,
+                                'chunk{:05d}.npz'.format(index))
+        return os.path.join(self.directory,
+                            'chunk{:05d}_{}.npy'.format(index, name))
+
+    def new_buffer(self):
+        """
+        :return: Empty arrays (counts, fodder) for one chunk
+        """
+        return (np.zeros((self.chunk_years, 2) + self.shape, dtype=np.int32),
+                np.zeros((self.chunk_years,) + self.shape))
+
+    def append(self, counts, fodder, year=None):
+        """
+        Adds the next year.
+
+        :param counts: Array of shape (2, rows, columns) with herbivores and
+        carnivores in each cell
+        :param fodder: Array of shape (rows, columns) with the fodder
+        :param year: Year of the data, must follow the last year stored
+        """
+        if self.first_year is None:
+            self.first_year = 0 if year is None else year
+        elif year is not None and year != self.first_year + self.length:
+            raise ValueError('Year {} does not follow year {}!'.format(
+                year, self.first_year + self.length - 1))
+        if self.buffer is None:
+            self.buffer = self.new_buffer()
+        row = self.length % self.chunk_years
+        self.buffer[0][row] = counts
+        self.buffer[1][row] = fodder
+        self.length += 1
+        if self.length % self.chunk_years == 0:
+            self.flush()
+            self.buffer = None
+
+    def __call__(self, sim):
+        """
+        Recorder appending the year just simulated, see BioSim.add_recorder.
+
+        :param sim: BioSim instance
+        """
+        self.append(sim.island.counts(), sim.island.food(), sim.island.year)
+
+    def flush(self):
+        """
+        Writes the chunk being filled, and the manifest.
+        """
+        if self.buffer is not None:
+            index = (self.length - 1) // self.chunk_years
+            used = self.length - index * self.chunk_years
+            counts, fodder = self.buffer[0][:used], self.buffer[1][:used]
+            if self.compress:
+                np.savez_compressed(self.path(index), counts=counts,
+                                    fodder=fodder)
+            else:
+                np.save(self.path(index, "counts"), counts)
+                np.save(self.path(index, "fodder"), fodder)
+            if self.loaded[0] == index:
+                self.loaded = (None, None)
+        manifest = {"shape": list(self.shape),
+                    "chunk_years": self.chunk_years,
+                    "compress": self.compress,
+                    "first_year": self.first_year,
+                    "length": self.length}
+        with open(os.path.join(self.directory, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    def close(self):
+        """
+        Writes everything not yet on disk.
+        """
+        self.flush()
+
+    def chunk(self, index):
+        """
+        :param index: Number of the chunk
+        :return: Arrays (counts, fodder) of the chunk, memory mapped for .npy
+        chunks
+        """
+        if self.buffer is not None and index == self.length // \
+                self.chunk_years and self.length % self.chunk_years:
+            used = self.length % self.chunk_years
+            return self.buffer[0][:used], self.buffer[1][:used]
+        if self.loaded[0] != index:
+            if self.compress:
+                with np.load(self.path(index)) as data:
+                    chunk = data["counts"], data["fodder"]
+            else:
+                chunk = tuple(np.load(self.path(index, name), mmap_mode='r')
+                              for name in ("counts", "fodder"))
+            self.loaded = (index, chunk)
+        return self.loaded[1]
+
+    def chunks(self):
+        """
+        :return: Generator giving (counts, fodder) chunk by chunk
+        """
+        for index in range((self.length + self.chunk_years - 1) //
+                           self.chunk_years):
+            yield self.chunk(index)
+
+    def years(self):
+        """
+        :return: Array with the years stored
+        """
+        if self.first_year is None:
+            return np.zeros(0, dtype=int)
+        return np.arange(self.first_year, self.first_year + self.length)
+
+    def year(self, year):
+        """
+        :param year: A stored year
+        :return: Tuple (counts, fodder) with arrays of shape
+        (2, rows, columns) and (rows, columns)
+        """
+        position = year - (self.first_year or 0)
+        if not 0 <= position < self.length:
+            raise ValueError('Year {} is not stored!'.format(year))
+        counts, fodder = self.chunk(position // self.chunk_years)
+        row = position % self.chunk_years
+        return np.array(counts[row]), np.array(fodder[row])
+
+    def cell(self, y, x):
+        """
+        :param y: Row of the cell
+        :param x: Column of the cell
+        :return: Tuple (counts, fodder) with arrays of shape (years, 2) and
+        (years,)
+        """
+        parts = [(np.array(counts[:, :, y, x]), np.array(fodder[:, y, x]))
+                 for counts, fodder in self.chunks()]
+        if not parts:
+            return np.zeros((0, 2), dtype=np.int32), np.zeros(0)
+        return (np.concatenate([part[0] for part in parts]),
+                np.concatenate([part[1] for part in parts]))
+
+    def region(self, rows, cols):
+        """
+        :param rows: Slice of rows
+        :param cols: Slice of columns
+        :return: Array of shape (years, 2) with the number of herbivores and
+        carnivores in the region each year
+        """
+        parts = [np.asarray(counts[:, :, rows, cols]).sum(axis=(2, 3))
+                 for counts, _ in self.chunks()]
+        if not parts:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.concatenate(parts)
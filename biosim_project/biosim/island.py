@@ -1,8 +1,9 @@
 # -*- Utf-8 -*-
 
 import numpy as np
+from biosim.animals import Herbivore, Carnivore
 from biosim.landscape import Jungle, Savannah, Desert, Mountain, Ocean
-import random
+from biosim.rng import RandomStreams
 
 """
 Module Island
@@ -17,15 +18,96 @@ class Island(object):
     Class object: Island.
         - <var> = Island(String of landscape types)
         - <var>.build_map() must run before simulation starts
+    Optional per-cell arrays for "fmax" and "alpha" override the class
+    parameters of Jungle and Savannah cells. Cells set to nan in these arrays
+    use the class parameters. "alpha" only applies to Savannah cells, as
+    Jungle cells are always replenished to "fmax".
+    Parameters are the class parameters unless the island is given a
+    Parameters instance of its own.
+    Each island owns its random number generator, so several islands in
+    one process do not affect each other. If a seed is given, every cell
+    draws from its own random stream in each phase (see RandomStreams), and
+    the results do not depend on the order the cells are processed in.
+    With common_random_numbers every animal slot of a cell also has its own
+    stream, see SlotStreams.
+    <var>.offset is added to the coordinates used to key the streams, for
+    islands that are a part of a larger map.
+    Events are recorded in <var>.events if it is an EventLog.
     """
 
-    def __init__(self, island_map):
+    def __init__(self, island_map, fmax=None, alpha=None, seed=None,
+                 parameters=None, common_random_numbers=False):
         """
         :param island_map: Map of island as string of "biomes"
+        :param fmax: Optional array with "fmax" for each cell
+        :param alpha: Optional array with "alpha" for each cell
+        :param seed: Optional seed for per-cell random streams
+        :param parameters: Optional Parameters instance for this island
+        :param common_random_numbers: Give each animal slot its own random
+        stream. Needs a seed.
         """
+        if common_random_numbers and seed is None:
+            raise ValueError('Common random numbers need a seed!')
         self.island_map = island_map
         self.island_temp = []
         self.island = None
+        self.year = 0
+        self.fmax = None if fmax is None else np.asarray(fmax, dtype=float)
+        self.alpha = None if alpha is None else np.asarray(alpha, dtype=float)
+        self.jungle = None
+        self.savannah = None
+        self.streams = None if seed is None else RandomStreams(
+            seed, common_random_numbers)
+        self.rng = np.random.RandomState(seed)
+        self.parameters = parameters
+        self.offset = (0, 0)
+        self.events = None
+        self.next_id = 0
+
+    def reseed(self, seed):
+        """
+        Gives the island new random streams, keeping the random number mode.
+
+        :param seed: New seed
+        """
+        slots = self.streams is not None and self.streams.slots
+        self.streams = RandomStreams(seed, slots)
+        self.rng = np.random.RandomState(seed)
+
+    @staticmethod
+    def check_map(island_map, fmax=None, alpha=None):
+        """
+        Raises ValueError if a map has unknown letters or rows of different
+        length, or if the "fmax" or "alpha" arrays do not match its shape or
+        have negative values.
+
+        :param island_map: Map of island as string of "biomes"
+        :param fmax: Optional array with "fmax" for each cell
+        :param alpha: Optional array with "alpha" for each cell
+        :return: List of map rows, each a list of letters
+        """
+        geography = [list(row) for row in island_map.replace(" ", ""
+                                                             ).split("\n")]
+        for row in geography:
+            for cell in row:
+                if cell not in "JSDMO":
+                    raise ValueError('"{}" is not properly defined! '
+                                     'Use capital letters.'.format(cell))
+        if len(set(len(row) for row in geography)) != 1:
+            raise ValueError('All rows of the map must have the same length!')
+        shape = (len(geography), len(geography[0]))
+        for grid in (fmax, alpha):
+            if grid is None:
+                continue
+            if np.shape(grid) != shape:
+                raise ValueError('Parameter grid of shape {} does not match '
+                                 'island of shape {}!'
+                                 .format(np.shape(grid), shape))
+            values = np.asarray(grid, dtype=float)
+            if np.any(values[~np.isnan(values)] < 0):
+                raise ValueError('Parameter grids must not have negative '
+                                 'values!')
+        return geography
 
     def build_map(self):
         """
@@ -33,8 +115,7 @@ class Island(object):
         Island biomes are placed in a two dimensional array
         """
 
-        geography = [list(row) for row in self.island_map.replace(" ", ""
-                                                                  ).split("\n")]
+        geography = self.check_map(self.island_map, self.fmax, self.alpha)
         for row in geography:
             temp = []
             for cell in row:
@@ -46,41 +127,178 @@ class Island(object):
                     temp.append(Desert())
                 elif cell == "M":
                     temp.append(Mountain())
-                elif cell == "O":
-                    temp.append(Ocean())
                 else:
-                    raise ValueError('"{}" is not properly defined! '
-                                     'Use capital letters.')
+                    temp.append(Ocean())
             self.island_temp.append(temp)
         self.island = np.array(self.island_temp)
 
+        cell_types = np.array([[cell.__class__.__name__ for cell in row]
+                               for row in self.island])
+        self.jungle = cell_types == "Jungle"
+        self.savannah = cell_types == "Savannah"
+        if self.parameters is not None:
+            self.use_parameters(self.parameters)
+        self.set_food(self.food_parameters()[0])
+
+    def use_parameters(self, parameters):
+        """
+        Makes all cells and animals on the island use the given parameters
+        instead of the class parameters.
+
+        :param parameters: Parameters instance
+        """
+        self.parameters = parameters
+        for cell in self.island.flat:
+            parameters.bind(cell)
+
+    def animal_params(self, species):
+        """
+        Returns the parameters new animals of a species should use.
+
+        :param species: "Herbivore" or "Carnivore"
+        :return: Parameter dictionary, or None to use the class parameters
+        """
+        if self.parameters is None:
+            return None
+        return self.parameters.animal_params[species]
+
+    def food_parameters(self):
+        """
+        Resolves "fmax" and "alpha" for every cell. Jungle cells are
+        replenished to "fmax" each year, which is the same as "alpha" = 1,
+        so the "alpha" grid is only used in Savannah cells.
+
+        :return: Tuple of arrays (fmax, alpha). Both are 0 in cells that
+        do not grow food.
+        """
+        if self.parameters is None:
+            jungle, savannah = Jungle.params, Savannah.params
+        else:
+            jungle = self.parameters.landscape_params["J"]
+            savannah = self.parameters.landscape_params["S"]
+        fmax = (self.jungle * jungle["fmax"] +
+                self.savannah * savannah["fmax"])
+        alpha = self.jungle * 1.0 + self.savannah * savannah["alpha"]
+        growing = self.jungle | self.savannah
+        if self.fmax is not None:
+            fmax = np.where(growing & ~np.isnan(self.fmax), self.fmax, fmax)
+        if self.alpha is not None:
+            alpha = np.where(self.savannah & ~np.isnan(self.alpha),
+                             self.alpha, alpha)
+        return fmax, alpha
+
+    def food(self):
+        """
+        Returns the available food for herbivores in each cell
+
+        :return: Array of available food
+        """
+        food = [cell.available_food_herb for cell in self.island.flat]
+        return np.array(food, dtype=float).reshape(self.island.shape)
+
+    def set_food(self, food):
+        """
+        Sets the available food for herbivores in each cell that grows food
+
+        :param food: Array of available food
+        """
+        growing = (self.jungle | self.savannah).flat
+        for cell, amount, grows in zip(self.island.flat, food.flat, growing):
+            if grows:
+                cell.available_food_herb = float(amount)
+
     def grow(self):
         """
-        Runs through growth cycle for each cell in <var>.island.
-        Runs only if the cell i capable of growing food
+        Runs through growth cycle for all cells in <var>.island at once.
+        Food only grows in Jungle and Savannah cells, using the per-cell
+        parameters from food_parameters.
         """
-        for row in self.island:
-            for cell in row:
-                if cell.__class__.__name__ == "Jungle":
-                    cell.grow_food()
-                elif cell.__class__.__name__ == "Savannah":
-                    cell.grow_food()
+        fmax, alpha = self.food_parameters()
+        food = self.food()
+        self.set_food(food + alpha * (fmax - food))
+
+    def cell_rng(self, coordinates, phase):
+        """
+        Returns the random number generator a cell uses in a phase of the
+        current year.
+
+        :param coordinates: Coordinates (y, x) of the cell
+        :param phase: Name of the phase, see biosim.rng.PHASES
+        :return: Per-cell stream if the island is seeded, else the island's
+        own generator
+        """
+        if self.streams is None:
+            return self.rng
+        return self.streams.stream(self.year,
+                                   (coordinates[0] + self.offset[0],
+                                    coordinates[1] + self.offset[1]), phase)
+
+    def occupied_cells(self):
+        """
+        Returns the cells with at least one animal, row by row. Empty cells
+        draw no random numbers, so the stochastic phases can skip them.
+
+        :return: List of (coordinates, cell)
+        """
+        return [(coordinates, cell) for coordinates, cell
+                in np.ndenumerate(self.island)
+                if cell.herbivores or cell.carnivores]
+
+    def reserve_ids(self, count):
+        """
+        Takes <count> consecutive animal ids from the island's counter.
+
+        :param count: Number of ids
+        :return: The first id, or None if the island hands out no ids
+        """
+        if self.next_id is None:
+            return None
+        first = self.next_id
+        self.next_id += count
+        return first
+
+    def assign_ids(self, animals):
+        """
+        Gives the animals without an id the next ids of the island, in
+        order. Islands with <var>.next_id None (tiles) hand out no ids.
+
+        :param animals: Sequence of animals
+        """
+        if self.next_id is None:
+            return
+        for animal in animals:
+            if animal.id is None:
+                animal.id = self.next_id
+                self.next_id += 1
+
+    def cell_index(self, coordinates):
+        """
+        :param coordinates: Coordinates (y, x) of a cell
+        :return: Number of the cell, counting row by row
+        """
+        return coordinates[0] * self.island.shape[1] + coordinates[1]
 
     def feeding(self):
         """
         Runs animal level feeding method on each animal in each cell
         """
-        for row in self.island:
-            for cell in row:
-                cell.feeding_cycle()
+        for coordinates, cell in self.occupied_cells():
+            kills = cell.feeding_cycle(self.cell_rng(coordinates, "feeding"))
+            if self.events is not None:
+                self.events.kills(self.year, self.cell_index(coordinates),
+                                  kills)
 
     def procreation(self):
         """
         Runs animal level breeding method on each animal in each cell
         """
-        for row in self.island:
-            for cell in row:
-                cell.breeding_cycle()
+        for coordinates, cell in self.occupied_cells():
+            newborns = cell.breeding_cycle(self.cell_rng(coordinates,
+                                                         "procreation"))
+            self.assign_ids([newborn for _, newborn in newborns])
+            if self.events is not None:
+                self.events.births(self.year, self.cell_index(coordinates),
+                                   newborns)
 
     def surrounding_cells(self, coordinate):
         """
@@ -128,7 +346,7 @@ class Island(object):
         for row in range(len(self.island)):
             for cell in range(len(self.island[row])):
                 coordinates.append((row, cell))
-        random.shuffle(coordinates)
+        self.rng.shuffle(coordinates)
         return coordinates
 
     def surrounding_cells_relative_food(self, y, x, species):
@@ -155,29 +373,68 @@ class Island(object):
                     (surrounding_cell, self.island[y][x].relative_food_carn()))
         return nested_list
 
+    def migration_decisions(self, coordinates):
+        """
+        Decides which animals in a cell migrate and where to. No animals are
+        moved.
+
+        :param coordinates: Coordinates (y, x) of the cell
+        :return: Tuple with lists of (new coordinates, animal) for the
+        herbivores and the carnivores that migrate
+        """
+        y, x = coordinates
+        rng = self.cell_rng(coordinates, "migration")
+        migrating_herbivores = self.island[y][x].migration_cycle_herb(
+            self.surrounding_cells_relative_food(y, x, "herbivore"), rng)
+        migrating_carnivores = self.island[y][x].migration_cycle_carn(
+            self.surrounding_cells_relative_food(y, x, "carnivore"), rng)
+        return migrating_herbivores, migrating_carnivores
+
+    def move_animals(self, coordinates, migrating_herbivores,
+                     migrating_carnivores):
+        """
+        Moves migrating animals from a cell to their new cells.
+
+        :param coordinates: Coordinates (y, x) of the cell they leave
+        :param migrating_herbivores: List of (new coordinates, herbivore)
+        :param migrating_carnivores: List of (new coordinates, carnivore)
+        """
+        y, x = coordinates
+        for herbivore in migrating_herbivores:
+            if herbivore[0] is not None:
+                new_y, new_x = herbivore[0]
+                self.island[new_y][new_x].herbivores.append(herbivore[1])
+                self.island[y][x].herbivores.remove(herbivore[1])
+
+        for carnivore in migrating_carnivores:
+            if carnivore[0] is not None:
+                new_y, new_x = carnivore[0]
+                self.island[new_y][new_x].carnivores.append(carnivore[1])
+                self.island[y][x].carnivores.remove(carnivore[1])
+
     def migration(self):
         """
-        Runs the migration process for all cells. Starts at first cell in
-        shuffled list. Resets the has_moved attribute of the animals when
-        all animals have moved.
-        """
-        for coordinates in self.shuffle_coordinates():
-            y, x = coordinates
-            migrating_herbivores = self.island[y][x].migration_cycle_herb(
-                self.surrounding_cells_relative_food(y, x, "herbivore"))
-            for herbivore in migrating_herbivores:
-                if herbivore[0] is not None:
-                    new_y, new_x = herbivore[0]
-                    self.island[new_y][new_x].herbivores.append(herbivore[1])
-                    self.island[y][x].herbivores.remove(herbivore[1])
-
-            migrating_carnivores = self.island[y][x].migration_cycle_carn(
-                self.surrounding_cells_relative_food(y, x, "carnivore"))
-            for carnivore in migrating_carnivores:
-                if carnivore[0] is not None:
-                    new_y, new_x = carnivore[0]
-                    self.island[new_y][new_x].carnivores.append(carnivore[1])
-                    self.island[y][x].carnivores.remove(carnivore[1])
+        Runs the migration process for all cells. All cells decide which
+        animals migrate before any animal is moved, so the decisions only
+        depend on the island at the start of the migration. Unseeded islands
+        visit the cells in shuffled order, seeded islands row by row.
+        Resets the has_moved attribute of the animals when all animals have
+        moved.
+        """
+        if self.streams is None:
+            order = self.shuffle_coordinates()
+        else:
+            order = [coordinates for coordinates, _ in self.occupied_cells()]
+        decisions = [(coordinates, self.migration_decisions(coordinates))
+                     for coordinates in order]
+        for coordinates, (herbivores, carnivores) in decisions:
+            self.move_animals(coordinates, herbivores, carnivores)
+            if self.events is not None:
+                self.events.migrations(
+                    self.year, self.cell_index(coordinates),
+                    [(self.cell_index(destination), animal)
+                     for destination, animal in herbivores + carnivores
+                     if destination is not None])
 
         for row in self.island:
             for cell in row:
@@ -204,9 +461,11 @@ class Island(object):
         """
         Runs death function in each cell
         """
-        for row in self.island:
-            for cell in row:
-                cell.death_cycle()
+        for coordinates, cell in self.occupied_cells():
+            dead = cell.death_cycle(self.cell_rng(coordinates, "death"))
+            if self.events is not None:
+                self.events.deaths(self.year, self.cell_index(coordinates),
+                                   dead)
 
     def individuals(self):
         """
@@ -221,6 +480,76 @@ class Island(object):
             population.append(row_population)
         return np.array(population)
 
+    def counts(self):
+        """
+        Returns the number of herbivores and carnivores in each cell.
+
+        :return: Integer array of shape (2, rows, columns), herbivores first
+        """
+        counts = [(len(cell.herbivores), len(cell.carnivores))
+                  for cell in self.island.flat]
+        return np.array(counts, dtype=np.int32).T.reshape(
+            (2,) + self.island.shape)
+
+    def add_animals(self, species, rows, cols, ages, weights):
+        """
+        Adds many animals at once. The animals are grouped by cell and
+        species and each group is made and added in one go, in the order
+        given, with consecutive ids.
+
+        :param species: Integer array, 0 for herbivores and 1 for carnivores
+        :param rows: Integer array with the row of each animal
+        :param cols: Integer array with the column of each animal
+        :param ages: Array with the age of each animal
+        :param weights: Array with the weight of each animal
+        """
+        species = np.asarray(species, dtype=int)
+        rows = np.asarray(rows, dtype=int)
+        cols = np.asarray(cols, dtype=int)
+        ages = np.asarray(ages)
+        weights = np.asarray(weights, dtype=float)
+        height, width = self.island.shape
+        if np.any((rows < 0) | (rows >= height) | (cols < 0) |
+                  (cols >= width)):
+            raise ValueError('Animals placed outside the island!')
+        if np.any((species != 0) & (species != 1)):
+            raise ValueError('Species must be 0 or 1!')
+        keys = (rows * width + cols) * 2 + species
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        stops = np.r_[starts[1:], len(keys)]
+        for start, stop in zip(starts, stops):
+            cell, code = divmod(int(keys[start]), 2)
+            y, x = divmod(cell, width)
+            group = order[start:stop]
+            cls = Carnivore if code else Herbivore
+            animals = cls.many(weights[group].tolist(), ages[group].tolist(),
+                               (y, x), self.animal_params(cls.__name__),
+                               self.reserve_ids(len(group)))
+            target = self.island[y][x]
+            if code:
+                target.carnivores.extend(animals)
+            else:
+                target.herbivores.extend(animals)
+
+    def animal_attributes(self):
+        """
+        Collects age, weight and fitness of every animal on the island in one
+        pass.
+
+        :return: Dictionary with an array for "herbivores" and "carnivores",
+        with one row per animal and the columns (age, weight, fitness)
+        """
+        herbivores = [(animal.age, animal.weight, animal.fitness)
+                      for cell in self.island.flat
+                      for animal in cell.herbivores]
+        carnivores = [(animal.age, animal.weight, animal.fitness)
+                      for cell in self.island.flat
+                      for animal in cell.carnivores]
+        return {"herbivores": np.array(herbivores, dtype=float).reshape(-1, 3),
+                "carnivores": np.array(carnivores, dtype=float).reshape(-1, 3)}
+
     def one_year(self):
         """
         Simulates one year progression and returns array containing the
@@ -233,4 +562,5 @@ class Island(object):
         self.aging()
         self.loss_of_weight()
         self.death()
+        self.year += 1
         return self.individuals()
@@ -1,6 +1,8 @@
 # -*- Utf-8 -*-
 
 from biosim.animals import Herbivore, Carnivore
+from biosim.rng import slot_streams
+from itertools import izip
 import numpy as np
 
 """
@@ -17,6 +19,7 @@ class Landscape(object):
     """
 
     params = None
+    parameters = None
 
     def __init__(self, carnivores=None, herbivores=None):
         """
@@ -63,19 +66,39 @@ class Landscape(object):
         return sorted([(individual, individual.fitness
                         ) for individual in animals], key=lambda x: x[1])[::-1]
 
-    def feeding_cycle(self):
+    def feeding_cycle(self, rng=np.random):
         """
         Starts the feeding cycle for herbivores in a single cell.
         Highest fitness first.
+
+        :param rng: Random number generator used by the carnivores, or
+        SlotStreams
+        :return: List of (carnivore, herbivore) for each herbivore killed
         """
         sorted_ = self.calc_fitness(self.herbivores)
         for animal in sorted_:
             self.available_food_herb = animal[0].feeding(
                 self.available_food_herb)
 
+        kills = []
         sort = self.calc_fitness(self.carnivores)
-        for carnivore in sort:
-            self.herbivores = carnivore[0].feeding(self.herbivores)
+        for carnivore, carnivore_rng in izip(sort,
+                                             slot_streams(rng, "carnivores")):
+            self.herbivores = carnivore[0].feeding(
+                self.herbivores, carnivore_rng, kills)
+        return kills
+
+    def animal_params(self, species):
+        """
+        Returns the parameters used by animals of a species in this cell.
+
+        :param species: "Herbivore" or "Carnivore"
+        :return: Parameters of the simulation the cell belongs to, or None if
+        the cell uses the class parameters
+        """
+        if self.parameters is None:
+            return None
+        return self.parameters.animal_params[species]
 
     def relative_food_carn(self):
         """
@@ -84,8 +107,9 @@ class Landscape(object):
         :return: Amount of relative food for carnivores
         """
         self.herbivore_weight()
+        params = self.animal_params("Carnivore") or Carnivore.params
         self.relative_food_carnivore = (self.available_food_carn/((
-            len(self.carnivores) + 1) * Carnivore.params["F"]))
+            len(self.carnivores) + 1) * params["F"]))
         return self.relative_food_carnivore
 
     def relative_food_herb(self):
@@ -94,66 +118,82 @@ class Landscape(object):
 
         :return: Amount of relative food for herbivore
         """
+        params = self.animal_params("Herbivore") or Herbivore.params
         self.relative_food_herbivore = (self.available_food_herb/((
-            len(self.herbivores) + 1) * Herbivore.params["F"]))
+            len(self.herbivores) + 1) * params["F"]))
         return self.relative_food_herbivore
 
-    def breeding_cycle(self):
+    def breeding_cycle(self, rng=np.random):
         """
         Starts the breeding cycle for both species in a single cell
         If breeding is successful, the method appends a new animal
         of the same species to the list of animals
+
+        :param rng: Random number generator, or SlotStreams
+        :return: List of (parent, newborn) for each birth
         """
+        newborns = []
         not_newborn_herbivores = len(self.herbivores)
         not_newborn_carnivores = len(self.carnivores)
         sorted_herbivores = self.calc_fitness(self.herbivores)
         sorted_carnivores = self.calc_fitness(self.carnivores)
-        for herb in sorted_herbivores:
-            result = herb[0].breeding(not_newborn_herbivores)
+        for herb, herb_rng in izip(sorted_herbivores,
+                                   slot_streams(rng, "herbivores")):
+            result = herb[0].breeding(not_newborn_herbivores, herb_rng)
             if result is not None:
-                self.herbivores.append(Herbivore(result, coordinates=herb[0].
-                                                 coordinates))
-
-        for carn in sorted_carnivores:
-            result = carn[0].breeding(not_newborn_carnivores)
+                self.herbivores.append(Herbivore(
+                    result, coordinates=herb[0].coordinates,
+                    params=self.animal_params("Herbivore")))
+                newborns.append((herb[0], self.herbivores[-1]))
+
+        for carn, carn_rng in izip(sorted_carnivores,
+                                   slot_streams(rng, "carnivores")):
+            result = carn[0].breeding(not_newborn_carnivores, carn_rng)
             if result is not None:
-                self.carnivores.append(Carnivore(result, coordinates=carn[0].
-                                                 coordinates))
+                self.carnivores.append(Carnivore(
+                    result, coordinates=carn[0].coordinates,
+                    params=self.animal_params("Carnivore")))
+                newborns.append((carn[0], self.carnivores[-1]))
+        return newborns
 
-    def migration_cycle_herb(self, _list):
+    def migration_cycle_herb(self, _list, rng=np.random):
         """
         Starts the migration cycle for the herbivores in the cell.
 
         :param _list: Nested list with possible coordinates the herbivores may
         move to and the relative food for each cell.
+        :param rng: Random number generator, or SlotStreams
         :return: List of animals that are migrating and their new position
         """
 
         migrating_herbivores = []
-        for herbivore in self.herbivores:
+        for herbivore, animal_rng in izip(self.herbivores,
+                                          slot_streams(rng, "herbivores")):
             if not herbivore.has_moved:
-                if herbivore.check_migrate():
+                if herbivore.check_migrate(animal_rng):
                     herbivore.has_moved = True
-                    migrating_herbivores.append((herbivore.migrate(_list),
-                                                 herbivore))
+                    migrating_herbivores.append(
+                        (herbivore.migrate(_list, animal_rng), herbivore))
         return migrating_herbivores
 
-    def migration_cycle_carn(self, _list):
+    def migration_cycle_carn(self, _list, rng=np.random):
         """
         Starts the migration cycle for the carnivores in the cell.
 
         :param _list: Nested list with possible coordinates the carnivores may
         move to and the relative food for each cell.
+        :param rng: Random number generator, or SlotStreams
 
         :return: List of animals that are migrating and their new position
         """
         migrating_carnivores = []
-        for carnivore in self.carnivores:
+        for carnivore, animal_rng in izip(self.carnivores,
+                                          slot_streams(rng, "carnivores")):
             if not carnivore.has_moved:
-                if carnivore.check_migrate():
+                if carnivore.check_migrate(animal_rng):
                     carnivore.has_moved = True
-                    migrating_carnivores.append((carnivore.migrate(_list),
-                                                 carnivore))
+                    migrating_carnivores.append(
+                        (carnivore.migrate(_list, animal_rng), carnivore))
         return migrating_carnivores
 
     def age_cycle(self):
@@ -170,18 +210,38 @@ class Landscape(object):
         for animal in self.herbivores + self.carnivores:
             animal.weightloss()
 
-    def death_cycle(self):
+    def death_cycle(self, rng=np.random):
         """
         Starts the death-function for each animal.
-        Removes animals who are "dead" (Animal death method returns "True")
+        Removes animals who are "dead" (Animal death method returns "True").
+        Every animal draws with the slot it had at the start of the cycle.
+
+        :param rng: Random number generator, or SlotStreams
+        :return: List of the animals that died
+        """
+        dead = []
+        for species in ("herbivores", "carnivores"):
+            animals = getattr(self, species)
+            survivors = []
+            for animal, animal_rng in izip(animals,
+                                           slot_streams(rng, species)):
+                if animal.death(animal_rng):
+                    dead.append(animal)
+                else:
+                    survivors.append(animal)
+            animals[:] = survivors
+        return dead
+
+    @staticmethod
+    def check_parameters(new_params):
         """
-        for herb in self.herbivores:
-            if herb.death():
-                self.herbivores.remove(herb)
+        Raises ValueError if any of the given parameter values are invalid
 
-        for carn in self.carnivores:
-            if carn.death():
-                self.carnivores.remove(carn)
+        :param new_params: New set of parameters as dictionary
+        """
+        for param in new_params:
+            if new_params[param] < 0:
+                raise ValueError('Parameter "{}" is negative!'.format(param))
 
     @classmethod
     def set_parameters(cls, new_params):
@@ -190,9 +250,7 @@ class Landscape(object):
 
         :param new_params: New set of parameters as dictionary
         """
-        for param in new_params:
-            if new_params[param] < 0:
-                raise ValueError('Parameter "{}" is negative!'.format(param))
+        cls.check_parameters(new_params)
         cls.params.update(new_params)
 
     def number_of_individuals(self):
@@ -0,0 +1,187 @@
+# -*- Utf-8 -*-
+
+import itertools
+import os
+import zipfile
+import numpy as np
+from numpy.lib import format as npy_format
+
+"""
+Loader module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+POPULATION_COLUMNS = ("species", "row", "col", "age", "weight")
+
+
+def columns(species, rows, cols, ages, weights):
+    """
+    :return: Dictionary of population arrays as given by the readers
+    """
+    return {"species": np.asarray(species),
+            "loc": np.column_stack((np.asarray(rows, dtype=int),
+                                    np.asarray(cols, dtype=int))),
+            "age": np.asarray(ages, dtype=int),
+            "weight": np.asarray(weights, dtype=float)}
+
+
+def read_csv(path, chunk_size=100000):
+    """
+    Reads a population file with a header line and the comma separated
+    columns species, row, col, age and weight, in any order. Species is
+    "Herbivore" or "Carnivore", and row and col count from 1 as the "loc" of
+    BioSim.add_population.
+
+    :param path: Path of the file
+    :param chunk_size: Number of animals in each chunk
+    :return: Generator giving dictionaries with the arrays "species", "loc",
+    "age" and "weight", chunk by chunk
+    """
+    with open(path) as f:
+        header = [name.strip() for name in f.readline().split(',')]
+        missing = set(POPULATION_COLUMNS) - set(header)
+        if missing:
+            raise ValueError('Population file misses the columns {}!'
+                             .format(', '.join(sorted(missing))))
+        positions = [header.index(name) for name in POPULATION_COLUMNS]
+        while True:
+            lines = [line for line in itertools.islice(f, chunk_size)
+                     if line.strip()]
+            if not lines:
+                break
+            fields = zip(*[line.split(',') for line in lines])
+            species, rows, cols, ages, weights = [fields[position]
+                                                  for position in positions]
+            yield columns([name.strip() for name in species],
+                          [int(row) for row in rows],
+                          [int(col) for col in cols],
+                          [int(age) for age in ages],
+                          [float(weight) for weight in weights])
+
+
+def npy_chunks(f, chunk_size):
+    """
+    Reads an array stored in .npy format from an open file, chunk_size rows
+    at a time, without reading the rest of the file.
+
+    :param f: File object positioned at the start of the .npy data
+    :param chunk_size: Number of rows in each chunk
+    :return: Generator giving arrays of at most chunk_size rows
+    """
+    version = npy_format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = npy_format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = npy_format.read_array_header_2_0(f)
+    if dtype.hasobject or (fortran_order and len(shape) > 1):
+        raise ValueError('Only plain arrays in C order can be read in '
+                         'chunks!')
+    row_shape = shape[1:]
+    row_bytes = dtype.itemsize * int(np.prod(row_shape))
+    for start in range(0, shape[0], chunk_size):
+        rows = min(chunk_size, shape[0] - start)
+        data = f.read(rows * row_bytes)
+        yield np.frombuffer(data, dtype=dtype).reshape((rows,) + row_shape)
+
+
+def population_columns(names):
+    """
+    :param names: Names of the stored arrays
+    :return: Names of the arrays to read, with "loc" or "row" and "col"
+    """
+    if "loc" in names:
+        return ["species", "loc", "age", "weight"]
+    return ["species", "row", "col", "age", "weight"]
+
+
+def chunk_columns(chunks):
+    """
+    :param chunks: Dictionary mapping the names of population_columns to
+    one chunk of each
+    :return: Dictionary of population arrays, see columns
+    """
+    if "loc" in chunks:
+        rows, cols = chunks["loc"][:, 0], chunks["loc"][:, 1]
+    else:
+        rows, cols = chunks["row"], chunks["col"]
+    return columns(chunks["species"], rows, cols, chunks["age"],
+                   chunks["weight"])
+
+
+def read_npz(path, chunk_size=100000):
+    """
+    Reads a population saved with numpy.savez or numpy.savez_compressed with
+    the arrays "species", "row", "col", "age" and "weight", or "loc" instead
+    of "row" and "col". Species are names or 0 for herbivores and 1 for
+    carnivores. The arrays are read from the archive chunk by chunk, so only
+    one chunk of each is in memory at a time.
+
+    :param path: Path of the file
+    :param chunk_size: Number of animals in each chunk
+    :return: Generator giving dictionaries as read_csv
+    """
+    archive = zipfile.ZipFile(path)
+    try:
+        stored = [name[:-4] for name in archive.namelist()
+                  if name.endswith('.npy')]
+        names = population_columns(stored)
+        files = [archive.open(name + '.npy') for name in names]
+        try:
+            readers = [npy_chunks(f, chunk_size) for f in files]
+            for chunks in itertools.izip(*readers):
+                yield chunk_columns(dict(zip(names, chunks)))
+        finally:
+            for f in files:
+                f.close()
+    finally:
+        archive.close()
+
+
+def read_npy(directory, chunk_size=100000):
+    """
+    Reads a population stored as a directory with one .npy file per column,
+    named as the arrays of read_npz, e.g. "species.npy". The files are
+    memory mapped, so chunks are only read from disk when they are used.
+
+    :param directory: Path of the directory
+    :param chunk_size: Number of animals in each chunk
+    :return: Generator giving dictionaries as read_csv
+    """
+    stored = [name[:-4] for name in os.listdir(directory)
+              if name.endswith('.npy')]
+    arrays = {name: np.load(os.path.join(directory, name + '.npy'),
+                            mmap_mode='r')
+              for name in population_columns(stored)}
+    for start in range(0, len(arrays["species"]), chunk_size):
+        stop = start + chunk_size
+        yield chunk_columns({name: values[start:stop]
+                             for name, values in arrays.items()})
+
+
+def load_population(sim, path, chunk_size=100000):
+    """
+    Adds the animals of a population file to a simulation, chunk by chunk,
+    see BioSim.add_animals. Only the file is streamed: every animal added
+    is still one Python object on the island (see Animal.many).
+
+    :param sim: BioSim instance
+    :param path: Path of a .csv or .npz file or a directory of .npy files,
+    see read_csv, read_npz and read_npy
+    :param chunk_size: Number of animals added at a time
+    :return: Number of animals added
+    """
+    if os.path.isdir(path):
+        reader = read_npy
+    elif path.endswith('.npz'):
+        reader = read_npz
+    else:
+        reader = read_csv
+    added = 0
+    for chunk in reader(path, chunk_size):
+        sim.add_animals(chunk["species"], chunk["loc"], chunk["age"],
+                        chunk["weight"])
+        added += len(chunk["age"])
+    return added
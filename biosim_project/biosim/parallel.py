@@ -0,0 +1,427 @@
+# -*- Utf-8 -*-
+
+import heapq
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy as np
+from biosim.island import Island
+from biosim.parameters import Parameters
+from biosim.tiles import Tile, shared_views
+
+"""
+Parallel module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def run_cells(task):
+    """
+    Runs cell-local phases on a chunk of cells in a thread of the pool.
+
+    :param task: Tuple (cells, streams, year, phases), where cells is a list
+    of (coordinates, cell)
+    :return: The list of (coordinates, cell) after the phases
+    """
+    cells, streams, year, phases = task
+    for coordinates, cell in cells:
+        for phase in phases:
+            if phase == "feeding":
+                cell.feeding_cycle(streams.stream(year, coordinates, phase))
+            elif phase == "procreation":
+                cell.breeding_cycle(streams.stream(year, coordinates, phase))
+            elif phase == "ageing":
+                cell.age_cycle()
+            elif phase == "weightloss":
+                cell.weightloss_cycle()
+            elif phase == "death":
+                cell.death_cycle(streams.stream(year, coordinates, phase))
+    return cells
+
+
+def balance(loads, num_chunks):
+    """
+    Splits items into chunks with about the same total load. The heaviest
+    items are placed first, each in the chunk with the lowest load so far.
+
+    :param loads: List of load for each item
+    :param num_chunks: Number of chunks
+    :return: List of lists with item indices, empty chunks are left out
+    """
+    heap = [(0, chunk) for chunk in range(num_chunks)]
+    chunks = [[] for _ in range(num_chunks)]
+    for index in sorted(range(len(loads)), key=lambda i: -loads[i]):
+        load, chunk = heapq.heappop(heap)
+        chunks[chunk].append(index)
+        heapq.heappush(heap, (load + loads[index], chunk))
+    return [sorted(chunk) for chunk in chunks if chunk]
+
+
+def split_runs(loads, num_chunks):
+    """
+    Splits items into runs of consecutive items with about the same total
+    load. Each item goes to the run its middle falls in. Cells taken row by
+    row give chunks of whole rows, so few migrants cross between chunks.
+
+    :param loads: List of load for each item
+    :param num_chunks: Number of chunks
+    :return: List of lists with item indices, empty chunks are left out
+    """
+    loads = np.asarray(loads, dtype=float)
+    centres = np.cumsum(loads) - loads / 2
+    chunks = np.minimum((centres * num_chunks / loads.sum()).astype(int),
+                        num_chunks - 1)
+    return [np.flatnonzero(chunks == chunk).tolist()
+            for chunk in range(num_chunks) if np.any(chunks == chunk)]
+
+
+class Chunk(Tile):
+    """
+    Class object: Chunk.
+    The cells of a ParallelIsland owned by one worker process. Unlike a
+    Tile the owned cells need not be a rectangle, so the chunk holds an
+    Island of the whole map. Animals only live in the owned cells: which
+    animals migrate only depends on the cell they leave and on which cells
+    around it are passable. The cells stay in the worker from year to year;
+    only births, migrants leaving the chunk and the counts are exchanged.
+    """
+
+    def __init__(self, island_map, fmax, alpha):
+        """
+        :param island_map: Map of island as string of "biomes"
+        :param fmax: Optional array with "fmax" for each cell
+        :param alpha: Optional array with "alpha" for each cell
+        """
+        self.layout = (island_map, fmax, alpha)
+        self.island = None
+        self.owned = set()
+        self.region = None
+        self.top = self.left = 0
+        self.width = None
+        self.moves = []
+
+    def load(self, cells, parameters, streams, year):
+        """
+        Takes over cells from the main process, replacing those owned
+        before.
+
+        :param cells: List of (coordinates, cell) to own
+        :param parameters: Parameters instance of the island
+        :param streams: RandomStreams of the island
+        :param year: Year of the island
+        """
+        island_map, fmax, alpha = self.layout
+        self.island = Island(island_map, fmax, alpha, parameters=parameters)
+        self.island.build_map()
+        self.island.streams = streams
+        self.island.year = year
+        self.island.next_id = None
+        self.width = self.island.island.shape[1]
+        self.owned = set()
+        for (y, x), cell in cells:
+            parameters.bind(cell)
+            self.island.island[y][x] = cell
+            self.owned.add((y, x))
+        self.moves = []
+
+    def owns(self, coordinates):
+        """
+        :param coordinates: Coordinates (y, x)
+        :return: True if the cell is owned by the chunk
+        """
+        return tuple(coordinates) in self.owned
+
+    def cells(self):
+        """
+        :return: List of (coordinates, cell) for the owned cells, row by row
+        """
+        return [((y, x), self.island.island[y][x])
+                for y, x in sorted(self.owned)]
+
+    def write_state(self, counts, food):
+        """
+        Writes the number of animals and the food of the owned cells into
+        the shared arrays.
+
+        :param counts: Array of shape (2, rows, columns) for herbivores and
+        carnivores
+        :param food: Array of shape (rows, columns)
+        """
+        for y, x in self.owned:
+            cell = self.island.island[y][x]
+            counts[0, y, x] = len(cell.herbivores)
+            counts[1, y, x] = len(cell.carnivores)
+            food[y, x] = cell.available_food_herb
+
+
+def chunk_worker(connection, chunk, shared_counts, shared_food, shape):
+    """
+    Runs a chunk in a worker process, following commands sent from the
+    ParallelIsland through a connection.
+
+    :param connection: End of a multiprocessing Pipe
+    :param chunk: Chunk instance owned by this worker
+    :param shared_counts: Shared array with animal counts
+    :param shared_food: Shared array with food
+    :param shape: Shape of the whole island
+    """
+    counts, food = shared_views(shared_counts, shared_food, shape)
+    while True:
+        command, argument = connection.recv()
+        if command == "load":
+            chunk.load(*argument)
+            chunk.write_state(counts, food)
+            connection.send(None)
+        elif command == "breed":
+            connection.send(chunk.breed())
+        elif command == "migrate":
+            connection.send(chunk.migrate(argument))
+        elif command == "second_half":
+            chunk.second_half(argument)
+            chunk.write_state(counts, food)
+            connection.send(None)
+        elif command == "cells":
+            connection.send(chunk.cells())
+        elif command == "stop":
+            connection.close()
+            break
+
+
+class ParallelIsland(object):
+    """
+    Class object: ParallelIsland.
+    Runs the years of an island on worker processes or threads. The island
+    must be seeded, so that each cell draws from its own random streams and
+    the results are identical to Island.one_year. Newborns get their ids
+    from the island in the main process, in the same order as
+    Island.procreation gives them.
+    With processes, the cells are split into chunks of consecutive cells,
+    row by row, with about the same number of animals. Each chunk is sent
+    to its worker once and stays there from year to year (see Chunk); only
+    births, migrants moving between chunks and the counts and food of the
+    cells are exchanged. Every <rebalance> years the number of animals in
+    each chunk is checked, and if the heaviest chunk has more than
+    <imbalance> times the mean, the cells are collected and split again.
+    Reading the cells of the island, e.g. for statistics,
+    collects them first (see collect), and the next year sends them out
+    again.
+    With threads, the cell-local phases (feeding, procreation, ageing,
+    weightloss and death) of the occupied cells run on a thread pool, split
+    by their number of animals, and growth and migration run in the main
+    thread.
+        - <var> = ParallelIsland(island, processes=4)
+        - <var>.one_year() replaces island.one_year()
+        - <var>.close() collects the cells and stops the workers
+    """
+
+    def __init__(self, island, processes=None, threads=False, rebalance=10,
+                 imbalance=1.25):
+        """
+        :param island: Seeded Island instance, after build_map
+        :param processes: Number of workers, default is the number of CPUs
+        :param threads: Use a thread pool instead of worker processes
+        :param rebalance: Number of years between each check of the balance
+        between the worker processes
+        :param imbalance: Largest accepted ratio between the number of
+        animals in the heaviest chunk and the mean
+        """
+        if island.streams is None:
+            raise ValueError('Parallel execution needs an island with a seed!')
+        if island.events is not None:
+            raise ValueError('Events are not recorded in parallel execution!')
+        if rebalance < 1:
+            raise ValueError('Rebalance interval must be at least 1!')
+        if island.parameters is None:
+            island.use_parameters(Parameters())
+        self.island = island
+        self.processes = processes or multiprocessing.cpu_count()
+        self.threads = threads
+        self.rebalance = rebalance
+        self.imbalance = imbalance
+        self.loaded = None
+        if threads:
+            self.pool = ThreadPool(self.processes)
+            return
+        shape = island.island.shape
+        self.shared_counts = multiprocessing.RawArray('i',
+                                                      2 * shape[0] * shape[1])
+        self.shared_food = multiprocessing.RawArray('d', shape[0] * shape[1])
+        self.count_grid, self.food_grid = shared_views(
+            self.shared_counts, self.shared_food, shape)
+        self.owners = np.zeros(shape, dtype=int)
+        self.connections = []
+        self.workers = []
+        for _ in range(self.processes):
+            chunk = Chunk(island.island_map, island.fmax, island.alpha)
+            connection, worker_end = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=chunk_worker, args=(worker_end, chunk,
+                                           self.shared_counts,
+                                           self.shared_food, shape))
+            worker.daemon = True
+            worker.start()
+            self.connections.append(connection)
+            self.workers.append(worker)
+
+    @property
+    def resident(self):
+        """
+        True while the cells are kept by the worker processes.
+        """
+        return self.loaded is not None
+
+    def balanced(self):
+        """
+        :return: True if the heaviest chunk has at most <imbalance> times the
+        mean number of animals, counting each cell as one animal more
+        """
+        loads = np.bincount(self.owners.ravel(),
+                            weights=self.count_grid.sum(axis=0).ravel() + 1,
+                            minlength=self.loaded[1])
+        return loads.max() <= self.imbalance * loads.mean()
+
+    def distribute(self):
+        """
+        Splits the cells of the island into chunks with about the same number
+        of animals and sends each chunk to its worker.
+        """
+        island = self.island
+        cells = list(np.ndenumerate(island.island))
+        loads = [len(cell.herbivores) + len(cell.carnivores) + 1
+                 for _, cell in cells]
+        chunks = split_runs(loads, len(self.connections))
+        for connection, chunk in zip(self.connections, chunks):
+            connection.send(("load", ([cells[index] for index in chunk],
+                                      island.parameters, island.streams,
+                                      island.year)))
+        for owner, chunk in enumerate(chunks):
+            for index in chunk:
+                self.owners[cells[index][0]] = owner
+        for connection in self.connections[:len(chunks)]:
+            connection.recv()
+        self.loaded = (island.year, len(chunks))
+
+    def collect(self):
+        """
+        Brings the cells kept by the worker processes back into the island.
+        Does nothing if the island already has them.
+        """
+        if not self.resident:
+            return
+        connections = self.connections[:self.loaded[1]]
+        for connection in connections:
+            connection.send(("cells", None))
+        for connection in connections:
+            for (y, x), cell in connection.recv():
+                self.island.parameters.bind(cell)
+                self.island.island[y][x] = cell
+        self.loaded = None
+
+    def run_phases(self, phases):
+        """
+        Runs cell-local phases on all occupied cells on the thread pool.
+        Animals born in the threads are given ids afterwards, cell by cell
+        and herbivores before carnivores.
+
+        :param phases: Tuple of phase names
+        """
+        occupied = self.island.occupied_cells()
+        loads = [len(cell.herbivores) + len(cell.carnivores)
+                 for _, cell in occupied]
+        tasks = [([occupied[index] for index in chunk], self.island.streams,
+                  self.island.year, phases)
+                 for chunk in balance(loads, self.processes)]
+        self.pool.map(run_cells, tasks)
+        if "procreation" in phases:
+            for _, cell in occupied:
+                self.island.assign_ids(cell.herbivores + cell.carnivores)
+
+    def run_chunks(self):
+        """
+        Runs one year on the worker processes. Newborns get ids from the
+        island, and migrants leaving their chunk are sent to the worker
+        owning their destination.
+        """
+        if not self.resident:
+            self.distribute()
+        elif self.island.year - self.loaded[0] >= self.rebalance:
+            if self.balanced():
+                self.loaded = (self.island.year, self.loaded[1])
+            else:
+                self.collect()
+                self.distribute()
+        connections = self.connections[:self.loaded[1]]
+        for connection in connections:
+            connection.send(("breed", None))
+        births = sorted(birth for connection in connections
+                        for birth in connection.recv())
+        first_ids = {}
+        for cell, newborns in births:
+            first_ids[cell] = self.island.reserve_ids(newborns)
+        for connection in connections:
+            connection.send(("migrate", first_ids))
+        arrivals = [[] for _ in connections]
+        for connection in connections:
+            for migrant in connection.recv():
+                arrivals[self.owners[migrant[2]]].append(migrant)
+        for connection, chunk_arrivals in zip(connections, arrivals):
+            connection.send(("second_half", chunk_arrivals))
+        for connection in connections:
+            connection.recv()
+
+    def one_year(self):
+        """
+        Simulates one year progression and returns array containing the
+        numbers of each species in each cell.
+        """
+        if self.threads:
+            self.island.grow()
+            self.run_phases(("feeding", "procreation"))
+            self.island.migration()
+            self.run_phases(("ageing", "weightloss", "death"))
+            self.island.year += 1
+            return self.island.individuals()
+        self.run_chunks()
+        self.island.year += 1
+        herbivores, carnivores = self.counts()
+        return np.array([[{"carnivores": carn, "herbivores": herb}
+                          for herb, carn in zip(herb_row, carn_row)]
+                         for herb_row, carn_row in zip(herbivores,
+                                                       carnivores)])
+
+    def counts(self):
+        """
+        Returns the number of herbivores and carnivores in each cell, without
+        collecting the cells.
+
+        :return: Integer array of shape (2, rows, columns), see Island.counts
+        """
+        if not self.resident:
+            return self.island.counts()
+        return self.count_grid.copy()
+
+    def food(self):
+        """
+        Returns the food for herbivores in each cell, without collecting the
+        cells.
+
+        :return: Array of shape (rows, columns), see Island.food
+        """
+        if not self.resident:
+            return self.island.food()
+        return self.food_grid.copy()
+
+    def close(self):
+        """
+        Collects the cells and stops the workers.
+        """
+        if self.threads:
+            self.pool.close()
+            self.pool.join()
+            return
+        self.collect()
+        for connection in self.connections:
+            connection.send(("stop", None))
+        for worker in self.workers:
+            worker.join()
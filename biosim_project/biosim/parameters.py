@@ -0,0 +1,74 @@
+# -*- Utf-8 -*-
+
+from biosim.animals import Herbivore, Carnivore
+from biosim.landscape import Jungle, Savannah
+
+"""
+Parameters module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class Parameters(object):
+    """
+    Class object: Parameters.
+    Holds the animal and landscape parameters of one simulation. The values
+    are copied from the class parameters when the instance is made, and
+    later changes only affect the simulation using this instance.
+        - <var> = Parameters()
+        - <var>.set_animal_parameters("Herbivore", {"mu": 0.3})
+        - <var>.set_landscape_parameters("J", {"fmax": 700})
+    """
+
+    animal_classes = {"Herbivore": Herbivore, "Carnivore": Carnivore}
+    landscape_classes = {"J": Jungle, "S": Savannah}
+
+    def __init__(self):
+        self.animal_params = {species: dict(cls.params) for species, cls
+                              in self.animal_classes.items()}
+        self.landscape_params = {landscape: dict(cls.params) for landscape, cls
+                                 in self.landscape_classes.items()}
+
+    def set_animal_parameters(self, species, params):
+        """
+        Updates parameters for an animal species. Raises ValueError if the
+        species is unknown or the values are invalid
+
+        :param species: "Herbivore" or "Carnivore"
+        :param params: New set of parameters as dictionary
+        """
+        if species not in self.animal_classes:
+            raise ValueError('"{}" is not an animal species!'.format(species))
+        self.animal_classes[species].check_parameters(params)
+        self.animal_params[species].update(params)
+
+    def set_landscape_parameters(self, landscape, params):
+        """
+        Updates parameters for a landscape type. Raises ValueError if the
+        landscape has no parameters or the values are invalid
+
+        :param landscape: Code letter of landscape, "J" or "S"
+        :param params: New set of parameters as dictionary
+        """
+        if landscape not in self.landscape_classes:
+            raise ValueError('Landscape "{}" has no parameters!'
+                             .format(landscape))
+        self.landscape_classes[landscape].check_parameters(params)
+        self.landscape_params[landscape].update(params)
+
+    def bind(self, cell):
+        """
+        Makes a cell and the animals in it use these parameters.
+
+        :param cell: Landscape instance
+        """
+        cell.parameters = self
+        for landscape, cls in self.landscape_classes.items():
+            if isinstance(cell, cls):
+                cell.params = self.landscape_params[landscape]
+        for herbivore in cell.herbivores:
+            herbivore.params = self.animal_params["Herbivore"]
+        for carnivore in cell.carnivores:
+            carnivore.params = self.animal_params["Carnivore"]
@@ -0,0 +1,124 @@
+# -*- Utf-8 -*-
+
+import numpy as np
+
+"""
+Population module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+LAYOUTS = ("uniform", "clustered", "fmax")
+DEFAULT_AGES = {"Herbivore": ("randint", 0, 20),
+                "Carnivore": ("randint", 0, 10)}
+DEFAULT_WEIGHTS = {"Herbivore": ("randint", 5, 80),
+                   "Carnivore": ("randint", 3, 50)}
+
+
+def draw(rng, distribution, size):
+    """
+    Draws values from a distribution given as a tuple:
+        - ("constant", value)
+        - ("uniform", low, high)
+        - ("randint", low, high), integers from low to high, both included
+        - ("normal", mean, standard deviation)
+
+    :param rng: RandomState
+    :param distribution: Tuple as above
+    :param size: Number of values
+    :return: Array of values
+    """
+    kind = distribution[0]
+    if kind == "constant":
+        return np.full(size, distribution[1], dtype=float)
+    elif kind == "uniform":
+        return rng.uniform(distribution[1], distribution[2], size)
+    elif kind == "randint":
+        return rng.randint(distribution[1], distribution[2] + 1,
+                           size).astype(float)
+    elif kind == "normal":
+        return rng.normal(distribution[1], distribution[2], size)
+    raise ValueError('Unknown distribution "{}"!'.format(kind))
+
+
+def cell_probabilities(island, layout="uniform", rng=np.random, clusters=3,
+                       spread=2.0):
+    """
+    Chance of each cell to get an animal. Only passable cells get animals.
+        - "uniform": the same for every passable cell
+        - "clustered": a sum of gaussian bumps, of width <spread> cells,
+          around <clusters> passable cells chosen at random
+        - "fmax": proportional to the "fmax" of the cell
+
+    :param island: Island instance, after build_map
+    :param layout: "uniform", "clustered" or "fmax"
+    :param rng: RandomState choosing the clusters
+    :param clusters: Number of clusters
+    :param spread: Width of the clusters in cells
+    :return: Array with the shape of the island, summing to 1
+    """
+    passable = np.array([cell.passable for cell in island.island.flat]
+                        ).reshape(island.island.shape)
+    if layout == "uniform":
+        weights = passable * 1.0
+    elif layout == "clustered":
+        rows, cols = np.nonzero(passable)
+        centres = rng.choice(len(rows), clusters)
+        grid_rows, grid_cols = np.indices(island.island.shape)
+        distances = ((grid_rows[..., None] - rows[centres]) ** 2 +
+                     (grid_cols[..., None] - cols[centres]) ** 2)
+        weights = passable * np.exp(-0.5 * distances / spread ** 2).sum(
+            axis=-1)
+    elif layout == "fmax":
+        weights = passable * np.asarray(island.food_parameters()[0],
+                                        dtype=float)
+    else:
+        raise ValueError('Unknown layout "{}"!'.format(layout))
+    if not np.sum(weights) > 0:
+        raise ValueError('No cell can get animals with layout "{}"!'
+                         .format(layout))
+    return weights / np.sum(weights)
+
+
+def generate_population(island, herbivores=0, carnivores=0,
+                        layout="uniform", seed=None, ages=None, weights=None,
+                        clusters=3, spread=2.0):
+    """
+    Makes a random population as arrays, ready for BioSim.add_animals:
+        - sim.add_animals(**generate_population(sim.island, 10 ** 6))
+
+    :param island: Island instance, after build_map
+    :param herbivores: Number of herbivores
+    :param carnivores: Number of carnivores
+    :param layout: Where the animals are put, see cell_probabilities
+    :param seed: Seed of the random numbers
+    :param ages: Optional dictionary mapping "Herbivore" and "Carnivore" to
+    an age distribution, see draw. Ages are rounded down.
+    :param weights: Optional dictionary mapping "Herbivore" and "Carnivore"
+    to a weight distribution, see draw. Weights are at least 0.1.
+    :param clusters: Number of clusters of the "clustered" layout
+    :param spread: Width of the clusters in cells
+    :return: Dictionary with the arrays "species" (0 for herbivores, 1 for
+    carnivores), "loc" (counting from 1, as in BioSim.add_population),
+    "age" and "weight"
+    """
+    rng = np.random.RandomState(seed)
+    ages = dict(DEFAULT_AGES, **(ages or {}))
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    probabilities = cell_probabilities(island, layout, rng, clusters, spread)
+    counts = (("Herbivore", herbivores), ("Carnivore", carnivores))
+    total = herbivores + carnivores
+
+    species = np.repeat([0, 1], [herbivores, carnivores])
+    cells = rng.choice(probabilities.size, total, p=probabilities.ravel())
+    age = np.concatenate([draw(rng, ages[name], number)
+                          for name, number in counts])
+    weight = np.concatenate([draw(rng, weights[name], number)
+                             for name, number in counts])
+    rows, cols = np.unravel_index(cells, island.island.shape)
+    return {"species": species,
+            "loc": np.column_stack((rows + 1, cols + 1)),
+            "age": np.maximum(np.floor(age), 0).astype(int),
+            "weight": np.maximum(weight, 0.1)}
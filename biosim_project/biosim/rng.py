@@ -0,0 +1,258 @@
+# -*- Utf-8 -*-
+
+import itertools
+import math
+import numpy as np
+
+"""
+Random number module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+PHASES = ("feeding", "procreation", "migration", "death")
+SLOT_SPECIES = ("herbivores", "carnivores")
+MASK64 = 2 ** 64 - 1
+
+
+def mix64(value):
+    """
+    Scrambles a 64 bit integer with the finaliser of SplitMix64. The
+    function is a bijection, so different inputs give different outputs.
+
+    :param value: Integer in [0, 2**64)
+    :return: Integer in [0, 2**64)
+    """
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def derive_seed(*values):
+    """
+    Mixes integers into a seed, so different sequences of values give
+    independent seeds.
+
+    :param values: Integers in [0, 2**64)
+    :return: Integer seed in [0, 2**32)
+    """
+    state = 0
+    for value in values:
+        state = mix64((state + (int(value) + 1) * 0x9E3779B97F4A7C15) &
+                      MASK64)
+    return state >> 32
+
+
+class RandomStreams(object):
+    """
+    Class object: RandomStreams.
+    Gives each cell an independent random stream for each phase of each
+    year. The stream is seeded from the key (seed, year, cell, phase) alone,
+    so the numbers drawn in a cell do not depend on the order the cells are
+    processed in.
+    Seeding a RandomState from a key array is slow, so only the key
+    (seed, year, phase) is seeded that way, once per phase and year. The
+    cells get integer seeds mixed from its first draw and their coordinates
+    (see cell_seed).
+        - <var> = RandomStreams(seed)
+        - <var>.stream(year, (y, x), "death") returns the stream for a cell
+    With slots=True each animal slot of a cell gets a stream of its own as
+    well (common random numbers, see SlotStreams).
+    """
+
+    def __init__(self, seed, slots=False):
+        """
+        :param seed: Seed for all streams, integer in [0, 2**32)
+        :param slots: Give each animal slot its own stream
+        """
+        if not 0 <= seed < 2 ** 32:
+            raise ValueError('Seed must be in the range [0, 2**32)!')
+        self.seed = int(seed)
+        self.slots = slots
+        self.bases = {}
+
+    def base(self, year, phase):
+        """
+        Returns the number all cell seeds of one phase of one year are mixed
+        from. It is drawn from a generator seeded with (seed, year, phase)
+        and kept for the rest of the year.
+
+        :param year: Year being simulated
+        :param phase: Name of the phase, one of PHASES
+        :return: Integer in [0, 2**64)
+        """
+        key = (int(year), PHASES.index(phase))
+        base = self.bases.get(key)
+        if base is None:
+            if len(self.bases) >= 2 * len(PHASES):
+                self.bases.clear()
+            high, low = np.random.RandomState(
+                [self.seed, key[0], key[1]]).randint(2 ** 32, size=2)
+            base = int(high) << 32 | int(low)
+            self.bases[key] = base
+        return base
+
+    def cell_seed(self, year, cell, phase):
+        """
+        Mixes the seed of one cell in one phase of one year from the base of
+        the phase and the cell coordinates.
+
+        :param year: Year being simulated
+        :param cell: Coordinates (y, x) of the cell
+        :param phase: Name of the phase, one of PHASES
+        :return: Integer seed in [0, 2**32)
+        """
+        counter = (int(cell[0]) << 32 | int(cell[1])) + 1
+        return mix64((self.base(year, phase) +
+                      counter * 0x9E3779B97F4A7C15) & MASK64) >> 32
+
+    def stream(self, year, cell, phase):
+        """
+        Returns the random stream for one cell in one phase of one year.
+
+        :param year: Year being simulated
+        :param cell: Coordinates (y, x) of the cell
+        :param phase: Name of the phase, one of PHASES
+        :return: np.random.RandomState seeded from the key, or SlotStreams
+        if the streams have slots
+        """
+        if self.slots:
+            return SlotStreams(self.cell_seed(year, cell, phase))
+        return np.random.RandomState(self.cell_seed(year, cell, phase))
+
+
+class SlotStreams(object):
+    """
+    Class object: SlotStreams.
+    The streams of one cell in one phase when every animal slot has a
+    stream of its own. The n-th animal a cell handles in a phase always
+    draws from the same stream, however many numbers the animals before it
+    used. Runs with the same seed and different parameters then use the
+    same random numbers animal by animal (common random numbers), so the
+    differences between them come from the parameters and not from noise.
+    Seeding a generator for every animal is slow, so each species draws one
+    block of uniform numbers with <width> per slot, and slot n gets row n
+    of the block (see SlotStream). The block is drawn from one generator in
+    order and grows when a slot past its end is asked for, so a row does
+    not depend on how many slots are used.
+        - <var>.slot("herbivores", 3) returns the stream of a slot
+    """
+
+    width = 4
+
+    def __init__(self, seed):
+        """
+        :param seed: Seed of the cell and phase, see RandomStreams.cell_seed
+        """
+        self.seed = seed
+        self.blocks = {}
+
+    def rows(self, species, count):
+        """
+        Returns the block of a species with at least <count> rows.
+
+        :param species: "herbivores" or "carnivores"
+        :param count: Number of rows needed
+        :return: List of rows, each a list of <width> uniform numbers
+        """
+        block = self.blocks.get(species)
+        if block is None:
+            block = (np.random.RandomState(derive_seed(
+                self.seed, SLOT_SPECIES.index(species))), [])
+            self.blocks[species] = block
+        generator, rows = block
+        if count > len(rows):
+            rows.extend(generator.random_sample(
+                (max(count - len(rows), len(rows), 16), self.width)).tolist())
+        return rows
+
+    def slot(self, species, index):
+        """
+        :param species: "herbivores" or "carnivores"
+        :param index: Position of the animal in the order the cell handles
+        the animals in
+        :return: SlotStream of the slot
+        """
+        index = int(index)
+        return SlotStream(self.rows(species, index + 1)[index],
+                          (self.seed, SLOT_SPECIES.index(species), index))
+
+
+class SlotStream(object):
+    """
+    Class object: SlotStream.
+    The stream of one animal slot. It gives the numbers of its row of the
+    block first, and numbers from a generator seeded from its key after
+    that, so slots drawing more numbers than the row has still get their
+    own numbers. Has the methods of np.random.RandomState the animals use.
+    """
+
+    def __init__(self, row, key):
+        """
+        :param row: List of uniform numbers in [0, 1)
+        :param key: Tuple of integers identifying the slot
+        """
+        self.row = row
+        self.key = key
+        self.position = 0
+        self.generator = None
+
+    def random_sample(self, size=None):
+        """
+        :param size: Optional number of values
+        :return: Uniform number in [0, 1), or array of <size> of them
+        """
+        if size is not None:
+            return np.array([self.random_sample() for _ in range(size)])
+        if self.position < len(self.row):
+            self.position += 1
+            return self.row[self.position - 1]
+        if self.generator is None:
+            self.generator = np.random.RandomState(derive_seed(*self.key))
+        return self.generator.random_sample()
+
+    def normal(self, loc=0.0, scale=1.0):
+        """
+        Draws a normal number from two uniform numbers (Box-Muller).
+
+        :param loc: Mean
+        :param scale: Standard deviation
+        :return: Normal number
+        """
+        radius = math.sqrt(-2.0 * math.log(1.0 - self.random_sample()))
+        return loc + scale * radius * math.cos(2.0 * math.pi *
+                                               self.random_sample())
+
+
+def slot_stream(rng, species, index):
+    """
+    Returns the random number generator an animal should draw from.
+
+    :param rng: Generator given to a cell, RandomState or SlotStreams
+    :param species: "herbivores" or "carnivores"
+    :param index: Position of the animal in the order the cell handles the
+    animals in
+    :return: The stream of the slot if rng is SlotStreams, else rng
+    """
+    if isinstance(rng, SlotStreams):
+        return rng.slot(species, index)
+    return rng
+
+
+def slot_streams(rng, species):
+    """
+    Returns the random number generators the animals of a species should
+    draw from, in slot order. Checking the kind of generator once per cycle
+    instead of once per animal keeps the cycles without slots fast.
+
+    :param rng: Generator given to a cell, RandomState or SlotStreams
+    :param species: "herbivores" or "carnivores"
+    :return: Endless iterator over the streams of the slots if rng is
+    SlotStreams, else over rng
+    """
+    if isinstance(rng, SlotStreams):
+        return itertools.imap(rng.slot, itertools.repeat(species),
+                              itertools.count())
+    return itertools.repeat(rng)
@@ -0,0 +1,83 @@
+# -*- Utf-8 -*-
+
+from biosim.simulation import BioSim
+from biosim.parameters import Parameters
+from biosim.termination import TerminationPolicy
+
+"""
+Scenario module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def build_simulation(spec):
+    """
+    Creates a simulation from a run specification. The simulation gets its
+    own parameters, see scenario_parameters. The specification is a
+    dictionary with the keys
+        - "island_map": Map of island as string (default map if missing)
+        - "ini_pop": Initial population as for BioSim (empty if missing)
+        - "seed": Seed for the simulation
+        - "years": Number of years to simulate
+        - "parameters": Optional dictionary mapping "Herbivore",
+          "Carnivore", "J" and "S" to parameter dictionaries
+        - "common_random_numbers": Optional, True to give every animal slot
+          its own random stream (see biosim.rng.SlotStreams)
+        - "termination": Optional dictionary of TerminationPolicy arguments,
+          to stop the run early
+
+    :param spec: Run specification as dictionary
+    :return: BioSim instance
+    """
+    return BioSim(spec.get("island_map"), spec.get("ini_pop", []),
+                  spec["seed"], parameters=scenario_parameters(spec),
+                  common_random_numbers=spec.get("common_random_numbers",
+                                                 False))
+
+
+def scenario_parameters(spec):
+    """
+    Resolves the parameters of a run specification: the class parameters
+    in effect now, with the "parameters" of the specification applied.
+
+    :param spec: Run specification, see build_simulation
+    :return: Parameters instance
+    """
+    parameters = Parameters()
+    for name, params in spec.get("parameters", {}).items():
+        if name in Parameters.animal_classes:
+            parameters.set_animal_parameters(name, params)
+        else:
+            parameters.set_landscape_parameters(name, params)
+    return parameters
+
+
+def scenario_years(spec, policy=None):
+    """
+    Simulates a run specification one year at a time.
+
+    :param spec: Run specification, see build_simulation
+    :param policy: Optional TerminationPolicy to stop the run early
+    :return: Generator giving (herbivores, carnivores) on the island after
+    each year
+    """
+    sim = build_simulation(spec)
+    for counts in sim.steps(spec["years"], policy):
+        herbivores, carnivores = counts.sum(axis=(1, 2))
+        yield herbivores, carnivores
+
+
+def run_scenario(spec):
+    """
+    Simulates a run specification.
+
+    :param spec: Run specification, see build_simulation
+    :return: Dictionary with arrays of the number of "herbivores" and
+    "carnivores" after each year. Runs with a "termination" policy also have
+    "stopped", the year the run stopped or None, and "reason", and their
+    arrays end at the year the run stopped.
+    """
+    return build_simulation(spec).run(
+        spec["years"], termination=TerminationPolicy.from_spec(spec))
@@ -2,9 +2,12 @@
 
 from biosim.island import Island
 from biosim.animals import Herbivore, Carnivore
-import matplotlib.pyplot as plt
+from biosim.statistics import Histograms
+from biosim.parameters import Parameters
+from biosim.events import EventLog
+from biosim.termination import TerminationPolicy
 import numpy as np
-import random
+import pickle
 
 """
 Simulation module
@@ -20,40 +23,55 @@ class BioSim(object):
     Main simulation class for biosim project
     """
 
-    def __init__(self, island_map=None, ini_pop=None, seed=None):
+    default_map = """OOOOOOO
+                     OJJSJJO
+                     OJSSSJO
+                     OJSMSJO
+                     OJSMSJO
+                     OJJJJJO
+                     OOOOOOO"""
+
+    def __init__(self, island_map=None, ini_pop=None, seed=None, fmax=None,
+                 alpha=None, parameters=None, common_random_numbers=False):
         """
-        Constructor creates island from given map, and adds
-            initial population to island.
+        Constructor checks and stores the map and the initial population.
+            The island is built and the population added the first time the
+            island is used, see <var>.island.
         All parameters needed to create animals are contained within
             ini_pop.
 
         :param island_map: String containing letters representing each
         type of landscape
         :param ini_pop: List of initial_populations. [pop1, pop2]
-        :param seed: Seed for rng
+        :param seed: Seed for the simulation's own random number generators.
+        The global random state of numpy and random is not touched.
+        :param fmax: Optional array with "fmax" for each cell on the map
+        :param alpha: Optional array with "alpha" for each cell on the map
+        :param parameters: Optional Parameters instance. Default None uses
+        the class parameters until set_animal_parameters or
+        set_landscape_parameters is called.
+        :param common_random_numbers: Give every animal slot its own random
+        stream, so simulations with the same seed and different parameters
+        use the same random numbers
         """
-        if seed is not None:
-            np.random.seed(seed)
-            random.seed(seed)
-        else:
-            random.seed(1234)
-            np.random.seed(987654)
+        if seed is None:
+            seed = 987654
 
         if island_map is None:
-            island_map = """OOOOOOO
-                            OJJSJJO
-                            OJSSSJO
-                            OJSMSJO
-                            OJSMSJO
-                            OJJJJJO
-                            OOOOOOO"""
+            island_map = self.default_map
+        Island.check_map(island_map, fmax, alpha)
         self.island_map = island_map
-        self.island = Island(self.island_map)
-        self.island.build_map()
+        self.island_args = (fmax, alpha, seed, parameters,
+                            common_random_numbers)
+        self._island = None
+        self.pending_populations = []
         self.vis_steps = None
         self.img_steps = None
         self.years_sim = 0
         self.heat = None
+        self.statistics = None
+        self.parallel = None
+        self.recorders = []
         if ini_pop is None:
             ini_herbs = [{'loc': (3, 3),
                           'pop': [{'species': 'Herbivore',
@@ -68,23 +86,334 @@ class BioSim(object):
             ini_pop = ini_herbs + ini_carns
         self.add_population(ini_pop)
         self.fig = None
+        self.visualization = None
+
+    @property
+    def island(self):
+        """
+        Island of the simulation. It is built, and the populations given
+        before are added, the first time it is used, so making a simulation
+        costs little until it runs. Cells kept by parallel worker processes
+        are collected first, see ParallelIsland.collect.
+        """
+        if self.parallel is not None:
+            self.parallel.collect()
+        if self._island is None:
+            self._island = Island(self.island_map, *self.island_args)
+            self._island.build_map()
+            self.island_args = None
+            pending, self.pending_populations = self.pending_populations, []
+            for population in pending:
+                self.add_population(population)
+        return self._island
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled simulation. Simulations pickled before the island
+        was built on first use keep it as "island", and their islands may
+        have no counter of animal ids.
+        """
+        if "island" in state:
+            state["_island"] = state.pop("island")
+            state.setdefault("island_args", None)
+            state.setdefault("pending_populations", [])
+        state.setdefault("visualization", None)
+        self.__dict__.update(state)
+        island = self._island
+        if island is not None and not hasattr(island, "next_id"):
+            ids = [animal.id for cell in island.island.flat
+                   for animal in cell.herbivores + cell.carnivores]
+            island.next_id = max(ids) + 1 if ids else 0
 
     def add_population(self, population):
         """
-        Adds given population to cells. Location stored in given population
+        Adds given population to cells. Location stored in given population.
+        Before the island is built the population is kept until it is.
         :param population: list of populations
         """
+        if self._island is None:
+            self.pending_populations.append(population)
+            return
         for species in population:
             y, x = [n - 1 for n in species['loc']]
             for ani in species['pop']:
                 if ani['species'] == 'Herbivore':
-                    self.island.island[y][x].herbivores.append(Herbivore(
+                    animals = self.island.island[y][x].herbivores
+                    animals.append(Herbivore(
                         weight=ani['weight'], age=ani['age'],
-                        coordinates=(y, x)))
+                        coordinates=(y, x),
+                        params=self.island.animal_params('Herbivore')))
                 elif ani['species'] == 'Carnivore':
-                    self.island.island[y][x].carnivores.append(Carnivore(
+                    animals = self.island.island[y][x].carnivores
+                    animals.append(Carnivore(
                         weight=ani['weight'], age=ani['age'],
-                        coordinates=(y, x)))
+                        coordinates=(y, x),
+                        params=self.island.animal_params('Carnivore')))
+                else:
+                    continue
+                self.island.assign_ids(animals[-1:])
+
+    def add_animals(self, species, loc, age, weight):
+        """
+        Adds many animals given as arrays, one entry per animal. Faster than
+        add_population for large populations.
+
+        :param species: Species of each animal, "Herbivore" or "Carnivore",
+        or 0 for herbivores and 1 for carnivores
+        :param loc: Array of shape (animals, 2) with the location (y, x) of
+        each animal, counting from 1 as in add_population
+        :param age: Age of each animal
+        :param weight: Weight of each animal
+        """
+        species = np.asarray(species)
+        if species.dtype.kind in 'SU':
+            names = species
+            species = np.where(names == 'Carnivore', 1, 0)
+            if np.any((names != 'Herbivore') & (names != 'Carnivore')):
+                raise ValueError('Unknown species!')
+        loc = np.asarray(loc, dtype=int).reshape(-1, 2)
+        self.island.add_animals(species, loc[:, 0] - 1, loc[:, 1] - 1, age,
+                                weight)
+
+    def own_parameters(self):
+        """
+        Returns the parameters of this simulation. The first call copies the
+        class parameters into a Parameters instance used by this simulation
+        only.
+
+        :return: Parameters instance
+        """
+        if self.island.parameters is None:
+            self.island.use_parameters(Parameters())
+        return self.island.parameters
+
+    def set_animal_parameters(self, species, params):
+        """
+        Sets parameters for an animal species in this simulation only.
+
+        :param species: String, name of animal species
+        :param params: Dict with valid parameter specification for species
+        """
+        self.own_parameters().set_animal_parameters(species, params)
+
+    def set_landscape_parameters(self, landscape, params):
+        """
+        Sets parameters for a landscape type in this simulation only.
+
+        :param landscape: String, code letter for landscape
+        :param params: Dict with valid parameter specification for landscape
+        """
+        self.own_parameters().set_landscape_parameters(landscape, params)
+
+    def fork(self, seed=None):
+        """
+        Makes an independent copy of the simulation in its current state,
+        with its own island, animals, parameters, random streams and
+        statistics. The copy is a full deep copy made with pickle, so its
+        time and memory grow with the number of animals; nothing is shared
+        with the original. The figure, the parallel workers and the
+        recorders are not copied.
+
+        :param seed: Optional new seed for the copy. Default None continues
+        with the same random streams, so the copy gives the same results as
+        the original until one of them is changed.
+        :return: BioSim instance
+        """
+        if self.parallel is not None:
+            self.parallel.collect()
+        fig, parallel, recorders = self.fig, self.parallel, self.recorders
+        visualization = self.visualization
+        self.fig = self.parallel = self.visualization = None
+        self.recorders = []
+        try:
+            branch = pickle.loads(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+        finally:
+            self.fig, self.parallel, self.recorders = fig, parallel, recorders
+            self.visualization = visualization
+        if seed is not None:
+            branch.island.reseed(seed)
+        return branch
+
+    def record_statistics(self, interval=1, bins=None):
+        """
+        Starts recording yearly histograms of age, weight and fitness for
+        each species.
+
+        :param interval: Number of years between each recorded histogram
+        :param bins: Dictionary with bin edges, see Histograms
+        :return: The Histograms instance results are recorded in
+        """
+        self.statistics = Histograms(interval, bins)
+        return self.statistics
+
+    def record_events(self):
+        """
+        Starts recording births, deaths, kills and migrations. Events are
+        only recorded when the years are simulated serially, so this raises
+        ValueError while parallel workers are used.
+
+        :return: The EventLog instance events are recorded in
+        """
+        if self.parallel is not None:
+            raise ValueError('Events are not recorded in parallel execution!')
+        self.island.events = EventLog()
+        return self.island.events
+
+    def add_recorder(self, recorder):
+        """
+        Adds a recorder, called with the simulation after each year, e.g.
+        biosim.checkpoint.PeriodicCheckpoint.
+
+        :param recorder: Callable taking the BioSim instance
+        """
+        self.recorders.append(recorder)
+
+    def use_parallel(self, processes=None, threads=False):
+        """
+        Runs the years on worker processes or threads, see ParallelIsland.
+        Results are identical to serial simulation. With processes the cells
+        stay in the workers between years; reading the island, e.g. for
+        statistics or recorders, brings them back for that year. Raises
+        ValueError if events are recorded, see record_events.
+
+        :param processes: Number of workers, default is the number of CPUs
+        :param threads: Use threads instead of processes
+        """
+        from biosim.parallel import ParallelIsland
+        self.close_parallel()
+        self.parallel = ParallelIsland(self.island, processes, threads)
+
+    def close_parallel(self):
+        """
+        Stops the parallel workers, if any, and returns to serial simulation.
+        """
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+
+    def one_year(self):
+        """
+        Simulates one year on the island, counts it in <var>.years_sim,
+        updates recorded statistics and calls the recorders.
+
+        :return: Array containing population data for the year
+        """
+        if self.parallel is None:
+            island_results = self.island.one_year()
+        else:
+            island_results = self.parallel.one_year()
+        self.years_sim += 1
+        if self.statistics is not None:
+            self.statistics.update(self.island)
+        for recorder in self.recorders:
+            recorder(self)
+        return island_results
+
+    def steps(self, num_years, termination=None):
+        """
+        Simulates up to num_years years without any visualization.
+
+        :param num_years: Number of years to simulate
+        :param termination: Optional TerminationPolicy, or dictionary of its
+        arguments, to stop early
+        :return: Generator giving the number of herbivores and carnivores in
+        each cell after each year, see Island.counts
+        """
+        termination = TerminationPolicy.coerce(termination)
+        for _ in range(num_years):
+            self.one_year()
+            if self.parallel is None:
+                counts = self.island.counts()
+            else:
+                counts = self.parallel.counts()
+            yield counts
+            if termination is not None and termination.update(
+                    *counts.sum(axis=(1, 2))):
+                break
+
+    def run(self, num_years, record=("totals",), termination=None):
+        """
+        Simulates up to num_years years without any visualization, for batch
+        runs. Statistics and recorders added to the simulation are updated
+        as usual.
+
+        :param num_years: Number of years to simulate
+        :param record: What to return for each year, any of
+            - "totals": number of "herbivores" and "carnivores" on the island
+            - "counts": number of animals in each cell, see Island.counts
+            - "food": available food in each cell, see Island.food
+        :param termination: Optional TerminationPolicy, or dictionary of its
+        arguments, to stop early
+        :return: Dictionary with one array per recorded year for each of the
+        keys recorded. With a termination policy also "stopped", the year
+        the run stopped or None, and "reason".
+        """
+        unknown = set(record) - {"totals", "counts", "food"}
+        if unknown:
+            raise ValueError('Cannot record {}!'.format(
+                ', '.join(sorted(unknown))))
+        termination = TerminationPolicy.coerce(termination)
+        counts, food = [], []
+        for year_counts in self.steps(num_years, termination):
+            counts.append(year_counts)
+            if "food" in record:
+                food.append(self.island.food() if self.parallel is None
+                            else self.parallel.food())
+        shape = self.island.island.shape
+        counts = np.array(counts, dtype=np.int32).reshape((-1, 2) + shape)
+        result = {}
+        if "totals" in record:
+            totals = counts.sum(axis=(2, 3))
+            result["herbivores"] = totals[:, 0]
+            result["carnivores"] = totals[:, 1]
+        if "counts" in record:
+            result["counts"] = counts
+        if "food" in record:
+            result["food"] = np.array(food, dtype=float).reshape(
+                (-1,) + shape)
+        if termination is not None:
+            result["stopped"] = termination.year
+            result["reason"] = termination.reason
+        return result
+
+    @property
+    def year(self):
+        """
+        Last year simulated.
+        """
+        return self.island.year
+
+    @property
+    def num_animals(self):
+        """
+        Total number of animals on the island.
+        """
+        return int(self.island.counts().sum())
+
+    @property
+    def num_animals_per_species(self):
+        """
+        Number of animals per species on the island, as dictionary.
+        """
+        herbivores, carnivores = self.island.counts().sum(axis=(1, 2))
+        return {'Herbivore': int(herbivores), 'Carnivore': int(carnivores)}
+
+    @property
+    def animal_distribution(self):
+        """
+        Pandas DataFrame with the number of animals of each species in every
+        cell, with the columns "Row", "Col", "Herbivore" and "Carnivore".
+        Rows and columns count from 1. Built from one count array, so it is
+        cheap enough to read every year. Needs pandas, which is imported
+        when the property is first read.
+        """
+        import pandas
+        counts = self.island.counts()
+        rows, cols = np.indices(self.island.island.shape)
+        return pandas.DataFrame(
+            {'Row': rows.ravel() + 1, 'Col': cols.ravel() + 1,
+             'Herbivore': counts[0].ravel(), 'Carnivore': counts[1].ravel()},
+            columns=['Row', 'Col', 'Herbivore', 'Carnivore'])
 
     @staticmethod
     def heatmap(island_results):
@@ -152,107 +481,34 @@ class BioSim(object):
 
     def plot_update(self, years, abscissa, ordinate, colour_herb, colour_carn):
         """
-        Updates the plot n_steps years
+        Updates the plot n_steps years. The figure is made on the first call
+        and reused after, with the ordinate and colours of each call, see
+        biosim.visualization.Visualization.
         :param years: Number of years to plot
         :param abscissa: Xrange
         :param ordinate: Yrange
         :param colour_herb: Colour of heatmap (default None)
         :param colour_carn: Colour of heatmap (default None)
         """
-        if self.years_sim == 0:
-            self.fig = plt.figure()
-        plt.axis('off')
-
+        from biosim.visualization import Visualization
+        if self.visualization is None:
+            self.visualization = Visualization(self.island_map, ordinate,
+                                               colour_herb, colour_carn)
+            self.fig = self.visualization.fig
         if abscissa is None:
-            abscissa = years  # + self.years_sim
-
-        ax1 = self.fig.add_subplot(2, 2, 1)
-        plt.title('Rossum Island')
-        rgb_value = {'O': (0.0, 0.0, 1.0),
-                     'M': (0.5, 0.5, 0.5),
-                     'J': (0.0, 0.6, 0.0),
-                     'S': (0.5, 1.0, 0.5),
-                     'D': (1.0, 1.0, 0.5)}
-        kart_rgb = [[rgb_value[column] for column in row] for row in
-                    self.island_map.replace(" ", "").split()]
-        axlg = self.fig.add_axes([0.0, 0.5, 0.025, 0.5])
-        axlg.axis('off')
-        for ix, name in enumerate(('Ocean', 'Mountain', 'Jungle',
-                                   'Savannah', 'Desert')):
-            axlg.add_patch(plt.Rectangle((0., ix * 0.2), 0.3, 0.1,
-                                         edgecolor='none',
-                                         facecolor=rgb_value[name[0]]))
-            axlg.text(0.35, ix * 0.2, name, transform=axlg.transAxes)
-
-        ax1.imshow(kart_rgb, interpolation='nearest')
-        ax1.set_xticks(range(0, len(kart_rgb[0]), 4))
-        ax1.set_xticklabels(range(1, 1 + len(kart_rgb[0]), 4))
-        ax1.set_yticks(range(0, len(kart_rgb), 4))
-        ax1.set_yticklabels(range(1, 1 + len(kart_rgb), 4))
-
-        ax2 = self.fig.add_subplot(2, 2, 2)
-        plt.axis([self.years_sim, self.years_sim + abscissa, self.years_sim,
-                  ordinate])
-
-        title = plt.title('')
-        line_herbs = ax2.plot(np.arange(years + self.years_sim), np.nan *
-                              np.ones(self.years_sim + years), 'g-',
-                              label="Herbivores")[0]
-        line_carns = ax2.plot(np.arange(years + self.years_sim), np.nan * 
-                              np.ones(self.years_sim + years), 'r-',
-                              label="Carnivores")[0]
-        if self.years_sim == 0:
-            plt.grid()
-            plt.legend(loc=1, prop={'size': 7})
-
-        ax3 = self.fig.add_subplot(2, 2, 3)
-        plt.title("Herbivores")
-        ax3.set_xticks(range(0, len(self.island_map), 2))
-        ax3.set_xticklabels(range(1, 1 + len(self.island_map), 2))
-        ax3.set_yticks(range(0, len(self.island_map), 2))
-        ax3.set_yticklabels(range(1, 1 + len(self.island_map), 2))
-        ax3_bar = plt.imshow([[0 for _ in range(21)] for _ in range(13)])
-        if self.years_sim == 0:
-            plt.colorbar(ax3_bar,  orientation='horizontal', ticks=[])
-
-        ax4 = self.fig.add_subplot(2, 2, 4)
-        plt.title("Carnivores")
-        ax4.set_xticks(range(0, len(self.island_map), 2))
-        ax4.set_xticklabels(range(1, (1 + len(self.island_map)), 2))
-        ax4.set_yticks(range(0, len(self.island_map), 2))
-        ax4.set_yticklabels(range(1, (1 + len(self.island_map)), 2))
-        ax4_bar = plt.imshow([[0 for _ in range(21)] for _ in range(13)])
-        if self.years_sim == 0:
-            plt.colorbar(ax4_bar, orientation='horizontal', ticks=[])
+            abscissa = years
+        self.visualization.setup(self.years_sim + abscissa, ordinate,
+                                 colour_herb, colour_carn)
 
         for n in xrange(self.years_sim, self.years_sim + years):
-            self.heat = self.heatmap(self.island.one_year())
+            self.one_year()
+            self.heat = self.island.counts()
             if n % self.vis_steps == 0:
-                ax3.imshow(self.heat[0], interpolation='nearest',
-                           cmap=colour_herb)
-
-                ax4.imshow(self.heat[1], interpolation='nearest',
-                           cmap=colour_carn)
-                herbs = np.sum(self.heat[0])
-                carns = np.sum(self.heat[1])
-                ydata_herbs = line_herbs.get_ydata()
-                ydata_carns = line_carns.get_ydata()
-                ydata_herbs[n] = herbs
-                ydata_carns[n] = carns
-                line_herbs.set_ydata(ydata_herbs)
-                line_carns.set_ydata(ydata_carns)
-                title.set_text('Year: {:5}'.format(n + 1))  # Year counter
-
-                self.fig.savefig(
-                    'img{}{}.png'.format('0' * (5 - len(str(n + self.years_sim
-                                                            ))),
-                                         n)) if \
-                    (n + 1) % self.img_steps == 0 else None
-
-                plt.pause(1e-7)
+                self.visualization.update(n + 1, self.heat)
+                if (n + 1) % self.img_steps == 0:
+                    self.visualization.save('img{:05d}.png'.format(n))
                 if np.sum(self.heat) == 0:
                     break
-        self.years_sim += years
 
     def simulate(self, num_steps=100, vis_steps=1, img_steps=2000,
                  abscissa=None, ordinate=20000, colour_herb=None,
@@ -269,6 +525,7 @@ class BioSim(object):
         :param colour_herb: Colour for chart of herbivore population
         :param colour_carn: Colour for chart of herbivore population
         """
+        import matplotlib.pyplot as plt
         self.vis_steps = vis_steps
         self.img_steps = img_steps
         self.plot_update(num_steps, abscissa, ordinate,
@@ -0,0 +1,133 @@
+# -*- Utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from numpy.lib.format import open_memmap
+
+"""
+Snapshot module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+SNAPSHOT_COLUMNS = (("species", np.int8), ("cell", np.int32),
+                    ("row", np.int32), ("col", np.int32), ("age", np.int32),
+                    ("weight", np.float64), ("fitness", np.float64),
+                    ("id", np.int64))
+SPECIES = ("herbivores", "carnivores")
+
+
+def export_snapshot(sim, path):
+    """
+    Writes every animal on the island as columns, one .npy file per column
+    and a "manifest.json". Species is 0 for herbivores and 1 for
+    carnivores, and cells are numbered row by row. The files are made at
+    their full size first and filled cell by cell, so only the animals of
+    one cell are copied at a time. The directory is written under a
+    temporary name and renamed when complete.
+
+    :param sim: BioSim instance
+    :param path: Directory of the snapshot, replaced if it exists
+    """
+    island = sim.island
+    total = sum(len(cell.herbivores) + len(cell.carnivores)
+                for cell in island.island.flat)
+    parent = os.path.dirname(os.path.abspath(path))
+    temporary = tempfile.mkdtemp(dir=parent)
+    columns = {name: open_memmap(os.path.join(temporary, name + '.npy'),
+                                 mode='w+', dtype=dtype, shape=(total,))
+               for name, dtype in SNAPSHOT_COLUMNS}
+    start = 0
+    for index, cell in enumerate(island.island.flat):
+        for code, species in enumerate(SPECIES):
+            animals = getattr(cell, species)
+            if not animals:
+                continue
+            stop = start + len(animals)
+            row, col = np.unravel_index(index, island.island.shape)
+            columns["species"][start:stop] = code
+            columns["cell"][start:stop] = index
+            columns["row"][start:stop] = row
+            columns["col"][start:stop] = col
+            columns["age"][start:stop] = [animal.age for animal in animals]
+            columns["weight"][start:stop] = [animal.weight
+                                             for animal in animals]
+            columns["fitness"][start:stop] = [animal.fitness
+                                              for animal in animals]
+            columns["id"][start:stop] = [animal.id for animal in animals]
+            start = stop
+    for values in columns.values():
+        values.flush()
+    del columns
+    manifest = {"year": island.year,
+                "shape": list(island.island.shape),
+                "animals": total,
+                "columns": [name for name, _ in SNAPSHOT_COLUMNS]}
+    with open(os.path.join(temporary, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.rename(temporary, path)
+
+
+def load_snapshot(path, mmap_mode='r'):
+    """
+    Reads a snapshot written by export_snapshot. The columns are memory
+    mapped by default, so nothing is copied until it is used.
+
+    :param path: Directory of the snapshot
+    :param mmap_mode: Mode for memory mapping the columns, None reads them
+    into memory
+    :return: Tuple (manifest, columns), where columns is a dictionary of
+    numpy arrays
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    columns = {name: np.load(os.path.join(path, name + '.npy'),
+                             mmap_mode=mmap_mode)
+               for name in manifest["columns"]}
+    return manifest, columns
+
+
+class SnapshotExporter(object):
+    """
+    Class object: SnapshotExporter.
+    Recorder exporting a snapshot of every animal at chosen years, named
+    after the year, e.g. "year00100".
+        - sim.add_recorder(SnapshotExporter(directory, [10, 100]))
+        - manifest, columns = load_snapshot(<var>.path(100))
+    """
+
+    def __init__(self, directory, years=None, interval=None):
+        """
+        :param directory: Directory the snapshots are written in
+        :param years: Optional list of years to export
+        :param interval: Optional number of years between exports
+        """
+        self.directory = directory
+        self.years = set(years or [])
+        self.interval = interval
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, year):
+        """
+        :return: Directory of the snapshot of a year
+        """
+        return os.path.join(self.directory, 'year{:05d}'.format(year))
+
+    def __call__(self, sim):
+        """
+        Exports a snapshot if the year is chosen.
+
+        :param sim: BioSim instance after a year
+        """
+        year = sim.island.year
+        if year in self.years or (self.interval is not None and
+                                  year % self.interval == 0):
+            export_snapshot(sim, self.path(year))
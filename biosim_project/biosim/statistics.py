@@ -0,0 +1,127 @@
+# -*- Utf-8 -*-
+
+import numpy as np
+
+"""
+Statistics module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class Histograms(object):
+    """
+    Class object: Histograms.
+    Records fixed-bin histograms of age, weight and fitness for each species
+    on the island every <interval> years. Values below the first edge or
+    above the last edge are not put in the histogram, but counted apart,
+    see out_of_range.
+        - <var> = Histograms(interval=5)
+        - <var>.update(island) must run after each simulated year
+    """
+
+    attributes = ("age", "weight", "fitness")
+    default_bins = {"age": np.linspace(0, 60, 31),
+                    "weight": np.linspace(0, 100, 51),
+                    "fitness": np.linspace(0, 1, 21)}
+
+    def __init__(self, interval=1, bins=None):
+        """
+        :param interval: Number of years between each recorded histogram
+        :param bins: Dictionary with bin edges for "age", "weight" and/or
+        "fitness", at least two strictly increasing values. Missing
+        attributes use default_bins.
+        """
+        if interval < 1:
+            raise ValueError('Interval must be a positive number of years!')
+        self.interval = interval
+        self.bins = dict(self.default_bins)
+        if bins is not None:
+            for attribute in bins:
+                if attribute not in self.attributes:
+                    raise ValueError('"{}" is not a recorded attribute!'
+                                     .format(attribute))
+                edges = np.asarray(bins[attribute], dtype=float)
+                if (edges.ndim != 1 or len(edges) < 2 or
+                        np.any(np.diff(edges) <= 0)):
+                    raise ValueError('Bin edges of "{}" must be at least two '
+                                     'strictly increasing values!'
+                                     .format(attribute))
+                self.bins[attribute] = edges
+
+        num_bins = [len(self.bins[attribute]) + 1
+                    for attribute in self.attributes]
+        self.offsets = np.cumsum([0] + num_bins)
+        self.years = []
+        self.counts = {"herbivores": [], "carnivores": []}
+
+    def bin_counts(self, data):
+        """
+        Makes the histograms of all attributes for one species with a single
+        bincount. Each histogram has a count of values below the range
+        first and of values above it last. The last bin includes its right
+        edge.
+
+        :param data: Array with one row per animal and one column per
+        attribute (age, weight, fitness)
+        :return: Array with the concatenated histograms
+        """
+        indices = []
+        for column, attribute in enumerate(self.attributes):
+            edges = self.bins[attribute]
+            values = data[:, column]
+            index = np.searchsorted(edges, values, side="right")
+            index[values == edges[-1]] = len(edges) - 1
+            indices.append(index + self.offsets[column])
+        return np.bincount(np.concatenate(indices),
+                           minlength=self.offsets[-1])
+
+    def update(self, island):
+        """
+        Records histograms for the current year if it is a sampling year.
+
+        :param island: Island instance to record
+        """
+        if island.year % self.interval != 0:
+            return
+        for species, data in island.animal_attributes().items():
+            self.counts[species].append(self.bin_counts(data))
+        self.years.append(island.year)
+
+    def histogram(self, species, attribute):
+        """
+        Returns the recorded histograms of one attribute for one species.
+
+        :param species: "herbivores" or "carnivores"
+        :param attribute: "age", "weight" or "fitness"
+        :return: (years, counts, edges) where counts has one row per
+        recorded year
+        """
+        counts = self.recorded(species, attribute)
+        return np.array(self.years), counts[:, 1:-1], self.bins[attribute]
+
+    def out_of_range(self, species, attribute):
+        """
+        Returns the number of values outside the bins of one attribute for
+        one species.
+
+        :param species: "herbivores" or "carnivores"
+        :param attribute: "age", "weight" or "fitness"
+        :return: (years, below, above) with the number of values below the
+        first edge and above the last edge in each recorded year
+        """
+        counts = self.recorded(species, attribute)
+        return np.array(self.years), counts[:, 0], counts[:, -1]
+
+    def recorded(self, species, attribute):
+        """
+        :return: Array with the recorded counts of one attribute for one
+        species, one row per year, with the counts below and above the
+        range first and last
+        """
+        column = self.attributes.index(attribute)
+        start, stop = self.offsets[column], self.offsets[column + 1]
+        counts = np.array(self.counts[species], dtype=int).reshape(
+            len(self.years), self.offsets[-1])
+        return counts[:, start:stop]
@@ -0,0 +1,241 @@
+# -*- Utf-8 -*-
+
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+import biosim
+from biosim.checkpoint import save_checkpoint, load_checkpoint
+from biosim.scenario import build_simulation, scenario_parameters
+from biosim.simulation import BioSim
+from biosim.termination import TerminationPolicy
+
+"""
+Sweep module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def parameter_grid(grid):
+    """
+    Makes every combination of the values in a parameter grid.
+
+    :param grid: Dictionary mapping "Herbivore", "Carnivore", "J" and "S" to
+    dictionaries of parameter name and list of values, e.g.
+    {"Herbivore": {"mu": [0.1, 0.2]}, "J": {"fmax": [600, 800]}}
+    :return: List of parameter dictionaries, one per combination, in the
+    format of the "parameters" of a run specification
+    """
+    axes = [(name, parameter, values)
+            for name in sorted(grid)
+            for parameter, values in sorted(grid[name].items())]
+    parameter_sets = []
+    for combination in itertools.product(*[values for _, _, values in axes]):
+        parameters = {}
+        for (name, parameter, _), value in zip(axes, combination):
+            parameters.setdefault(name, {})[parameter] = value
+        parameter_sets.append(parameters)
+    return parameter_sets
+
+
+def scenario_key(spec):
+    """
+    Makes the cache key of a run specification. The key depends on the map,
+    initial population, parameters, seed, random number mode and
+    biosim.ENGINE_VERSION, but not on the number of years, so longer runs
+    can continue from shorter ones. The parameters are the resolved ones
+    (see biosim.scenario.scenario_parameters), so class parameters changed
+    with e.g. Herbivore.set_parameters give another key, and a missing map
+    gives the key of the default map.
+
+    :param spec: Run specification, see biosim.scenario.build_simulation
+    :return: Hexadecimal SHA-1 digest
+    """
+    island_map = spec.get("island_map")
+    if island_map is None:
+        island_map = BioSim.default_map
+    parameters = scenario_parameters(spec)
+    resolved = dict(parameters.animal_params)
+    resolved.update(parameters.landscape_params)
+    content = {"island_map": island_map.replace(" ", ""),
+               "ini_pop": spec.get("ini_pop", []),
+               "parameters": resolved,
+               "seed": spec["seed"],
+               "engine": biosim.ENGINE_VERSION}
+    if spec.get("common_random_numbers"):
+        content["common_random_numbers"] = True
+    if spec.get("termination") is not None:
+        content["termination"] = spec["termination"]
+    text = json.dumps(content, sort_keys=True,
+                      default=lambda value: value.item())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Class object: ResultCache.
+    Stores the yearly number of herbivores and carnivores of runs in a
+    directory, one subdirectory per run specification, together with a
+    checkpoint of the simulation after the last year (see
+    biosim.checkpoint), so the run can be continued later.
+        - <var> = ResultCache(directory)
+        - <var>.load(spec) returns (totals, simulation, stop) or None
+        - <var>.store(spec, totals, simulation, stop)
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory for the cached runs, made if missing
+        """
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, spec):
+        """
+        :return: Directory of the cached run of a run specification
+        """
+        return os.path.join(self.directory, scenario_key(spec))
+
+    def load(self, spec, simulation=True):
+        """
+        :param spec: Run specification
+        :param simulation: Whether to restore the simulation, else None is
+        given in its place
+        :return: Tuple (totals, simulation, stop) where totals is an array
+        of shape (years, 2) and stop is (year, reason) for runs stopped by
+        their termination policy, or None if the run is not cached
+        """
+        path = self.path(spec)
+        try:
+            with open(os.path.join(path, 'run.json')) as f:
+                entry = json.load(f)
+            totals = np.load(os.path.join(path, 'totals.npy'))
+        except (IOError, OSError, ValueError):
+            return None
+        if entry["engine"] != biosim.ENGINE_VERSION:
+            return None
+        stop = None if entry["stop"] is None else tuple(entry["stop"])
+        sim = None
+        if simulation:
+            sim = load_checkpoint(os.path.join(path, 'state'))
+        return totals, sim, stop
+
+    def store(self, spec, totals, simulation, stop=None):
+        """
+        Stores a run. The run is written under a temporary name first, so a
+        run that is interrupted never leaves a broken cache entry.
+
+        :param spec: Run specification
+        :param totals: Array of shape (years, 2) with herbivores and
+        carnivores after each year
+        :param simulation: BioSim instance after the last year
+        :param stop: (year, reason) if the run was stopped by its
+        termination policy
+        """
+        temporary = tempfile.mkdtemp(dir=self.directory)
+        np.save(os.path.join(temporary, 'totals.npy'), totals)
+        save_checkpoint(simulation, os.path.join(temporary, 'state'))
+        with open(os.path.join(temporary, 'run.json'), 'w') as f:
+            json.dump({"engine": biosim.ENGINE_VERSION, "stop": stop}, f)
+        path = self.path(spec)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(temporary, path)
+
+
+def run_cached(task):
+    """
+    Runs a specification, reusing what is cached. Runs cached for at least
+    the number of years asked for, or stopped by their termination policy,
+    are not simulated again, shorter runs are continued from their last year.
+
+    :param task: Tuple (spec, directory)
+    :return: Dictionary with arrays of the number of "herbivores" and
+    "carnivores" after each year, as from biosim.scenario.run_scenario
+    """
+    spec, directory = task
+    cache = ResultCache(directory)
+    policy = TerminationPolicy.from_spec(spec)
+    cached = cache.load(spec, simulation=False)
+    if cached is None:
+        totals, stop = np.zeros((0, 2), dtype=int), None
+    else:
+        totals, _, stop = cached
+    if stop is None and len(totals) < spec["years"]:
+        if cached is None:
+            sim = build_simulation(spec)
+        else:
+            sim = cache.load(spec)[1]
+        if policy is not None:
+            policy.replay(totals)
+        new = sim.run(spec["years"] - len(totals), termination=policy)
+        if policy is not None:
+            stop = policy.outcome
+        totals = np.concatenate((totals, np.column_stack(
+            (new["herbivores"], new["carnivores"])).astype(int)))
+        cache.store(spec, totals, sim, stop)
+    years = spec["years"]
+    result = {"herbivores": totals[:years, 0],
+              "carnivores": totals[:years, 1]}
+    if policy is not None:
+        result["stopped"], result["reason"] = (
+            stop if stop is not None and stop[0] <= years else (None, None))
+    return result
+
+
+def sweep(spec, parameter_sets, seeds, directory, processes=None):
+    """
+    Runs a specification for every combination of parameter set and seed on
+    a process pool, with results cached in a directory. Parameters in a set
+    are added to those of the specification.
+
+    :param spec: Run specification, see biosim.scenario.build_simulation
+    :param parameter_sets: List of parameter dictionaries, see
+    parameter_grid
+    :param seeds: List of seeds
+    :param directory: Cache directory
+    :param processes: Number of worker processes, default is the number of
+    CPUs
+    :return: List of dictionaries with the "parameters", "seed",
+    "herbivores" and "carnivores" of each run, parameter set by parameter
+    set, and "stopped" and "reason" if the specification has a
+    "termination" policy
+    """
+    specs = []
+    for parameters in parameter_sets:
+        combined = {name: dict(params) for name, params
+                    in spec.get("parameters", {}).items()}
+        for name, params in parameters.items():
+            combined.setdefault(name, {}).update(params)
+        for seed in seeds:
+            run_spec = dict(spec)
+            run_spec["parameters"] = combined
+            run_spec["seed"] = seed
+            specs.append((parameters, run_spec))
+
+    unique = {}
+    for _, run_spec in specs:
+        unique.setdefault(scenario_key(run_spec), run_spec)
+    keys = sorted(unique)
+    ResultCache(directory)
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = dict(zip(keys, pool.map(
+            run_cached, [(unique[key], directory) for key in keys])))
+    finally:
+        pool.close()
+        pool.join()
+
+    runs = []
+    for parameters, run_spec in specs:
+        run = dict(results[scenario_key(run_spec)])
+        run.update(parameters=parameters, seed=run_spec["seed"])
+        runs.append(run)
+    return runs
@@ -0,0 +1,222 @@
+# -*- Utf-8 -*-
+
+import collections
+import math
+import numpy as np
+
+"""
+Termination module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TerminationPolicy(object):
+    """
+    Class object: TerminationPolicy.
+    Decides when a headless run can stop early. A run stops when
+        - extinction="any": a species that has been on the island dies out
+        - extinction="all": there are no animals left
+        - window=n: for each species, a Welch t test finds no difference
+          at significance level <alpha> between the mean number over the
+          last n years and the mean over the n years before (steady state).
+          The test takes the years of a window as independent, so strongly
+          correlated years, e.g. long cycles, can still pass it. With
+          <tolerance>, the means must also differ by at most <tolerance>
+          times the latest mean.
+    The year and reason of the stop are kept in <var>.year and <var>.reason.
+    A policy follows one run, make a new one for each run.
+        - <var> = TerminationPolicy(extinction="any", window=50)
+        - <var>.update(herbivores, carnivores) after each year, True to stop
+        - <var>.outcome is (year, reason) once stopped
+    Runs are simulated with a policy by BioSim.steps and BioSim.run.
+    """
+
+    def __init__(self, extinction=None, window=None, alpha=0.05,
+                 tolerance=None):
+        """
+        :param extinction: None, "any" or "all"
+        :param window: Number of years in each window of the steady state
+        test, None to not test for steady state
+        :param alpha: Significance level of the steady state test
+        :param tolerance: Optional largest relative change between the
+        windows
+        """
+        if extinction not in (None, "any", "all"):
+            raise ValueError('Extinction must be None, "any" or "all"!')
+        if window is not None and window < 2:
+            raise ValueError('Window must be at least two years!')
+        if not 0 < alpha < 1:
+            raise ValueError('Alpha must be between 0 and 1!')
+        self.extinction = extinction
+        self.window = window
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.history = collections.deque(maxlen=2 * (window or 0))
+        self.seen = np.zeros(2, dtype=bool)
+        self.years = 0
+        self.year = None
+        self.reason = None
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Makes the policy of a run specification.
+
+        :param spec: Run specification, see biosim.scenario.build_simulation
+        :return: TerminationPolicy, or None if the specification has no
+        "termination"
+        """
+        if spec.get("termination") is None:
+            return None
+        return cls(**spec["termination"])
+
+    @classmethod
+    def coerce(cls, termination):
+        """
+        :param termination: None, TerminationPolicy or dictionary of its
+        arguments
+        :return: TerminationPolicy, or None
+        """
+        if isinstance(termination, dict):
+            return cls(**termination)
+        return termination
+
+    @property
+    def stopped(self):
+        """True when the run should stop."""
+        return self.reason is not None
+
+    @property
+    def outcome(self):
+        """(year, reason) of the stop, or None while the run goes on."""
+        return (self.year, self.reason) if self.stopped else None
+
+    def replay(self, totals):
+        """
+        Checks the totals of years simulated earlier, e.g. of a run that is
+        continued.
+
+        :param totals: Array of shape (years, 2) with herbivores and
+        carnivores after each year
+        :return: True if the run should stop
+        """
+        for herbivores, carnivores in totals:
+            self.update(herbivores, carnivores)
+        return self.stopped
+
+    def update(self, herbivores, carnivores):
+        """
+        Checks the totals after one more year.
+
+        :param herbivores: Number of herbivores on the island
+        :param carnivores: Number of carnivores on the island
+        :return: True if the run should stop
+        """
+        if self.stopped:
+            return True
+        self.years += 1
+        totals = np.array([herbivores, carnivores])
+        self.seen |= totals > 0
+        extinct = self.seen & (totals == 0)
+        if ((self.extinction == "any" and np.any(extinct)) or
+                (self.extinction == "all" and np.all(totals == 0))):
+            self.stop("extinction")
+        elif self.window is not None:
+            self.history.append(totals)
+            if len(self.history) == 2 * self.window:
+                history = np.array(self.history, dtype=float)
+                if self.steady(history[:self.window],
+                               history[self.window:]):
+                    self.stop("steady state")
+        return self.stopped
+
+    def steady(self, earlier, later):
+        """
+        :param earlier: Array of shape (window, 2) with the totals of the
+        earlier window
+        :param later: Array of shape (window, 2) with the totals of the
+        later window
+        :return: True if no species changed between the windows
+        """
+        if np.any(welch_pvalues(earlier, later) <= self.alpha):
+            return False
+        if self.tolerance is None:
+            return True
+        change = np.abs(later.mean(axis=0) - earlier.mean(axis=0))
+        return bool(np.all(change <= self.tolerance *
+                           np.maximum(later.mean(axis=0), 1)))
+
+    def stop(self, reason):
+        """
+        Records that the run stops after the current year.
+        """
+        self.year = self.years
+        self.reason = reason
+
+
+def welch_pvalues(earlier, later):
+    """
+    Welch t test of equal means in two samples with unequal variances.
+
+    :param earlier: Array of shape (n, k), n observations of k variables
+    :param later: Array of shape (m, k), m observations of k variables
+    :return: Array of k two-sided p-values. Samples without variation have
+    p-value 1 if their means are equal and 0 otherwise.
+    """
+    earlier = np.asarray(earlier, dtype=float)
+    later = np.asarray(later, dtype=float)
+    n, m = len(earlier), len(later)
+    difference = later.mean(axis=0) - earlier.mean(axis=0)
+    v1 = earlier.var(axis=0, ddof=1) / n
+    v2 = later.var(axis=0, ddof=1) / m
+    pvalues = np.where(difference == 0, 1., 0.)
+    for i in np.flatnonzero(v1 + v2 > 0):
+        t = difference[i] / math.sqrt(v1[i] + v2[i])
+        df = (v1[i] + v2[i]) ** 2 / (v1[i] ** 2 / (n - 1) +
+                                     v2[i] ** 2 / (m - 1))
+        pvalues[i] = t_pvalue(t, df)
+    return pvalues
+
+
+def t_pvalue(t, df):
+    """
+    :param t: t statistic
+    :param df: Degrees of freedom, need not be whole
+    :return: Two-sided p-value of <t> in Student's t distribution, the
+    regularized incomplete beta function I_x(df/2, 1/2), x = df/(df + t^2)
+    """
+    x = float(df) / (df + t * t)
+    a, b = df / 2., .5
+    if x <= 0 or x >= 1:
+        return float(x >= 1)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                     a * math.log(x) + b * math.log1p(-x))
+    # The continued fraction converges fast for x < (a + 1) / (a + b + 2)
+    if x < (a + 1) / (a + b + 2):
+        return front * _beta_fraction(a, b, x) / a
+    return 1 - front * _beta_fraction(b, a, 1 - x) / b
+
+
+def _beta_fraction(a, b, x, iterations=200, eps=1e-12):
+    """
+    Continued fraction of the incomplete beta function by the modified
+    Lentz method.
+    """
+    tiny = 1e-300
+    c, d = 1., 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for k in xrange(1, iterations + 1):
+        for numerator in (k * (b - k) * x / ((a + 2 * k - 1) * (a + 2 * k)),
+                          -(a + k) * (a + b + k) * x /
+                          ((a + 2 * k) * (a + 2 * k + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1) < eps:
+            break
+    return fraction
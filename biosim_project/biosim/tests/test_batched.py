@@ -0,0 +1,89 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.batched import BatchedIsland
+from biosim.parameters import Parameters
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def population(species, number, loc=(2, 2), age=5, weight=20):
+    return [{'loc': loc, 'pop': [{'species': species, 'age': age,
+                                  'weight': weight} for _ in range(number)]}]
+
+
+class TestBatchedIsland(object):
+    def test_neighbours(self):
+        """
+        Tests that only passable neighbours can be migrated to
+        """
+        island = BatchedIsland("OOOO\nOJDO\nOMOO")
+        nt.assert_equal(island.num_neighbours[5], 1)
+        nt.assert_equal(island.neighbours[5, 0], 6)
+        nt.assert_equal(island.num_neighbours[6], 1)
+
+    def test_herbivore_feeding(self):
+        """
+        Tests that the fittest herbivores eat first, until the food is gone
+        """
+        parameters = Parameters()
+        parameters.set_landscape_parameters("J", {"fmax": 25})
+        island = BatchedIsland("OOO\nOJO\nOOO", parameters=[parameters])
+        island.add_population([{'loc': (2, 2), 'pop': [
+            {'species': 'Herbivore', 'age': age, 'weight': 20}
+            for age in (30, 10, 20)]}])
+        island.feed_herbivores()
+        beta = parameters.animal_params["Herbivore"]["beta"]
+        nt.assert_true(np.allclose(island.animals["herbivores"]["weight"],
+                                   [20 + 5 * beta, 20 + 10 * beta,
+                                    20 + 10 * beta]))
+        nt.assert_equal(island.food[0, 4], 0)
+        weights = island.animals["herbivores"]["weight"].copy()
+        island.feed_herbivores()
+        nt.assert_true(np.array_equal(island.animals["herbivores"]["weight"],
+                                      weights))
+
+    def test_replica_parameters(self):
+        """
+        Tests that each replica uses its own parameters
+        """
+        frozen = Parameters()
+        frozen.set_animal_parameters("Herbivore", {"omega": 0, "gamma": 0,
+                                                   "mu": 0})
+        island = BatchedIsland("OOOO\nOJSO\nOOOO", seed=1,
+                               parameters=[frozen, Parameters()])
+        island.add_population(population('Herbivore', 10))
+        for _ in range(10):
+            counts = island.one_year()
+        nt.assert_equal(counts.shape, (2, 2, 3, 4))
+        nt.assert_equal(counts[0, 0, 1, 1], 10)
+        nt.assert_equal(island.totals()[0, 0], 10)
+
+    def test_reproducible(self):
+        """
+        Tests that runs with the same seed give the same results
+        """
+        results = []
+        for _ in range(2):
+            island = BatchedIsland("OOOOO\nOJJSO\nOJSDO\nOOOOO", replicas=3,
+                                   seed=4)
+            island.add_population(population('Herbivore', 20) +
+                                  population('Carnivore', 5))
+            for _ in range(5):
+                counts = island.one_year()
+            results.append(counts)
+        nt.assert_true(np.array_equal(results[0], results[1]))
+        nt.assert_true(np.all(results[0][:, :, 0, :] == 0))
+
+    def test_carnivores_eat(self):
+        """
+        Tests that fit carnivores kill and eat weak herbivores
+        """
+        island = BatchedIsland("OOO\nOJO\nOOO", seed=2)
+        island.add_population(population('Herbivore', 30, age=80, weight=5) +
+                              population('Carnivore', 3, weight=40))
+        island.feed_carnivores()
+        nt.assert_less(len(island.animals["herbivores"]["weight"]), 30)
+        nt.assert_true(np.all(island.animals["carnivores"]["weight"] > 40))
@@ -0,0 +1,69 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.simulation import BioSim
+from biosim.branching import run_branch, run_branches
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestBranching(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSJO
+               OOOOO"""
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                        'weight': 20} for _ in range(20)]}]
+    carnivores = [{'loc': (2, 2), 'pop': [{'species': 'Carnivore', 'age': 5,
+                                           'weight': 20} for _ in range(5)]}]
+
+    def warm_up(self):
+        sim = BioSim(self.geogr, self.ini_pop, seed=8)
+        for _ in range(5):
+            sim.one_year()
+        return sim
+
+    def test_fork_continues_identically(self):
+        """
+        Tests that a fork with the same seed gives the same results as the
+        original
+        """
+        sim = self.warm_up()
+        fork = sim.fork()
+        for _ in range(3):
+            nt.assert_equal(sim.heatmap(sim.one_year()),
+                            fork.heatmap(fork.one_year()))
+
+    def test_fork_is_independent(self):
+        """
+        Tests that changing a fork leaves the original alone
+        """
+        sim = self.warm_up()
+        before = sim.animal()
+        fork = sim.fork(seed=9)
+        fork.set_animal_parameters("Herbivore", {"omega": 1})
+        fork.add_population(self.carnivores)
+        nt.assert_equal(sim.animal(), before)
+        nt.assert_is(sim.island.parameters, None)
+        nt.assert_not_equal(fork.island.streams.seed,
+                            sim.island.streams.seed)
+
+    def test_parallel_branches(self):
+        """
+        Tests that parallel branches give the same results as running them
+        one by one
+        """
+        sim = self.warm_up()
+        branches = [{"years": 4},
+                    {"years": 4, "seed": 3},
+                    {"years": 4, "ini_pop": self.carnivores,
+                     "parameters": {"Carnivore": {"F": 20}}}]
+        results = run_branches(sim, branches, processes=2)
+        for branch, result in zip(branches, results):
+            expected = run_branch(branch, sim)
+            nt.assert_true(np.array_equal(result["herbivores"],
+                                          expected["herbivores"]))
+        nt.assert_true(np.all(results[2]["carnivores"] > 0))
+        nt.assert_equal(sim.years_sim, 5)
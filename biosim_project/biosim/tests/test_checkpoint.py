@@ -0,0 +1,137 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+from biosim.simulation import BioSim
+from biosim.animals import Herbivore
+from biosim.checkpoint import (capture, save_checkpoint, load_checkpoint,
+                               read, CheckpointWriter, PeriodicCheckpoint,
+                               FORMAT_VERSION)
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestCheckpoint(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(30)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def state(sim):
+        return [[(animal.age, animal.weight, animal.fitness,
+                  animal.coordinates)
+                 for animal in cell.herbivores + cell.carnivores]
+                for cell in sim.island.island.flat], sim.island.food().tolist()
+
+    def test_restore_is_exact(self):
+        """
+        Tests that a restored simulation continues exactly as the original
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=4)
+        sim.set_animal_parameters("Carnivore", {"F": 30})
+        for _ in range(4):
+            sim.one_year()
+        path = os.path.join(self.directory, 'checkpoint')
+        save_checkpoint(sim, path)
+        restored = load_checkpoint(path)
+        nt.assert_equal(self.state(restored), self.state(sim))
+        nt.assert_equal(
+            [animal.id for animal in restored.island.island[1][1].herbivores],
+            [animal.id for animal in sim.island.island[1][1].herbivores])
+        nt.assert_equal(restored.island.parameters.animal_params
+                        ["Carnivore"]["F"], 30)
+        for _ in range(4):
+            sim.one_year()
+            restored.one_year()
+        nt.assert_equal(self.state(restored), self.state(sim))
+
+    def test_memory_mapped_columns(self):
+        """
+        Tests that the animal columns can be read memory mapped
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=4)
+        path = os.path.join(self.directory, 'checkpoint')
+        save_checkpoint(sim, path)
+        manifest, arrays = read(path, mmap_mode='r')
+        nt.assert_equal(manifest["year"], 0)
+        nt.assert_is_instance(arrays["herbivores_weight"], np.memmap)
+        nt.assert_equal(len(arrays["herbivores_weight"]), 30)
+        nt.assert_true(np.all(arrays["carnivores_cell"] == 6))
+
+    def test_newer_version_rejected(self):
+        """
+        Tests that checkpoints of a newer format raise ValueError
+        """
+        path = os.path.join(self.directory, 'checkpoint')
+        save_checkpoint(BioSim(self.geogr, [], seed=1), path)
+        manifest_path = os.path.join(path, 'manifest.json')
+        manifest = json.load(open(manifest_path))
+        manifest["version"] = FORMAT_VERSION + 1
+        json.dump(manifest, open(manifest_path, 'w'))
+        nt.assert_raises(ValueError, load_checkpoint, path)
+
+    def test_periodic_background_checkpoints(self):
+        """
+        Tests that the recorder writes checkpoints of the right years in the
+        background
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=4)
+        writer = CheckpointWriter()
+        sim.add_recorder(PeriodicCheckpoint(self.directory, 2, writer))
+        for _ in range(5):
+            sim.one_year()
+        writer.close()
+        nt.assert_equal(sorted(os.listdir(self.directory)),
+                        ['year00002', 'year00004'])
+        restored = load_checkpoint(os.path.join(self.directory,
+                                                'year00004'))
+        nt.assert_equal(restored.island.year, 4)
+
+    def test_unseeded_class_parameters(self):
+        """
+        Tests that an island without random streams can be saved, and that
+        it is restored with the class parameters in effect when it was saved
+        """
+        sim = BioSim(self.geogr, self.ini_pop)
+        sim.island.streams = None
+        manifest, _ = capture(sim)
+        nt.assert_is_none(manifest["seed"])
+        nt.assert_false(manifest["common_random_numbers"])
+        path = os.path.join(self.directory, 'checkpoint')
+        save_checkpoint(sim, path)
+        original = dict(Herbivore.params)
+        Herbivore.params["mu"] = 0.9
+        try:
+            restored = load_checkpoint(path)
+            nt.assert_equal(restored.island.animal_params("Herbivore")["mu"],
+                            original["mu"])
+        finally:
+            Herbivore.params.clear()
+            Herbivore.params.update(original)
+
+    def test_writer_reports_any_error(self):
+        """
+        Tests that errors other than IOError in the background thread are
+        raised when the writer is closed
+        """
+        writer = CheckpointWriter()
+        writer.queue.put((os.path.join(self.directory, 'checkpoint'),
+                          {"unserializable": object()}, {}))
+        nt.assert_raises(TypeError, writer.close)
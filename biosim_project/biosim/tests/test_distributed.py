@@ -0,0 +1,134 @@
+# -*- Utf-8 -*-
+
+import multiprocessing
+from multiprocessing.connection import Client
+import nose.tools as nt
+import numpy as np
+from biosim.distributed import Coordinator, worker, run_local
+from biosim.scenario import run_scenario
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def lost_worker(address, authkey):
+    """
+    Worker that takes a task and disappears without finishing it.
+    """
+    connection = Client(address, authkey=authkey)
+    connection.send(("ready",))
+    connection.recv()
+    connection.close()
+
+
+class TestDistributed(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+
+    def __init__(self):
+        self.specs = [{"island_map": self.geogr, "seed": seed, "years": 12,
+                       "ini_pop": [{'loc': (2, 2),
+                                    'pop': [{'species': 'Herbivore',
+                                             'age': 5, 'weight': 20}
+                                            for _ in range(20)]}],
+                       "parameters": {"Herbivore": {"gamma": 0.3}}}
+                      for seed in (1, 2, 3)]
+
+    def test_same_results_as_local_runs(self):
+        """
+        Tests that runs on socket workers give the same yearly totals as
+        running the specifications directly
+        """
+        for family in ('AF_INET', 'AF_UNIX'):
+            results = run_local(self.specs, workers=2, family=family)
+            for spec, result in zip(self.specs, results):
+                expected = run_scenario(spec)
+                nt.assert_true(np.array_equal(result["herbivores"],
+                                              expected["herbivores"]))
+                nt.assert_true(np.array_equal(result["carnivores"],
+                                              expected["carnivores"]))
+
+    def test_lost_work_is_retried(self):
+        """
+        Tests that a task taken by a worker that disappears is run by
+        another worker
+        """
+        coordinator = Coordinator(self.specs[:1])
+        coordinator.start()
+        lost = multiprocessing.Process(target=lost_worker,
+                                       args=(coordinator.address,
+                                             coordinator.authkey))
+        lost.start()
+        lost.join()
+        good = multiprocessing.Process(target=worker,
+                                       args=(coordinator.address,
+                                             coordinator.authkey))
+        good.start()
+        results = coordinator.run(timeout=30)
+        good.join()
+        nt.assert_equal(coordinator.failed, [])
+        nt.assert_equal(len(results[0]["herbivores"]), 12)
+
+    def test_gives_up_after_max_attempts(self):
+        """
+        Tests that a task is marked as failed after max_attempts lost runs
+        """
+        coordinator = Coordinator(self.specs[:1], max_attempts=1)
+        lost = multiprocessing.Process(target=lost_worker,
+                                       args=(coordinator.address,
+                                             coordinator.authkey))
+        lost.start()
+        results = coordinator.run(timeout=30)
+        lost.join()
+        nt.assert_equal(coordinator.failed, [0])
+        nt.assert_equal(results, [None])
+
+    def test_timeout_stops_acceptor(self):
+        """
+        Tests that a timed out coordinator stops accepting workers and marks
+        the runs left as failed
+        """
+        coordinator = Coordinator(self.specs[:1])
+        results = coordinator.run(timeout=0.1)
+        nt.assert_false(coordinator.acceptor.is_alive())
+        nt.assert_equal(coordinator.failed, [0])
+        nt.assert_equal(results, [None])
+
+    def test_failing_runs_not_retried(self):
+        """
+        Tests that runs raising an exception fail at once with their error,
+        and that the workers go on with the other runs
+        """
+        bad = dict(self.specs[0], ini_pop=[{'loc': (50, 50), 'pop': [
+            {'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+        specs = [bad, bad] + self.specs * 2
+        coordinator = Coordinator(specs)
+        processes = [multiprocessing.Process(
+            target=worker, args=(coordinator.address, coordinator.authkey))
+            for _ in range(2)]
+        for process in processes:
+            process.start()
+        results = coordinator.run(60)
+        for process in processes:
+            process.join()
+        nt.assert_equal(results[:2], [None, None])
+        nt.assert_true(all(result is not None for result in results[2:]))
+        nt.assert_equal(sorted(coordinator.failed), [0, 1])
+        nt.assert_equal(coordinator.attempts[:2], [0, 0])
+        nt.assert_equal(sorted(coordinator.errors), [0, 1])
+        nt.assert_true(all(process.exitcode == 0 for process in processes))
+
+    @staticmethod
+    def test_random_authkey():
+        """
+        Tests that coordinators get different random keys by default
+        """
+        first, second = Coordinator([]), Coordinator([])
+        try:
+            nt.assert_equal(len(first.authkey), 32)
+            nt.assert_not_equal(first.authkey, second.authkey)
+        finally:
+            first.listener.close()
+            second.listener.close()
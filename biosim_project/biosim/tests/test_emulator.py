@@ -0,0 +1,79 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+import shutil
+import tempfile
+from biosim.emulator import summarize, GaussianProcess, Emulator
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def fake_run(mu, fmax):
+    herbivores = np.full(10, 100 * mu + fmax / 10.0)
+    carnivores = np.full(10, 20.0)
+    if mu > 0.5:
+        carnivores[-1] = 0
+    return {"parameters": {"Herbivore": {"mu": mu}, "J": {"fmax": fmax}},
+            "herbivores": herbivores, "carnivores": carnivores}
+
+
+class TestGaussianProcess(object):
+    @staticmethod
+    def test_interpolation():
+        """
+        Tests that the process follows a smooth function and is more
+        certain close to the training points
+        """
+        inputs = np.linspace(0, 1, 12)[:, None]
+        process = GaussianProcess()
+        process.fit(inputs, np.sin(4 * inputs[:, 0]))
+        mean, std = process.predict([[0.5], [0.55]])
+        nt.assert_true(np.allclose(mean, np.sin([2.0, 2.2]), atol=0.02))
+        _, far = process.predict([[3.0]])
+        nt.assert_greater(far[0], std.max())
+
+
+class TestEmulator(object):
+    def test_summarize(self):
+        """
+        Tests the summary of the runs of one parameter set
+        """
+        summary = summarize([fake_run(0.2, 800), fake_run(0.8, 800)])
+        nt.assert_almost_equal(summary["herbivores"], 130)
+        nt.assert_almost_equal(summary["carnivores"], 18)
+        nt.assert_almost_equal(summary["extinction"], 0.5)
+
+    def test_predict(self):
+        """
+        Tests predictions between the training points
+        """
+        emulator = Emulator([("Herbivore", "mu"), ("J", "fmax")])
+        emulator.add_runs([fake_run(mu, fmax)
+                           for mu in np.linspace(0, 1, 6)
+                           for fmax in (400, 600, 800)])
+        prediction = emulator.predict({"Herbivore": {"mu": 0.3},
+                                       "J": {"fmax": 500}})
+        nt.assert_almost_equal(prediction["herbivores"][0], 80, delta=2)
+        nt.assert_true(0 <= prediction["extinction"][0] <= 1)
+
+    def test_refine(self):
+        """
+        Tests that refinement runs the least certain candidate
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            spec = {"island_map": "OOOO\nOJSO\nOOOO", "years": 4,
+                    "ini_pop": [{'loc': (2, 2), 'pop': [
+                        {'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(10)]}]}
+            emulator = Emulator([("Herbivore", "mu")])
+            emulator.add_runs([fake_run(mu, 800) for mu in (0.1, 0.2, 0.3)])
+            candidates = [{"Herbivore": {"mu": mu}} for mu in (0.25, 0.9)]
+            chosen = emulator.refine(spec, candidates, [1], directory,
+                                     processes=1)
+            nt.assert_equal(chosen, [{"Herbivore": {"mu": 0.9}}])
+            nt.assert_in((0.9,), emulator.runs)
+        finally:
+            shutil.rmtree(directory)
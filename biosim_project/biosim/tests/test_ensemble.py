@@ -0,0 +1,115 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.ensemble import StreamingStatistics, run_ensemble
+from biosim.scenario import run_scenario
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestStreamingStatistics(object):
+    def test_mean_and_variance(self):
+        """
+        Tests that the streaming mean and variance match numpy
+        """
+        runs = np.random.RandomState(1).normal(10, 2, size=(50, 4))
+        stats = StreamingStatistics(4)
+        for run in runs:
+            stats.update(run)
+        nt.assert_true(np.allclose(stats.mean, runs.mean(axis=0)))
+        nt.assert_true(np.allclose(stats.variance, runs.var(axis=0, ddof=1)))
+
+    def test_quantiles(self):
+        """
+        Tests that the quantile estimates are close to the sample quantiles
+        """
+        runs = np.random.RandomState(2).uniform(0, 100, size=(2000, 3))
+        stats = StreamingStatistics(3, quantiles=(0.1, 0.5, 0.9))
+        for run in runs:
+            stats.update(run)
+        for probability in (0.1, 0.5, 0.9):
+            exact = np.percentile(runs, 100 * probability, axis=0)
+            nt.assert_true(np.all(np.abs(stats.quantile(probability) -
+                                         exact) < 3))
+
+    def test_few_runs(self):
+        """
+        Tests that quantiles are exact before the estimator has started
+        """
+        stats = StreamingStatistics(2)
+        stats.update([1, 4])
+        stats.update([3, 8])
+        nt.assert_true(np.allclose(stats.quantile(0.5), [2, 6]))
+
+    def test_shorter_runs(self):
+        """
+        Tests that a shorter run only counts for its own years
+        """
+        runs = np.random.RandomState(3).normal(10, 2, size=(20, 3))
+        stats = StreamingStatistics(3)
+        for run in runs:
+            stats.update(run)
+        stats.update([100])
+        nt.assert_equal(list(stats.counts), [21, 20, 20])
+        nt.assert_true(np.allclose(stats.mean[1:], runs[:, 1:].mean(axis=0)))
+        nt.assert_true(np.allclose(stats.variance[1:],
+                                   runs[:, 1:].var(axis=0, ddof=1)))
+        nt.assert_almost_equal(stats.mean[0],
+                               np.append(runs[:, 0], 100).mean())
+
+
+class TestEnsemble(object):
+    spec = {"island_map": "OOOO\nOJSO\nOOOO", "years": 4,
+            "ini_pop": [{'loc': (2, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5,
+                                  'weight': 20} for _ in range(20)]}]}
+
+    def test_ensemble_matches_runs(self):
+        """
+        Tests that the ensemble mean equals the mean of the single runs
+        """
+        seeds = range(6)
+        summary = run_ensemble(self.spec, seeds, processes=2)
+        runs = []
+        for seed in seeds:
+            spec = dict(self.spec)
+            spec["seed"] = seed
+            runs.append(run_scenario(spec)["herbivores"])
+        nt.assert_equal(summary["runs"], 6)
+        nt.assert_equal(len(summary["years"]), 4)
+        nt.assert_true(np.allclose(summary["herbivores"]["mean"],
+                                   np.mean(runs, axis=0)))
+        nt.assert_true(np.all(summary["herbivores"][0.05] <=
+                              summary["herbivores"][0.95]))
+
+    def test_extinct_runs_padded(self):
+        """
+        Tests that runs where every animal died out count as zero after they
+        stopped
+        """
+        spec = dict(self.spec, years=30,
+                    parameters={"Herbivore": {"omega": 1, "gamma": 0,
+                                              "a_half": 0, "phi_age": 1}},
+                    termination={"extinction": "all"})
+        summary = run_ensemble(spec, range(3), processes=2)
+        nt.assert_equal(summary["reasons"], {"extinction": 3})
+        nt.assert_true(np.all(summary["stopped"] < 30))
+        nt.assert_equal(len(summary["herbivores"]["mean"]), 30)
+        nt.assert_equal(summary["herbivores"]["mean"][-1], 0)
+        nt.assert_true(np.all(summary["contributing"] == 3))
+
+    def test_stopped_runs_excluded(self):
+        """
+        Tests that runs stopped in a steady state do not count after they
+        stopped
+        """
+        spec = dict(self.spec, years=10,
+                    termination={"window": 2, "tolerance": 100})
+        summary = run_ensemble(spec, range(3), processes=2)
+        nt.assert_equal(summary["reasons"], {"steady state": 3})
+        nt.assert_equal(list(summary["contributing"]), [3] * 4 + [0] * 6)
+        nt.assert_false(np.any(np.isnan(summary["herbivores"]["mean"][:4])))
+        nt.assert_true(np.all(np.isnan(summary["herbivores"]["mean"][4:])))
+        nt.assert_true(np.all(np.isnan(summary["carnivores"][0.5][4:])))
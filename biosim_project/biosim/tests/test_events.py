@@ -0,0 +1,137 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from biosim.simulation import BioSim
+from biosim.checkpoint import save_checkpoint
+from biosim.events import EventLog, EVENT_FIELDS, replay, year_slices
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestEvents(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(40)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                        for _ in range(10)]}]
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def population(sim):
+        state = {}
+        for species in ("herbivores", "carnivores"):
+            cells = sim.island.island.flat
+            animals = sorted((animal.id, index, animal.age)
+                             for index, cell in enumerate(cells)
+                             for animal in getattr(cell, species))
+            state[species] = animals
+        return state
+
+    def test_events_recorded(self):
+        """
+        Tests that every kind of event is recorded
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=2)
+        log = sim.record_events()
+        for _ in range(5):
+            sim.one_year()
+        for kind in ("births", "deaths", "kills", "migrations"):
+            nt.assert_greater(len(log.arrays(kind)), 0)
+        births = log.arrays("births")
+        nt.assert_true(np.all(births["id"] > births["parent"]))
+        migrations = log.arrays("migrations")
+        nt.assert_true(np.all(migrations["source"] !=
+                              migrations["destination"]))
+
+    def test_not_with_parallel(self):
+        """
+        Tests that events and parallel execution cannot be combined
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=2)
+        sim.use_parallel(processes=2, threads=True)
+        try:
+            nt.assert_raises(ValueError, sim.record_events)
+        finally:
+            sim.close_parallel()
+        sim.record_events()
+        nt.assert_raises(ValueError, sim.use_parallel, 2, True)
+        nt.assert_is_none(sim.parallel)
+
+    def test_save_and_load(self):
+        """
+        Tests that a saved log loads with the same events
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=2)
+        log = sim.record_events()
+        for _ in range(3):
+            sim.one_year()
+        path = os.path.join(self.directory, 'events.npz')
+        log.save(path)
+        loaded = EventLog.load(path)
+        nt.assert_true(np.array_equal(loaded.arrays("deaths"),
+                                      log.arrays("deaths")))
+
+    @staticmethod
+    def test_arrays_between_years():
+        """
+        Tests that events added after the arrays were read are appended in
+        year order
+        """
+        log = EventLog()
+        log.add("kills", 0, [(0, 1, 2, 3, 10.)])
+        nt.assert_equal(log.arrays("kills")["id"].tolist(), [1])
+        log.add("kills", 0, [(0, 4, 2, 3, 12.)])
+        log.add("kills", 1, [(1, 5, 2, 3, 14.)])
+        nt.assert_equal(log.arrays("kills")["id"].tolist(), [1, 4, 5])
+        nt.assert_equal(len(log.arrays("births")), 0)
+
+    @staticmethod
+    def test_year_slices():
+        """
+        Tests that events are split by year, with empty years and events
+        not in year order
+        """
+        events = np.array([(3, 1, 1, 0, 1.), (1, 2, 1, 0, 1.),
+                           (3, 3, 1, 0, 1.), (4, 4, 1, 0, 1.)],
+                          dtype=EVENT_FIELDS["kills"])
+        slices = year_slices(events, 1, 4)
+        nt.assert_equal([list(year["id"]) for year in slices],
+                        [[2], [], [1, 3]])
+
+    def test_replay(self):
+        """
+        Tests that replaying from a checkpoint gives the animals, cells and
+        ages of the simulation
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=2)
+        for _ in range(2):
+            sim.one_year()
+        path = os.path.join(self.directory, 'checkpoint')
+        save_checkpoint(sim, path)
+        log = sim.record_events()
+        for _ in range(4):
+            sim.one_year()
+        expected = self.population(sim)
+        for _ in range(2):
+            sim.one_year()
+        state = replay(path, log, 6)
+        for species in ("herbivores", "carnivores"):
+            replayed = zip(state[species]["id"].tolist(),
+                           state[species]["cell"].tolist(),
+                           state[species]["age"].tolist())
+            nt.assert_equal(replayed, expected[species])
+        nt.assert_raises(ValueError, replay, path, log, 1)
@@ -0,0 +1,115 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from biosim.simulation import BioSim
+from biosim.history import HistoryStore
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestHistoryStore(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                        for _ in range(5)]}]
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, store, years):
+        data = []
+        for year in range(years):
+            counts = np.random.randint(0, 50, (2, 4, 5))
+            fodder = np.random.random((4, 5))
+            store.append(counts, fodder, year)
+            data.append((counts, fodder))
+        return data
+
+    def test_chunks_written(self):
+        """
+        Tests that full chunks are written to disk as they fill up
+        """
+        store = HistoryStore(self.directory, (4, 5), chunk_years=3)
+        self.fill(store, 7)
+        nt.assert_true(os.path.exists(store.path(1, "counts")))
+        nt.assert_false(os.path.exists(store.path(2, "counts")))
+        store.close()
+        nt.assert_true(os.path.exists(store.path(2, "fodder")))
+
+    def test_reopen(self):
+        """
+        Tests that a reopened store gives the stored data, memory mapped,
+        and can be appended to
+        """
+        for compress in (False, True):
+            directory = os.path.join(self.directory, str(compress))
+            store = HistoryStore(directory, (4, 5), 3, compress)
+            data = self.fill(store, 5)
+            store.close()
+            store = HistoryStore.open(directory)
+            np.testing.assert_array_equal(store.years(), np.arange(5))
+            for year, (counts, fodder) in enumerate(data):
+                stored = store.year(year)
+                np.testing.assert_array_equal(stored[0], counts)
+                np.testing.assert_array_equal(stored[1], fodder)
+            store.append(data[0][0], data[0][1], 5)
+            store.close()
+            store = HistoryStore.open(directory)
+            np.testing.assert_array_equal(store.year(5)[0], data[0][0])
+            if not compress:
+                nt.assert_is_instance(store.chunk(0)[0], np.memmap)
+
+    def test_queries(self):
+        """
+        Tests the cell and region histories
+        """
+        store = HistoryStore(self.directory, (4, 5), chunk_years=2)
+        data = self.fill(store, 5)
+        counts = np.array([year[0] for year in data])
+        fodder = np.array([year[1] for year in data])
+        cell_counts, cell_fodder = store.cell(2, 3)
+        np.testing.assert_array_equal(cell_counts, counts[:, :, 2, 3])
+        np.testing.assert_array_equal(cell_fodder, fodder[:, 2, 3])
+        region = store.region(slice(1, 3), slice(0, 4))
+        np.testing.assert_array_equal(
+            region, counts[:, :, 1:3, 0:4].sum(axis=(2, 3)))
+
+    def test_out_of_order(self):
+        """
+        Tests that years must follow each other
+        """
+        store = HistoryStore(self.directory, (4, 5))
+        self.fill(store, 2)
+        nt.assert_raises(ValueError, store.append, np.zeros((2, 4, 5)),
+                         np.zeros((4, 5)), 5)
+        nt.assert_raises(ValueError, store.year, 3)
+
+    def test_recorder(self):
+        """
+        Tests that the store records a simulation year by year
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=1)
+        store = HistoryStore(self.directory, sim.island.island.shape, 2)
+        sim.add_recorder(store)
+        for _ in range(3):
+            sim.one_year()
+        store.close()
+        np.testing.assert_array_equal(store.years(), [1, 2, 3])
+        counts, fodder = store.year(3)
+        np.testing.assert_array_equal(counts, sim.island.counts())
+        np.testing.assert_array_equal(fodder, sim.island.food())
+        nt.assert_equal(counts[0].sum(), sum(
+            len(cell.herbivores) for cell in sim.island.island.flat))
@@ -199,6 +199,64 @@ class TestIsland:
         nt.assert_not_equal(island.island[1][1].herbivores[0].weight, 40)
         nt.assert_not_equal(island.island[1][1].carnivores[0].weight, 20)
 
+    def test_per_cell_food_parameters(self):
+        """
+        Tests that per-cell fmax and alpha are used where given, and class
+        parameters elsewhere
+        """
+        nan = float("nan")
+        island = Island("OOOO\nOJSO\nOSJO\nOOOO",
+                        fmax=[[nan] * 4, [nan, 500, nan, nan],
+                              [nan, 100, nan, nan], [nan] * 4],
+                        alpha=[[nan] * 4, [nan, nan, 0.5, nan],
+                               [nan, nan, nan, nan], [nan] * 4])
+        island.build_map()
+        nt.assert_equal(island.island[1][1].available_food_herb, 500)
+        nt.assert_equal(island.island[2][1].available_food_herb, 100)
+        for cell in island.island.flat:
+            cell.available_food_herb = 0
+        island.grow()
+        nt.assert_equal(island.island[1][1].available_food_herb, 500)
+        nt.assert_equal(island.island[1][2].available_food_herb, 150)
+        nt.assert_almost_equal(island.island[2][1].available_food_herb, 30)
+        nt.assert_equal(island.island[2][2].available_food_herb, 800)
+        nt.assert_equal(island.island[0][0].available_food_herb, 0)
+
+    def test_alpha_grid_only_in_savannah(self):
+        """
+        Tests that Jungle cells are replenished to fmax even where the
+        alpha grid covers them
+        """
+        island = Island("OOOO\nOJSO\nOOOO", alpha=np.full((3, 4), 0.5))
+        island.build_map()
+        for cell in island.island.flat:
+            cell.available_food_herb = 0
+        island.grow()
+        nt.assert_equal(island.island[1][1].available_food_herb, 800)
+        nt.assert_equal(island.island[1][2].available_food_herb, 150)
+
+    @staticmethod
+    def test_parameter_grid_shape():
+        """
+        Tests that parameter grids must have the same shape as the map
+        """
+        island = Island("OOO\nOJO\nOOO", fmax=np.zeros((2, 2)))
+        nt.assert_raises(ValueError, island.build_map)
+
+    @staticmethod
+    def test_parameter_grid_negative():
+        """
+        Tests that parameter grids must not have negative values, while nan
+        is allowed
+        """
+        nan = float("nan")
+        for name in ("fmax", "alpha"):
+            grid = [[nan] * 3, [nan, -1, nan], [nan] * 3]
+            island = Island("OOO\nOJO\nOOO", **{name: grid})
+            nt.assert_raises(ValueError, island.build_map)
+        island = Island("OOO\nOSO\nOOO", alpha=[[nan] * 3] * 3)
+        island.build_map()
+
 
 class TestMigration:
     geogr_simple = """OMO
@@ -0,0 +1,115 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from biosim.simulation import BioSim
+from biosim.loader import read_csv, read_npz, load_population
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestLoader(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def population(sim):
+        return [(index, species, animal.age, animal.weight)
+                for index, cell in enumerate(sim.island.island.flat)
+                for species in ('herbivores', 'carnivores')
+                for animal in getattr(cell, species)]
+
+    def test_csv(self):
+        """
+        Tests that a csv file is read in chunks and loaded
+        """
+        path = os.path.join(self.directory, 'population.csv')
+        with open(path, 'w') as f:
+            f.write('row,col,species,age,weight\n')
+            for index in range(7):
+                f.write('2,{},{},{},{}\n'.format(
+                    2 + index % 3, 'Herbivore' if index % 2 else 'Carnivore',
+                    index, 10.5 + index))
+        chunks = list(read_csv(path, chunk_size=3))
+        nt.assert_equal([len(chunk["age"]) for chunk in chunks], [3, 3, 1])
+        sim = BioSim(self.geogr, [], 1)
+        nt.assert_equal(load_population(sim, path, chunk_size=3), 7)
+        nt.assert_equal(sim.island.counts().sum(axis=(1, 2)).tolist(),
+                        [3, 4])
+        nt.assert_equal(len(sim.island.island[1][3].carnivores), 1)
+        nt.assert_equal(sim.island.island[1][3].carnivores[0].weight, 12.5)
+
+    def test_npz(self):
+        """
+        Tests that a .npz file gives the same population as the arrays
+        """
+        species = np.array([0, 1, 0, 0, 1])
+        loc = np.array([[2, 2], [2, 3], [3, 2], [2, 2], [3, 3]])
+        age = np.arange(5)
+        weight = np.linspace(10, 20, 5)
+        path = os.path.join(self.directory, 'population.npz')
+        np.savez(path, species=species, loc=loc, age=age, weight=weight)
+        loaded = BioSim(self.geogr, [], 1)
+        load_population(loaded, path, chunk_size=2)
+        direct = BioSim(self.geogr, [], 1)
+        direct.add_animals(species, loc, age, weight)
+        nt.assert_equal(self.population(loaded), self.population(direct))
+
+    def test_npz_chunks(self):
+        """
+        Tests that compressed archives with "row" and "col" and species names
+        are read chunk by chunk
+        """
+        species = np.array(['Herbivore', 'Carnivore'] * 3)
+        path = os.path.join(self.directory, 'population.npz')
+        np.savez_compressed(path, species=species, row=np.full(6, 2),
+                            col=np.arange(6) % 3 + 2, age=np.arange(6),
+                            weight=np.linspace(5, 10, 6))
+        chunks = list(read_npz(path, chunk_size=4))
+        nt.assert_equal([len(chunk["age"]) for chunk in chunks], [4, 2])
+        nt.assert_equal(chunks[1]["species"].tolist(),
+                        ['Herbivore', 'Carnivore'])
+        nt.assert_equal(chunks[0]["loc"].tolist(),
+                        [[2, 2], [2, 3], [2, 4], [2, 2]])
+        nt.assert_equal(chunks[1]["weight"].tolist(), [9, 10])
+
+    def test_npy_directory(self):
+        """
+        Tests that a directory of .npy columns gives the same population as
+        a .npz file
+        """
+        arrays = {"species": np.array([1, 0, 0, 1]),
+                  "loc": np.array([[2, 2], [2, 3], [3, 2], [2, 2]]),
+                  "age": np.arange(4), "weight": np.linspace(10, 20, 4)}
+        path = os.path.join(self.directory, 'population.npz')
+        np.savez(path, **arrays)
+        columns = os.path.join(self.directory, 'population')
+        os.mkdir(columns)
+        for name, values in arrays.items():
+            np.save(os.path.join(columns, name + '.npy'), values)
+        from_npz = BioSim(self.geogr, [], 1)
+        load_population(from_npz, path, chunk_size=3)
+        from_npy = BioSim(self.geogr, [], 1)
+        nt.assert_equal(load_population(from_npy, columns, chunk_size=3), 4)
+        nt.assert_equal(self.population(from_npy), self.population(from_npz))
+
+    def test_missing_column(self):
+        """
+        Tests that a csv file without all columns is refused
+        """
+        path = os.path.join(self.directory, 'population.csv')
+        with open(path, 'w') as f:
+            f.write('row,col,age,weight\n2,2,1,10\n')
+        nt.assert_raises(ValueError, list, read_csv(path))
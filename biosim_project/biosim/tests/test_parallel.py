@@ -0,0 +1,153 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.parallel import ParallelIsland, balance, split_runs
+from biosim.island import Island
+from biosim.simulation import BioSim
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestParallel(object):
+    geogr = """OOOOOO
+               OJJSJO
+               OJSDJO
+               OJJJJO
+               OOOOOO"""
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(60)]},
+               {'loc': (4, 4),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(30)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(10)]}]
+
+    @staticmethod
+    def state(sim):
+        return [[(animal.weight, animal.age, animal.fitness, animal.id)
+                 for animal in cell.herbivores + cell.carnivores]
+                for cell in sim.island.island.flat]
+
+    @staticmethod
+    def test_balance():
+        """
+        Tests that all items are assigned once and loads are balanced
+        """
+        loads = [10, 1, 1, 8, 2, 7, 1]
+        chunks = balance(loads, 3)
+        nt.assert_equal(sorted(sum(chunks, [])), list(range(len(loads))))
+        totals = [sum(loads[index] for index in chunk) for chunk in chunks]
+        nt.assert_less_equal(max(totals) - min(totals), 2)
+        nt.assert_equal(len(balance([5], 4)), 1)
+
+    @staticmethod
+    def test_split_runs():
+        """
+        Tests that runs are consecutive, cover all items once and have about
+        the same load
+        """
+        loads = [1, 1, 9, 1, 1, 1, 5, 1, 1, 1, 1, 9]
+        runs = split_runs(loads, 3)
+        nt.assert_equal(sum(runs, []), list(range(len(loads))))
+        totals = [sum(loads[index] for index in run) for run in runs]
+        nt.assert_less_equal(max(totals) - min(totals), 9)
+        nt.assert_equal(split_runs([5], 4), [[0]])
+
+    @staticmethod
+    def test_needs_seed():
+        """
+        Tests that an unseeded island cannot be run in parallel
+        """
+        island = Island("OOO\nOJO\nOOO")
+        island.build_map()
+        nt.assert_raises(ValueError, ParallelIsland, island)
+
+    def check_identical(self, threads):
+        serial = BioSim(self.geogr, self.ini_pop, 5)
+        parallel = BioSim(self.geogr, self.ini_pop, 5)
+        parallel.use_parallel(processes=3, threads=threads)
+        for _ in range(4):
+            nt.assert_true(np.array_equal(
+                serial.heatmap(serial.one_year()),
+                parallel.heatmap(parallel.one_year())))
+        parallel.close_parallel()
+        nt.assert_equal(self.state(serial), self.state(parallel))
+
+    def check_resident(self, imbalance):
+        serial = BioSim(self.geogr, self.ini_pop, 5)
+        parallel = BioSim(self.geogr, self.ini_pop, 5)
+        parallel.parallel = ParallelIsland(parallel.island, 2, rebalance=1,
+                                           imbalance=imbalance)
+        try:
+            workers = parallel.parallel
+            cell = workers.island.island[2][2]
+            for _ in range(3):
+                nt.assert_true(np.array_equal(
+                    serial.heatmap(serial.one_year()),
+                    parallel.heatmap(parallel.one_year())))
+                nt.assert_true(workers.resident)
+                nt.assert_true(np.array_equal(workers.counts(),
+                                              serial.island.counts()))
+                nt.assert_true(np.array_equal(workers.food(),
+                                              serial.island.food()))
+            nt.assert_equal(workers.island.island[2][2] is cell,
+                            imbalance > 2)
+            nt.assert_equal(self.state(serial), self.state(parallel))
+            nt.assert_false(workers.resident)
+            serial.one_year()
+            parallel.one_year()
+            nt.assert_equal(self.state(serial), self.state(parallel))
+        finally:
+            parallel.close_parallel()
+
+    def test_cells_stay_in_workers(self):
+        """
+        Tests that worker processes keep the cells between years and give
+        the serial counts and food without sending the cells back, and that
+        the cells are collected when the island is read
+        """
+        self.check_resident(imbalance=10)
+
+    def test_rebalance_identical_to_serial(self):
+        """
+        Tests that splitting the cells again every year gives the serial
+        results
+        """
+        self.check_resident(imbalance=0)
+
+    def test_processes_identical_to_serial(self):
+        """
+        Tests that a process pool gives exactly the serial results
+        """
+        self.check_identical(threads=False)
+
+    def test_threads_identical_to_serial(self):
+        """
+        Tests that a thread pool gives exactly the serial results
+        """
+        self.check_identical(threads=True)
+
+    @staticmethod
+    def test_ids_unique_in_parallel():
+        """
+        Tests that animals born in worker processes get unique ids
+        """
+        sim = BioSim(seed=3)
+        sim.set_animal_parameters("Herbivore", {"gamma": 0.5, "omega": 0.4,
+                                                "mu": 0.25})
+        sim.set_animal_parameters("Carnivore", {"gamma": 0.8, "omega": 0.9,
+                                                "mu": 0.4})
+        sim.use_parallel(processes=4)
+        try:
+            for _ in range(4):
+                sim.one_year()
+        finally:
+            sim.close_parallel()
+        ids = [animal.id for cell in sim.island.island.flat
+               for animal in cell.herbivores + cell.carnivores]
+        nt.assert_not_in(None, ids)
+        nt.assert_greater(max(ids), 189)
+        nt.assert_equal(len(set(ids)), len(ids))
@@ -0,0 +1,84 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+from biosim.parameters import Parameters
+from biosim.simulation import BioSim
+from biosim.animals import Herbivore
+from biosim.landscape import Jungle, Savannah
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestParameters(object):
+    geogr = """OOOOO
+               OJJSO
+               OOOOO"""
+
+    def __init__(self):
+        self.herb_params = None
+        self.jungle_params = None
+
+    def setup(self):
+        self.herb_params = dict(Herbivore.params)
+        self.jungle_params = dict(Jungle.params)
+
+    def teardown(self):
+        Herbivore.params.update(self.herb_params)
+        Jungle.params.update(self.jungle_params)
+
+    def test_copies_class_parameters(self):
+        """
+        Tests that a new instance starts with the class parameters, and that
+        changing it does not change the class parameters
+        """
+        parameters = Parameters()
+        nt.assert_equal(parameters.animal_params["Herbivore"],
+                        Herbivore.params)
+        parameters.set_animal_parameters("Herbivore", {"mu": 0.9})
+        parameters.set_landscape_parameters("J", {"fmax": 10})
+        nt.assert_equal(Herbivore.params["mu"], self.herb_params["mu"])
+        nt.assert_equal(Jungle.params["fmax"], self.jungle_params["fmax"])
+
+    @staticmethod
+    def test_invalid_parameters():
+        """
+        Tests that unknown species, landscapes and invalid values raise
+        ValueError
+        """
+        parameters = Parameters()
+        nt.assert_raises(ValueError, parameters.set_animal_parameters,
+                         "Omnivore", {"mu": 0.1})
+        nt.assert_raises(ValueError, parameters.set_animal_parameters,
+                         "Carnivore", {"mu": 2})
+        nt.assert_raises(ValueError, parameters.set_landscape_parameters,
+                         "D", {"fmax": 1})
+        nt.assert_raises(ValueError, parameters.set_landscape_parameters,
+                         "S", {"alpha": -1})
+
+    def test_simulations_use_own_parameters(self):
+        """
+        Tests that two simulations in one process can use different
+        parameters, including for newborn animals
+        """
+        pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 40}
+                        for _ in range(20)]}]
+        breeding = BioSim(self.geogr, pop, 1)
+        barren = BioSim(self.geogr, pop, 1)
+        breeding.set_animal_parameters("Herbivore",
+                                       {"gamma": 1, "omega": 0, "mu": 0})
+        barren.set_animal_parameters("Herbivore",
+                                     {"gamma": 0, "omega": 0, "mu": 0})
+        barren.set_landscape_parameters("J", {"fmax": 50})
+
+        breeding.one_year()
+        barren.one_year()
+        herbivores = breeding.island.island[1][1].herbivores
+        nt.assert_greater(len(herbivores), 20)
+        for herbivore in herbivores:
+            nt.assert_equal(herbivore.params["gamma"], 1)
+        nt.assert_equal(len(barren.island.island[1][1].herbivores), 20)
+        nt.assert_equal(barren.island.food_parameters()[0][1][1], 50)
+        nt.assert_equal(Savannah.params["fmax"],
+                        barren.island.island[1][3].params["fmax"])
@@ -0,0 +1,75 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.simulation import BioSim
+from biosim.population import (draw, cell_probabilities,
+                               generate_population)
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestPopulation(object):
+    geogr = """OOOOOO
+               OJJSSO
+               OJMDSO
+               OOOOOO"""
+
+    def setup(self):
+        self.sim = BioSim(self.geogr, [], 1)
+
+    def test_draw(self):
+        """
+        Tests the distributions
+        """
+        rng = np.random.RandomState(1)
+        values = draw(rng, ("randint", 2, 4), 1000)
+        nt.assert_equal(sorted(set(values)), [2, 3, 4])
+        nt.assert_true(np.all(draw(rng, ("constant", 7), 5) == 7))
+        nt.assert_almost_equal(np.mean(draw(rng, ("normal", 10, 1), 10000)),
+                               10, places=1)
+        nt.assert_raises(ValueError, draw, rng, ("poisson", 1), 5)
+
+    def test_layouts(self):
+        """
+        Tests that animals only get passable cells, and that the fmax layout
+        follows fmax
+        """
+        for layout in ("uniform", "clustered", "fmax"):
+            probabilities = cell_probabilities(self.sim.island, layout)
+            nt.assert_almost_equal(probabilities.sum(), 1)
+            nt.assert_equal(probabilities[2, 2], 0)
+            nt.assert_equal(probabilities[0].sum(), 0)
+        fmax = cell_probabilities(self.sim.island, "fmax")
+        nt.assert_equal(fmax[2, 3], 0)
+        nt.assert_almost_equal(fmax[1, 1] / fmax[1, 3], 800 / 300.)
+        nt.assert_raises(ValueError, cell_probabilities, self.sim.island,
+                         "spiral")
+
+    def test_generate(self):
+        """
+        Tests that a generated population is reproducible and can be added
+        """
+        first = generate_population(self.sim.island, 300, 100, "clustered",
+                                    seed=4)
+        second = generate_population(self.sim.island, 300, 100, "clustered",
+                                     seed=4)
+        for name in first:
+            np.testing.assert_array_equal(first[name], second[name])
+        nt.assert_equal(np.bincount(first["species"]).tolist(), [300, 100])
+        nt.assert_true(np.all(first["age"][first["species"] == 1] <= 10))
+        self.sim.add_animals(**first)
+        nt.assert_equal(self.sim.island.counts().sum(axis=(1, 2)).tolist(),
+                        [300, 100])
+        nt.assert_equal(self.sim.island.counts()[:, 2, 2].tolist(), [0, 0])
+
+    def test_custom_distributions(self):
+        """
+        Tests given age and weight distributions
+        """
+        population = generate_population(
+            self.sim.island, 50, 0, ages={"Herbivore": ("constant", 3)},
+            weights={"Herbivore": ("normal", 1, 5)}, seed=2)
+        nt.assert_true(np.all(population["age"] == 3))
+        nt.assert_true(np.all(population["weight"] >= 0.1))
@@ -0,0 +1,215 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.rng import RandomStreams, SlotStreams, slot_stream
+from biosim.island import Island
+from biosim.animals import Herbivore, Carnivore
+from biosim.landscape import Jungle
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestRandomStreams(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+
+    def __init__(self):
+        self.herb_params = None
+        self.carn_params = None
+
+    def setup(self):
+        self.herb_params = dict(Herbivore.params)
+        self.carn_params = dict(Carnivore.params)
+
+    def teardown(self):
+        Herbivore.params.update(self.herb_params)
+        Carnivore.params.update(self.carn_params)
+
+    def populated_island(self, seed):
+        island = Island(self.geogr, seed=seed)
+        island.build_map()
+        for coordinates, cell in np.ndenumerate(island.island):
+            if cell.passable:
+                cell.herbivores = [Herbivore(20, 5, coordinates)
+                                   for _ in range(15)]
+                cell.carnivores = [Carnivore(20, 5, coordinates)
+                                   for _ in range(5)]
+        return island
+
+    @staticmethod
+    def state(island):
+        return [[(animal.weight, animal.age, animal.coordinates)
+                 for animal in cell.herbivores + cell.carnivores]
+                for cell in island.island.flat]
+
+    @staticmethod
+    def test_same_key_same_numbers():
+        """
+        Tests that a stream only depends on its key
+        """
+        streams = RandomStreams(42)
+        first = streams.stream(3, (1, 2), "death").random_sample(5)
+        streams.stream(3, (2, 1), "death").random_sample(5)
+        second = streams.stream(3, (1, 2), "death").random_sample(5)
+        nt.assert_true(np.array_equal(first, second))
+
+    @staticmethod
+    def test_different_keys_differ():
+        """
+        Tests that changing any part of the key changes the stream
+        """
+        streams = RandomStreams(42)
+        reference = streams.stream(3, (1, 2), "death").random_sample()
+        for other in (RandomStreams(43).stream(3, (1, 2), "death"),
+                      streams.stream(4, (1, 2), "death"),
+                      streams.stream(3, (2, 1), "death"),
+                      streams.stream(3, (1, 2), "feeding")):
+            nt.assert_not_equal(other.random_sample(), reference)
+
+    @staticmethod
+    def test_cell_seeds_distinct():
+        """
+        Tests that the cells of a large map get different seeds, and that a
+        seed does not depend on the streams drawn before it
+        """
+        streams = RandomStreams(42)
+        seeds = [streams.cell_seed(7, (y, x), "migration")
+                 for y in range(100) for x in range(100)]
+        nt.assert_equal(len(set(seeds)), len(seeds))
+        nt.assert_equal(RandomStreams(42).cell_seed(7, (50, 50), "migration"),
+                        seeds[5050])
+
+    @staticmethod
+    def test_invalid_seed():
+        """
+        Tests that seeds outside [0, 2**32) raise ValueError
+        """
+        nt.assert_raises(ValueError, RandomStreams, -1)
+        nt.assert_raises(ValueError, RandomStreams, 2 ** 32)
+
+    def test_seeded_islands_are_reproducible(self):
+        """
+        Tests that two islands with the same seed give identical results,
+        whatever happens to the global random state in between
+        """
+        first = self.populated_island(7)
+        second = self.populated_island(7)
+        for _ in range(3):
+            first.one_year()
+            np.random.random_sample(11)
+            second.one_year()
+        nt.assert_equal(self.state(first), self.state(second))
+
+    def test_cell_order_does_not_matter(self):
+        """
+        Tests that processing the cells in reverse order gives the same
+        result as the island's own order
+        """
+        first = self.populated_island(7)
+        second = self.populated_island(7)
+        first.feeding()
+        first.procreation()
+        first.death()
+        cells = list(np.ndenumerate(second.island))[::-1]
+        for coordinates, cell in cells:
+            cell.feeding_cycle(second.cell_rng(coordinates, "feeding"))
+        for coordinates, cell in cells:
+            cell.breeding_cycle(second.cell_rng(coordinates, "procreation"))
+        for coordinates, cell in cells:
+            cell.death_cycle(second.cell_rng(coordinates, "death"))
+        nt.assert_equal(self.state(first), self.state(second))
+
+    @staticmethod
+    def test_slots_are_aligned():
+        """
+        Tests that a slot's stream does not depend on the other slots
+        """
+        slots = RandomStreams(42, slots=True).stream(3, (1, 2), "death")
+        nt.assert_is_instance(slots, SlotStreams)
+        first = slots.slot("herbivores", 2).random_sample(3)
+        slots.slot("herbivores", 0).random_sample(10)
+        nt.assert_true(np.array_equal(
+            first, slot_stream(slots, "herbivores", 2).random_sample(3)))
+        nt.assert_not_equal(first[0],
+                            slots.slot("carnivores", 2).random_sample())
+
+    @staticmethod
+    def test_slot_rows_do_not_depend_on_block_size():
+        """
+        Tests that a slot gets the same numbers whether or not the block was
+        grown for other slots first, also past the end of its row
+        """
+        count = SlotStreams.width + 3
+        alone = SlotStreams(9).slot("carnivores", 40).random_sample(count)
+        slots = SlotStreams(9)
+        slots.slot("carnivores", 0)
+        slots.slot("carnivores", 100)
+        after = slots.slot("carnivores", 40).random_sample(count)
+        nt.assert_true(np.array_equal(alone, after))
+        nt.assert_equal(len(set(alone)), count)
+        other = SlotStreams(9).slot("carnivores", 41).random_sample(count)
+        nt.assert_false(np.any(np.in1d(alone, other)))
+
+    @staticmethod
+    def test_slot_normal():
+        """
+        Tests that the normal numbers of slots have the given mean and
+        standard deviation
+        """
+        slots = SlotStreams(4)
+        values = np.array([slots.slot("herbivores", index).normal(8, 1.5)
+                           for index in range(4000)])
+        nt.assert_almost_equal(values.mean(), 8, delta=0.1)
+        nt.assert_almost_equal(values.std(), 1.5, delta=0.1)
+
+    @staticmethod
+    def test_plain_generator_is_shared():
+        """
+        Tests that animals share the generator when there are no slots
+        """
+        rng = np.random.RandomState(1)
+        nt.assert_is(slot_stream(rng, "herbivores", 5), rng)
+
+    @staticmethod
+    def test_common_random_numbers_match_migrants():
+        """
+        Tests that with common random numbers a higher "mu" only adds
+        migrants, and that the animals migrating in both runs go to the same
+        cells
+        """
+        destinations = []
+        for mu in (0.3, 0.6):
+            params = dict(Herbivore.params, mu=mu)
+            cell = Jungle(herbivores=[Herbivore(20, age, params=params)
+                                      for age in range(20)])
+            slots = RandomStreams(5, slots=True).stream(0, (1, 1),
+                                                        "migration")
+            neighbours = [((0, 1), 1.0), ((1, 0), 1.0), ((2, 1), 1.0)]
+            migrants = cell.migration_cycle_herb(neighbours, slots)
+            destinations.append({animal.age: destination
+                                 for destination, animal in migrants})
+        nt.assert_greater(len(destinations[1]), len(destinations[0]))
+        for age, destination in destinations[0].items():
+            nt.assert_equal(destinations[1][age], destination)
+
+    @staticmethod
+    def test_common_random_numbers_match_deaths():
+        """
+        Tests that with common random numbers a higher "omega" only adds
+        deaths, so every animal keeps its slot when others die
+        """
+        survivors = []
+        for omega in (0.4, 0.8):
+            params = dict(Herbivore.params, omega=omega)
+            cell = Jungle(herbivores=[Herbivore(20, age, params=params)
+                                      for age in range(40)])
+            slots = RandomStreams(5, slots=True).stream(0, (1, 1), "death")
+            dead = cell.death_cycle(slots)
+            nt.assert_greater(len(dead), 0)
+            survivors.append({animal.age for animal in cell.herbivores})
+        nt.assert_less(len(survivors[1]), len(survivors[0]))
+        nt.assert_true(survivors[1] <= survivors[0])
@@ -0,0 +1,54 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.scenario import build_simulation, run_scenario
+from biosim.animals import Herbivore
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestScenario(object):
+    spec = {"island_map": "OOOO\nOJSO\nOOOO", "seed": 3, "years": 5,
+            "ini_pop": [{'loc': (2, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5,
+                                  'weight': 20} for _ in range(10)]}],
+            "parameters": {"Herbivore": {"omega": 0, "gamma": 0},
+                           "J": {"fmax": 500}}}
+
+    def test_parameters_applied(self):
+        """
+        Tests that parameters in the specification only apply to the
+        simulation
+        """
+        sim = build_simulation(self.spec)
+        nt.assert_equal(sim.island.parameters.animal_params["Herbivore"]
+                        ["omega"], 0)
+        nt.assert_equal(sim.island.food_parameters()[0][1][1], 500)
+        nt.assert_not_equal(Herbivore.params["omega"], 0)
+
+    def test_yearly_totals(self):
+        """
+        Tests that the totals cover every year, and that runs are
+        reproducible
+        """
+        first = run_scenario(self.spec)
+        second = run_scenario(self.spec)
+        nt.assert_equal(len(first["herbivores"]), 5)
+        nt.assert_true(np.all(first["herbivores"] == 10))
+        nt.assert_true(np.array_equal(first["carnivores"],
+                                      second["carnivores"]))
+
+    def test_termination(self):
+        """
+        Tests that a run stops when its termination policy says so
+        """
+        spec = dict(self.spec, years=50,
+                    parameters={"Herbivore": {"omega": 1, "gamma": 0,
+                                              "mu": 0}},
+                    termination={"extinction": "all"})
+        result = run_scenario(spec)
+        nt.assert_equal(result["reason"], "extinction")
+        nt.assert_equal(len(result["herbivores"]), result["stopped"])
+        nt.assert_equal(result["herbivores"][-1], 0)
@@ -2,6 +2,10 @@
 
 import nose.tools as nt
 import numpy as np
+import pickle
+import subprocess
+import sys
+from nose.plugins.skip import SkipTest
 from biosim.simulation import BioSim
 from biosim.animals import Herbivore, Carnivore
 from biosim.landscape import Savannah, Jungle
@@ -133,3 +137,192 @@ class TestSimulation(object):
         nt.assert_equal(herbs, animals["Herbivores"])
         nt.assert_equal(carns, animals["Carnivores"])
         nt.assert_equal(total, animals["Herbivores"] + animals["Carnivores"])
+
+    def test_record_statistics(self):
+        """
+        Tests that yearly histograms are recorded while simulating
+        """
+        stats = self.sim.record_statistics(interval=2)
+        for _ in range(4):
+            self.sim.one_year()
+        years, counts, edges = stats.histogram("herbivores", "age")
+        nt.assert_equal(list(years), [2, 4])
+        nt.assert_equal(counts[-1].sum(), self.sim.animal()["Herbivores"])
+
+    def test_simulations_do_not_interfere(self):
+        """
+        Tests that interleaving years of two simulations gives the same
+        results as running them one after the other, and that the global
+        random state is not touched
+        """
+        np.random.seed(1)
+        expected = np.random.random_sample()
+        np.random.seed(1)
+        first = BioSim(self.geo, None, 11)
+        second = BioSim(self.geo, None, 22)
+        for _ in range(3):
+            first.one_year()
+            second.one_year()
+        nt.assert_equal(np.random.random_sample(), expected)
+
+        alone = BioSim(self.geo, None, 11)
+        for _ in range(3):
+            alone.one_year()
+        nt.assert_equal(alone.heatmap(alone.island.individuals()),
+                        first.heatmap(first.island.individuals()))
+
+    def test_add_animals(self):
+        """
+        Tests that adding animals from arrays gives the same island as
+        add_population
+        """
+        population = [{'loc': (2, 3),
+                       'pop': [{'species': 'Herbivore', 'age': age,
+                                'weight': 10 + age} for age in range(5)]},
+                      {'loc': (4, 4),
+                       'pop': [{'species': 'Carnivore', 'age': 3,
+                                'weight': 25},
+                               {'species': 'Herbivore', 'age': 1,
+                                'weight': 12}]}]
+        by_dicts = BioSim(self.geo, population, 3)
+        by_arrays = BioSim(self.geo, [], 3)
+        by_arrays.add_animals(
+            ['Herbivore'] * 5 + ['Carnivore', 'Herbivore'],
+            [(2, 3)] * 5 + [(4, 4), (4, 4)],
+            range(5) + [3, 1], [10, 11, 12, 13, 14, 25, 12])
+        for first, second in zip(by_dicts.island.island.flat,
+                                 by_arrays.island.island.flat):
+            for species in ('herbivores', 'carnivores'):
+                nt.assert_equal(
+                    [(a.age, a.weight, a.fitness, a.coordinates)
+                     for a in getattr(first, species)],
+                    [(a.age, a.weight, a.fitness, a.coordinates)
+                     for a in getattr(second, species)])
+        for _ in range(3):
+            by_dicts.one_year()
+            by_arrays.one_year()
+        nt.assert_equal(by_dicts.heatmap(by_dicts.island.individuals()),
+                        by_arrays.heatmap(by_arrays.island.individuals()))
+
+    def test_add_animals_invalid(self):
+        """
+        Tests that unknown species and locations off the map are refused
+        """
+        sim = BioSim(self.geo, [], 3)
+        nt.assert_raises(ValueError, sim.add_animals, ['Fox'], [(2, 2)],
+                         [1], [10])
+        nt.assert_raises(ValueError, sim.add_animals, [0], [(8, 2)], [1],
+                         [10])
+
+    def test_interface_properties(self):
+        """
+        Tests year, num_animals and num_animals_per_species
+        """
+        nt.assert_equal(self.sim.year, 0)
+        nt.assert_equal(self.sim.num_animals, 100)
+        nt.assert_equal(self.sim.num_animals_per_species,
+                        {'Herbivore': 80, 'Carnivore': 20})
+        self.sim.one_year()
+        nt.assert_equal(self.sim.year, 1)
+        animals = self.sim.animal()
+        nt.assert_equal(self.sim.num_animals_per_species,
+                        {'Herbivore': animals["Herbivores"],
+                         'Carnivore': animals["Carnivores"]})
+
+    def test_animal_distribution(self):
+        """
+        Tests the DataFrame of animals per cell
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise SkipTest('pandas is not installed')
+        distribution = self.sim.animal_distribution
+        nt.assert_equal(list(distribution.columns),
+                        ['Row', 'Col', 'Herbivore', 'Carnivore'])
+        nt.assert_equal(len(distribution), 49)
+        cell = distribution[(distribution.Row == 3) & (distribution.Col == 3)]
+        nt.assert_equal(cell.Herbivore.iloc[0], 80)
+        nt.assert_equal(distribution.Carnivore.sum(), 20)
+
+    def test_run(self):
+        """
+        Tests that a headless run gives the same years as one_year and
+        records what is asked for
+        """
+        stepped = BioSim(self.geo, None, 5)
+        totals = []
+        for _ in range(4):
+            stepped.one_year()
+            totals.append(stepped.num_animals_per_species['Herbivore'])
+        run = BioSim(self.geo, None, 5)
+        result = run.run(4, record=("totals", "counts", "food"))
+        nt.assert_equal(result["herbivores"].tolist(), totals)
+        nt.assert_equal(stepped.years_sim, 4)
+        nt.assert_equal(result["counts"].shape, (4, 2, 7, 7))
+        nt.assert_equal(result["food"].shape, (4, 7, 7))
+        np.testing.assert_array_equal(result["food"][-1], run.island.food())
+        nt.assert_equal(run.years_sim, 4)
+        nt.assert_raises(ValueError, run.run, 1, ("plots",))
+
+    def test_run_termination(self):
+        """
+        Tests that a headless run stops when its policy says so
+        """
+        sim = BioSim(self.geo, [], 5)
+        result = sim.run(10, termination={"extinction": "any"})
+        nt.assert_equal(len(result["herbivores"]), 10)
+        nt.assert_equal(result["stopped"], None)
+        result = sim.run(10, termination={"window": 2})
+        nt.assert_equal(len(result["herbivores"]), 4)
+        nt.assert_equal(result["reason"], "steady state")
+        nt.assert_equal(sim.years_sim, 14)
+
+    def test_lazy_startup(self):
+        """
+        Tests that importing the simulation does not import matplotlib, and
+        that the island is built when first used
+        """
+        loaded = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, biosim.simulation; '
+                                   'print("matplotlib" in sys.modules)'])
+        nt.assert_equal(loaded.strip(), 'False')
+        sim = BioSim(self.geo, None, 5)
+        nt.assert_is_none(sim._island)
+        sim.add_population([{'loc': (2, 2),
+                             'pop': [{'species': 'Herbivore', 'age': 1,
+                                      'weight': 10}]}])
+        nt.assert_equal(sim.num_animals_per_species,
+                        {'Herbivore': 151, 'Carnivore': 40})
+        nt.assert_equal(len(sim.island.island[1][1].herbivores), 1)
+
+    def test_map_checked_at_start(self):
+        """
+        Tests that invalid maps and parameter grids are refused when the
+        simulation is made, before the island is built
+        """
+        nt.assert_raises(ValueError, BioSim, 'OOO\nOXO\nOOO', [])
+        nt.assert_raises(ValueError, BioSim, 'OOO\nOJ\nOOO', [])
+        nt.assert_raises(ValueError, BioSim, 'OOO\nOJO\nOOO', [],
+                         fmax=np.ones((2, 3)))
+
+    def test_unpickle_eager_layout(self):
+        """
+        Tests that a simulation pickled with the island as "island" and
+        without an id counter can be restored and continued
+        """
+        sim = BioSim(self.geo, None, 5)
+        sim.run(2)
+        state = dict(sim.__dict__)
+        state["island"] = state.pop("_island")
+        for name in ("island_args", "pending_populations", "visualization"):
+            del state[name]
+        del state["island"].next_id
+        sim.__dict__ = state
+        restored = pickle.loads(pickle.dumps(sim, pickle.HIGHEST_PROTOCOL))
+        nt.assert_is_none(restored.visualization)
+        ids = [animal.id for cell in restored.island.island.flat
+               for animal in cell.herbivores + cell.carnivores]
+        nt.assert_equal(restored.island.next_id, max(ids) + 1)
+        restored.run(2)
+        nt.assert_equal(restored.year, 4)
@@ -0,0 +1,81 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+from biosim.simulation import BioSim
+from biosim.snapshot import export_snapshot, load_snapshot, SnapshotExporter
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestSnapshot(object):
+    geogr = """OOOOO
+               OJJSO
+               OJSDO
+               OOOOO"""
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                        for _ in range(5)]}]
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_export_and_load(self):
+        """
+        Tests that a snapshot holds every animal and is memory mapped
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=1)
+        sim.one_year()
+        sim.one_year()
+        path = os.path.join(self.directory, 'snapshot')
+        export_snapshot(sim, path)
+        manifest, columns = load_snapshot(path)
+        nt.assert_is_instance(columns["weight"], np.memmap)
+        nt.assert_equal(manifest["year"], sim.island.year)
+        expected = sorted(
+            (code, index, animal.age, animal.weight, animal.id)
+            for index, cell in enumerate(sim.island.island.flat)
+            for code, animals in enumerate((cell.herbivores,
+                                            cell.carnivores))
+            for animal in animals)
+        nt.assert_equal(manifest["animals"], len(expected))
+        stored = sorted(zip(columns["species"].tolist(),
+                            columns["cell"].tolist(),
+                            columns["age"].tolist(),
+                            columns["weight"].tolist(),
+                            columns["id"].tolist()))
+        nt.assert_equal(stored, expected)
+        np.testing.assert_array_equal(
+            columns["cell"], columns["row"] * 5 + columns["col"])
+
+    def test_empty_island(self):
+        """
+        Tests a snapshot without animals
+        """
+        sim = BioSim(self.geogr, [], seed=1)
+        path = os.path.join(self.directory, 'snapshot')
+        export_snapshot(sim, path)
+        manifest, columns = load_snapshot(path, mmap_mode=None)
+        nt.assert_equal(manifest["animals"], 0)
+        nt.assert_equal(len(columns["age"]), 0)
+
+    def test_exporter(self):
+        """
+        Tests that the recorder exports the chosen years
+        """
+        sim = BioSim(self.geogr, self.ini_pop, seed=1)
+        exporter = SnapshotExporter(self.directory, years=[1], interval=3)
+        sim.add_recorder(exporter)
+        for _ in range(4):
+            sim.one_year()
+        nt.assert_equal(sorted(os.listdir(self.directory)),
+                        ['year00001', 'year00003'])
@@ -0,0 +1,93 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.statistics import Histograms
+from biosim.island import Island
+from biosim.animals import Herbivore, Carnivore
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestHistograms(object):
+    geogr_simple = """OOO
+                      OJO
+                      OOO"""
+
+    def __init__(self):
+        self.island = None
+
+    def setup(self):
+        self.island = Island(self.geogr_simple)
+        self.island.build_map()
+        self.island.island[1][1].herbivores = [Herbivore(weight=20, age=5)
+                                               for _ in range(10)]
+        self.island.island[1][1].carnivores = [Carnivore(weight=150, age=90)
+                                               for _ in range(4)]
+
+    def test_counts_all_animals(self):
+        """
+        Tests that every animal is counted once for each attribute, in the
+        histogram or outside the range
+        """
+        stats = Histograms()
+        stats.update(self.island)
+        for species, number in (("herbivores", 10), ("carnivores", 4)):
+            for attribute in Histograms.attributes:
+                counts = stats.histogram(species, attribute)[1]
+                _, below, above = stats.out_of_range(species, attribute)
+                nt.assert_equal(counts.sum() + below.sum() + above.sum(),
+                                number)
+
+    def test_values_in_right_bin(self):
+        """
+        Tests that ages are counted in the correct bins, and that values
+        outside the range are counted apart
+        """
+        stats = Histograms(bins={"age": [0, 4, 8, 12],
+                                 "weight": [30, 100, 150]})
+        stats.update(self.island)
+        herb_counts = stats.histogram("herbivores", "age")[1]
+        carn_counts = stats.histogram("carnivores", "age")[1]
+        nt.assert_equal(list(herb_counts[0]), [0, 10, 0])
+        nt.assert_equal(list(carn_counts[0]), [0, 0, 0])
+        _, below, above = stats.out_of_range("carnivores", "age")
+        nt.assert_equal((below[0], above[0]), (0, 4))
+        _, below, above = stats.out_of_range("herbivores", "weight")
+        nt.assert_equal((below[0], above[0]), (10, 0))
+        weights = stats.histogram("carnivores", "weight")[1]
+        nt.assert_equal(list(weights[0]), [0, 4])
+
+    def test_interval(self):
+        """
+        Tests that histograms are only recorded every <interval> years
+        """
+        stats = Histograms(interval=3)
+        for year in range(7):
+            self.island.year = year
+            stats.update(self.island)
+        years, counts, edges = stats.histogram("herbivores", "weight")
+        nt.assert_equal(list(years), [0, 3, 6])
+        nt.assert_equal(counts.shape, (3, len(edges) - 1))
+
+    def test_empty_island(self):
+        """
+        Tests that histograms can be made when there are no animals
+        """
+        island = Island(self.geogr_simple)
+        island.build_map()
+        stats = Histograms()
+        stats.update(island)
+        nt.assert_equal(np.sum(stats.histogram("carnivores", "fitness")[1]), 0)
+
+    @staticmethod
+    def test_invalid_arguments():
+        """
+        Tests that invalid interval and bins raise ValueError
+        """
+        nt.assert_raises(ValueError, Histograms, 0)
+        nt.assert_raises(ValueError, Histograms, 1, {"height": [0, 1]})
+        nt.assert_raises(ValueError, Histograms, 1, {"age": [5]})
+        nt.assert_raises(ValueError, Histograms, 1, {"age": [0, 5, 5, 9]})
+        nt.assert_raises(ValueError, Histograms, 1, {"age": [0, 9, 5]})
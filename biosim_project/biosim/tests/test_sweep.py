@@ -0,0 +1,144 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+import biosim
+from biosim.sweep import (parameter_grid, scenario_key, ResultCache,
+                          run_cached, sweep)
+from biosim.scenario import run_scenario
+from biosim.simulation import BioSim
+from biosim.animals import Herbivore
+from biosim.landscape import Jungle
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestSweep(object):
+    spec = {"island_map": "OOOO\nOJSO\nOOOO", "seed": 3, "years": 6,
+            "ini_pop": [{'loc': (2, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5,
+                                  'weight': 20} for _ in range(10)]}]}
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parameter_grid(self):
+        """
+        Tests that the grid gives every combination
+        """
+        sets = parameter_grid({"Herbivore": {"mu": [0.1, 0.2],
+                                             "omega": [0.3, 0.4]},
+                               "J": {"fmax": [500]}})
+        nt.assert_equal(len(sets), 4)
+        nt.assert_in({"Herbivore": {"mu": 0.2, "omega": 0.3},
+                      "J": {"fmax": 500}}, sets)
+
+    def test_key(self):
+        """
+        Tests that the key depends on the seed but not on the years
+        """
+        longer = dict(self.spec, years=100)
+        other_seed = dict(self.spec, seed=4)
+        nt.assert_equal(scenario_key(self.spec), scenario_key(longer))
+        nt.assert_not_equal(scenario_key(self.spec), scenario_key(other_seed))
+
+    def test_key_resolves_parameters(self):
+        """
+        Tests that the key depends on the class parameters in effect, and
+        not on whether values equal to them are given in the specification
+        """
+        key = scenario_key(self.spec)
+        omega = Herbivore.params["omega"]
+        same = dict(self.spec, parameters={"Herbivore": {"omega": omega}})
+        nt.assert_equal(scenario_key(same), key)
+        Herbivore.set_parameters({"omega": (omega + 0.5) % 1})
+        try:
+            nt.assert_not_equal(scenario_key(self.spec), key)
+        finally:
+            Herbivore.set_parameters({"omega": omega})
+        fmax = Jungle.params["fmax"]
+        Jungle.set_parameters({"fmax": fmax + 1})
+        try:
+            nt.assert_not_equal(scenario_key(self.spec), key)
+        finally:
+            Jungle.set_parameters({"fmax": fmax})
+        nt.assert_equal(scenario_key(self.spec), key)
+
+    def test_key_default_map(self):
+        """
+        Tests that a missing map has the key of the default map
+        """
+        default = dict(self.spec, island_map=BioSim.default_map)
+        missing = dict(self.spec)
+        del missing["island_map"]
+        nt.assert_equal(scenario_key(missing), scenario_key(default))
+
+    def test_cached_runs_reused(self):
+        """
+        Tests that a cached run is returned without simulating again
+        """
+        run_cached((self.spec, self.directory))
+        cache = ResultCache(self.directory)
+        totals, simulation, _ = cache.load(self.spec)
+        cache.store(self.spec, totals * 0 - 1, simulation)
+        result = run_cached((self.spec, self.directory))
+        nt.assert_true(np.all(result["herbivores"] == -1))
+
+    def test_engine_version_in_key(self):
+        """
+        Tests that runs cached by another engine version are not reused
+        """
+        run_cached((self.spec, self.directory))
+        key = scenario_key(self.spec)
+        version = biosim.ENGINE_VERSION
+        biosim.ENGINE_VERSION = version + 1
+        try:
+            nt.assert_not_equal(scenario_key(self.spec), key)
+            nt.assert_is_none(ResultCache(self.directory).load(self.spec))
+        finally:
+            biosim.ENGINE_VERSION = version
+
+    def test_extended_run(self):
+        """
+        Tests that continuing a cached run gives the same result as running
+        all the years at once
+        """
+        run_cached((dict(self.spec, years=3), self.directory))
+        extended = run_cached((self.spec, self.directory))
+        direct = run_scenario(self.spec)
+        nt.assert_true(np.array_equal(extended["herbivores"],
+                                      direct["herbivores"]))
+
+    def test_sweep(self):
+        """
+        Tests that a sweep runs every parameter set and seed once
+        """
+        sets = parameter_grid({"Herbivore": {"omega": [0, 0.4]}})
+        runs = sweep(self.spec, sets, [1, 2], self.directory, processes=2)
+        nt.assert_equal(len(runs), 4)
+        nt.assert_equal(len(os.listdir(self.directory)), 4)
+        nt.assert_equal(runs[0]["parameters"], {"Herbivore": {"omega": 0}})
+        nt.assert_equal(runs[1]["seed"], 2)
+        nt.assert_equal(len(runs[3]["carnivores"]), 6)
+
+    def test_stopped_runs_not_extended(self):
+        """
+        Tests that a run stopped by its policy is not continued
+        """
+        spec = dict(self.spec, parameters={"Herbivore": {"omega": 1,
+                                                         "gamma": 0,
+                                                         "a_half": 0,
+                                                         "phi_age": 1}},
+                    termination={"extinction": "all"})
+        first = run_cached((spec, self.directory))
+        longer = run_cached((dict(spec, years=60), self.directory))
+        nt.assert_equal(first["reason"], "extinction")
+        nt.assert_equal(longer["stopped"], first["stopped"])
+        nt.assert_equal(len(longer["herbivores"]), first["stopped"])
@@ -0,0 +1,121 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.termination import TerminationPolicy, t_pvalue, welch_pvalues
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestTerminationPolicy(object):
+    @staticmethod
+    def test_any_extinction():
+        """
+        Tests that "any" stops when a species that was present dies out, but
+        not for a species that never was on the island
+        """
+        policy = TerminationPolicy(extinction="any")
+        nt.assert_false(policy.update(10, 0))
+        nt.assert_false(policy.update(12, 0))
+        policy = TerminationPolicy(extinction="any")
+        policy.update(10, 3)
+        nt.assert_true(policy.update(15, 0))
+        nt.assert_equal((policy.year, policy.reason), (2, "extinction"))
+
+    @staticmethod
+    def test_all_extinction():
+        """
+        Tests that "all" only stops when the island is empty
+        """
+        policy = TerminationPolicy(extinction="all")
+        nt.assert_false(policy.update(10, 0))
+        nt.assert_true(policy.update(0, 0))
+        nt.assert_equal(policy.year, 2)
+
+    @staticmethod
+    def test_steady_state():
+        """
+        Tests that the window test stops a run once it has been stationary
+        for two windows, and not while it grows
+        """
+        noise = np.random.RandomState(0).randint(-10, 11, 30)
+        policy = TerminationPolicy(window=10)
+        for herbivores in range(100, 1000, 100):
+            nt.assert_false(policy.update(herbivores, 10))
+        for herbivores in 1000 + noise:
+            if policy.update(herbivores, 10):
+                break
+        nt.assert_equal((policy.year, policy.reason), (25, "steady state"))
+
+    @staticmethod
+    def test_slow_trend_not_steady():
+        """
+        Tests that a slow trend in noisy totals does not stop the run, even
+        though the means of the windows differ by less than 5 %
+        """
+        years = np.arange(300)
+        noise = np.random.RandomState(0).normal(0, 10, 300)
+        totals = np.column_stack((1000 + years + noise, np.full(300, 50)))
+        policy = TerminationPolicy(window=20, tolerance=0.05)
+        nt.assert_false(policy.replay(totals))
+
+    @staticmethod
+    def test_significance_level():
+        """
+        Tests that the significance level decides whether a difference
+        between the windows counts
+        """
+        totals = [(100, 10), (110, 10), (105, 10), (120, 10), (112, 10),
+                  (125, 10)]
+        nt.assert_false(TerminationPolicy(window=3, alpha=0.05).replay(totals))
+        nt.assert_true(TerminationPolicy(window=3, alpha=0.01).replay(totals))
+
+    @staticmethod
+    def test_t_pvalue():
+        """
+        Tests p-values against critical values of Student's t distribution
+        """
+        for t, df in ((12.706, 1), (4.303, 2), (2.228, 10), (-2.042, 30)):
+            nt.assert_almost_equal(t_pvalue(t, df), 0.05, places=4)
+        nt.assert_equal(t_pvalue(0, 5), 1)
+        nt.assert_almost_equal(t_pvalue(40, 3), 3.438e-5, places=8)
+
+    @staticmethod
+    def test_welch_without_variation():
+        """
+        Tests that windows without variation differ only if their means do
+        """
+        np.testing.assert_array_equal(
+            welch_pvalues([[1, 2], [1, 2]], [[1, 3], [1, 3]]), [1, 0])
+
+    @staticmethod
+    def test_invalid_arguments():
+        """
+        Tests that invalid arguments raise ValueError
+        """
+        nt.assert_raises(ValueError, TerminationPolicy, extinction="some")
+        nt.assert_raises(ValueError, TerminationPolicy, window=1)
+        nt.assert_raises(ValueError, TerminationPolicy, alpha=1)
+
+    @staticmethod
+    def test_replay_and_outcome():
+        """
+        Tests that replaying earlier years stops as updating year by year,
+        and that the outcome is only given once stopped
+        """
+        policy = TerminationPolicy(extinction="all")
+        nt.assert_false(policy.replay([(10, 2), (5, 1)]))
+        nt.assert_is_none(policy.outcome)
+        nt.assert_true(policy.replay([(0, 0)]))
+        nt.assert_equal(policy.outcome, (3, "extinction"))
+
+    @staticmethod
+    def test_coerce():
+        """
+        Tests that dictionaries are made into policies
+        """
+        policy = TerminationPolicy.coerce({"window": 5})
+        nt.assert_equal(policy.window, 5)
+        nt.assert_is(TerminationPolicy.coerce(policy), policy)
+        nt.assert_is_none(TerminationPolicy.coerce(None))
@@ -0,0 +1,102 @@
+# -*- Utf-8 -*-
+
+import nose.tools as nt
+import numpy as np
+from biosim.tiles import TiledIsland, Tile, split_tiles
+from biosim.parameters import Parameters
+from biosim.simulation import BioSim
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestTiles(object):
+    geogr = """OOOOOOO
+               OJJSJJO
+               OJSSDJO
+               OJJMSJO
+               OJJJJJO
+               OOOOOOO"""
+    ini_pop = [{'loc': (3, 3),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(80)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(15)]},
+               {'loc': (5, 5),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(40)]}]
+
+    @staticmethod
+    def test_split_tiles():
+        """
+        Tests that tiles cover every cell exactly once
+        """
+        covered = np.zeros((7, 10), dtype=int)
+        for row_start, row_stop, col_start, col_stop in split_tiles((7, 10),
+                                                                    (3, 4)):
+            covered[row_start:row_stop, col_start:col_stop] += 1
+        nt.assert_true(np.all(covered == 1))
+
+    def test_identical_to_serial(self):
+        """
+        Tests that a tiled island gives exactly the same results as a serial
+        simulation with the same seed
+        """
+        serial = BioSim(self.geogr, self.ini_pop, 17)
+        tiled = TiledIsland(self.geogr, 17, tiles=(2, 3))
+        try:
+            tiled.add_population(self.ini_pop)
+            for _ in range(5):
+                herbs, carns = serial.heatmap(serial.one_year())
+                counts = tiled.one_year()
+                nt.assert_true(np.array_equal(counts[0], herbs))
+                nt.assert_true(np.array_equal(counts[1], carns))
+            nt.assert_true(np.array_equal(tiled.food, serial.island.food()))
+            cells = tiled.cells()
+            for coordinates, cell in serial.island.occupied_cells():
+                nt.assert_equal(
+                    [animal.weight for animal in cell.herbivores],
+                    [animal.weight for animal in cells[coordinates].herbivores])
+                for species in ("herbivores", "carnivores"):
+                    nt.assert_equal(
+                        [animal.id for animal in getattr(cell, species)],
+                        [animal.id for animal
+                         in getattr(cells[coordinates], species)])
+        finally:
+            tiled.close()
+
+    def test_only_border_crossings_sent(self):
+        """
+        Tests that a tile only returns migrants leaving it, and keeps the
+        migrants moving inside it
+        """
+        geography = self.geogr.replace(" ", "").split("\n")
+        region = split_tiles((6, 7), (1, 2))[0]
+        tile = Tile(geography, region, 3, Parameters(), None, None)
+        tile.add_animals([("Herbivore", 5, 40, (y, x), None)
+                          for y in range(1, 5) for x in range(1, 3)
+                          for _ in range(20)])
+        for cell in tile.island.island.flat:
+            cell.available_food_herb = 0
+        migrants = tile.migrate({})
+        nt.assert_true(migrants)
+        nt.assert_true(tile.moves)
+        nt.assert_false(any(tile.owns(migrant[2]) for migrant in migrants))
+        nt.assert_true(all(tile.owns(move[2]) for move in tile.moves))
+        nt.assert_equal(sum(len(cell.herbivores)
+                            for cell in tile.island.island.flat),
+                        160 - len(migrants) - len(tile.moves))
+        tile.second_half([])
+        nt.assert_equal(tile.moves, [])
+
+    def test_outside_island(self):
+        """
+        Tests that animals cannot be placed outside the island
+        """
+        tiled = TiledIsland(self.geogr, 1, tiles=(1, 2))
+        try:
+            nt.assert_raises(ValueError, tiled.add_population,
+                             [{'loc': (9, 9), 'pop': []}])
+            nt.assert_raises(ValueError, tiled.owner, (6, 0))
+        finally:
+            tiled.close()
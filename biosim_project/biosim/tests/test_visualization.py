@@ -0,0 +1,104 @@
+# -*- Utf-8 -*-
+
+import matplotlib
+matplotlib.use('Agg')
+import nose.tools as nt
+import numpy as np
+import os
+import shutil
+import tempfile
+import matplotlib.pyplot as plt
+from biosim.simulation import BioSim
+from biosim.visualization import Visualization
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+class TestVisualization(object):
+    geogr = """OOOOOOOOO
+               OJJSSJJSO
+               OJMDSJJSO
+               OOOOOOOOO"""
+
+    def setup(self):
+        self.visualization = Visualization(self.geogr)
+
+    def teardown(self):
+        plt.close('all')
+
+    def test_heatmap_shape(self):
+        """
+        Tests that the heatmaps have the shape of the map
+        """
+        for image in self.visualization.heatmaps:
+            nt.assert_equal(image.get_array().shape, (4, 9))
+
+    def test_update_reuses_artists(self):
+        """
+        Tests that updates change the data of the same artists, and that the
+        buffers grow
+        """
+        self.visualization.setup(2)
+        artists = list(self.visualization.artists)
+        images = len(self.visualization.fig.axes[3].images)
+        for year in range(1, 6):
+            counts = np.zeros((2, 4, 9), dtype=int)
+            counts[0, 1, 1] = 10 * year
+            counts[1, 2, 3] = year
+            self.visualization.update(year, counts)
+        nt.assert_equal(self.visualization.artists, artists)
+        nt.assert_equal(len(self.visualization.fig.axes[3].images), images)
+        nt.assert_greater_equal(len(self.visualization.years), 5)
+        herbivores = self.visualization.lines[0].get_ydata()
+        nt.assert_equal(list(herbivores), [10, 20, 30, 40, 50])
+        nt.assert_equal(self.visualization.heatmaps[1].get_array()[2, 3], 5)
+        nt.assert_greater_equal(self.visualization.line_axes.get_ylim()[1],
+                                50)
+        nt.assert_greater_equal(self.visualization.line_axes.get_xlim()[1],
+                                5)
+        nt.assert_equal(self.visualization.title.get_text(), 'Year:     5')
+
+
+class TestSimulateFigure(object):
+    geogr = """OOOOOOO
+               OJJJJJO
+               OJSMSJO
+               OOOOOOO"""
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+
+    def teardown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+        plt.close('all')
+
+    def test_simulate_twice(self):
+        """
+        Tests that simulate reuses the figure and saves images
+        """
+        sim = BioSim(self.geogr, None, 3)
+        sim.simulate(3, vis_steps=1, img_steps=2, ordinate=500)
+        fig = sim.fig
+        sim.simulate(2, vis_steps=1, img_steps=2, ordinate=500)
+        nt.assert_is(sim.fig, fig)
+        nt.assert_equal(sim.years_sim, 5)
+        nt.assert_equal(sim.visualization.length, 5)
+        nt.assert_equal(sorted(os.listdir(self.directory)),
+                        ['img00001.png', 'img00003.png'])
+
+    def test_options_of_later_calls(self):
+        """
+        Tests that the ordinate and colours of a later simulate call are used
+        """
+        sim = BioSim(self.geogr, None, 3)
+        sim.simulate(1, img_steps=100, ordinate=500)
+        sim.simulate(1, img_steps=100, ordinate=800, colour_herb='Greens',
+                     colour_carn='Reds')
+        visualization = sim.visualization
+        nt.assert_equal(visualization.line_axes.get_ylim()[1], 800)
+        nt.assert_equal(visualization.heatmaps[0].get_cmap().name, 'Greens')
+        nt.assert_equal(visualization.heatmaps[1].get_cmap().name, 'Reds')
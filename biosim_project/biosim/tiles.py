@@ -0,0 +1,407 @@
+# -*- Utf-8 -*-
+
+import multiprocessing
+import numpy as np
+from biosim.island import Island
+from biosim.animals import Herbivore, Carnivore
+from biosim.parameters import Parameters
+
+"""
+Tiles module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def split_tiles(shape, tiles):
+    """
+    Splits a map into rectangular tiles of about equal size.
+
+    :param shape: Shape (rows, columns) of the map
+    :param tiles: Number of tiles (down, across)
+    :return: List of owned regions as (row_start, row_stop, col_start,
+    col_stop), row by row
+    """
+    rows = np.linspace(0, shape[0], tiles[0] + 1).astype(int)
+    cols = np.linspace(0, shape[1], tiles[1] + 1).astype(int)
+    return [(rows[i], rows[i + 1], cols[j], cols[j + 1])
+            for i in range(tiles[0]) for j in range(tiles[1])
+            if rows[i] < rows[i + 1] and cols[j] < cols[j + 1]]
+
+
+class Tile(object):
+    """
+    Class object: Tile.
+    The part of a tiled island owned by one worker process. The tile holds
+    an Island made from its owned region and a halo of one cell around it.
+    Animals only live in the owned cells; the halo is only used to find
+    the cells animals can migrate to. Animals moving between owned cells
+    stay in the tile, only animals moving into the halo are sent to the
+    TiledIsland. The tile hands out no animal ids, they are given by the
+    TiledIsland.
+    """
+
+    def __init__(self, geography, region, seed, parameters, fmax, alpha):
+        """
+        :param geography: List of map rows for the whole island
+        :param region: Owned region (row_start, row_stop, col_start,
+        col_stop)
+        :param seed: Seed for the per-cell random streams
+        :param parameters: Parameters instance
+        :param fmax: Optional array with "fmax" for the whole island
+        :param alpha: Optional array with "alpha" for the whole island
+        """
+        self.region = region
+        self.width = len(geography[0])
+        row_start, row_stop, col_start, col_stop = region
+        self.top = max(row_start - 1, 0)
+        self.left = max(col_start - 1, 0)
+        bottom = min(row_stop + 1, len(geography))
+        right = min(col_stop + 1, len(geography[0]))
+        window = (slice(self.top, bottom), slice(self.left, right))
+        sub_map = "\n".join(row[self.left:right]
+                            for row in geography[self.top:bottom])
+        self.island = Island(sub_map,
+                             None if fmax is None else fmax[window],
+                             None if alpha is None else alpha[window],
+                             seed, parameters)
+        self.island.build_map()
+        self.island.offset = (self.top, self.left)
+        self.island.next_id = None
+        self.moves = []
+
+    def cell(self, coordinates):
+        """
+        :param coordinates: Global coordinates (y, x) of an owned cell
+        :return: The Landscape instance of the cell
+        """
+        return self.island.island[coordinates[0] - self.top][
+            coordinates[1] - self.left]
+
+    def add_animals(self, animals):
+        """
+        Places animals in owned cells.
+
+        :param animals: List of (species, age, weight, global coordinates,
+        id)
+        """
+        for species, age, weight, coordinates, animal_id in animals:
+            params = self.island.animal_params(species)
+            if species == "Herbivore":
+                animal = Herbivore(weight, age, coordinates, params=params)
+                self.cell(coordinates).herbivores.append(animal)
+            else:
+                animal = Carnivore(weight, age, coordinates, params=params)
+                self.cell(coordinates).carnivores.append(animal)
+            animal.id = animal_id
+
+    def owns(self, coordinates):
+        """
+        :param coordinates: Global coordinates (y, x)
+        :return: True if the cell is owned by the tile
+        """
+        row_start, row_stop, col_start, col_stop = self.region
+        return (row_start <= coordinates[0] < row_stop and
+                col_start <= coordinates[1] < col_stop)
+
+    def index(self, coordinates):
+        """
+        :param coordinates: Coordinates (y, x) on the tile's island
+        :return: Number of the cell on the whole island, counting row by row
+        """
+        return ((coordinates[0] + self.top) * self.width +
+                coordinates[1] + self.left)
+
+    def breed(self):
+        """
+        Runs growth, feeding and procreation.
+
+        :return: List of (cell number, newborns) for the cells with births,
+        row by row, see index
+        """
+        island = self.island
+        island.grow()
+        island.feeding()
+        island.procreation()
+        births = []
+        for coordinates, cell in island.occupied_cells():
+            newborns = sum(animal.id is None
+                           for animal in cell.herbivores + cell.carnivores)
+            if newborns:
+                births.append((self.index(coordinates), newborns))
+        return births
+
+    def migrate(self, first_ids):
+        """
+        Gives the newborns their ids and decides migration. Migrants are
+        removed from their cells. Migrants staying in the tile are kept
+        until second_half, the others are returned.
+
+        :param first_ids: Dictionary mapping the cell numbers given by breed
+        to the id of the first newborn in the cell. The newborns of a cell
+        get consecutive ids, herbivores before carnivores, as on a serial
+        island.
+        :return: List of migrants leaving the tile as (key, species, global
+        destination, animal). The key orders arrivals as serial migration
+        would.
+        """
+        island = self.island
+        for coordinates, cell in island.occupied_cells():
+            next_id = first_ids.get(self.index(coordinates))
+            if next_id is None:
+                continue
+            for animal in cell.herbivores + cell.carnivores:
+                if animal.id is None:
+                    animal.id = next_id
+                    next_id += 1
+        self.moves = []
+        migrants = []
+        for (y, x), cell in island.occupied_cells():
+            source = (y + self.top, x + self.left)
+            decisions = island.migration_decisions((y, x))
+            for species, moves, animals in zip(
+                    ("herbivores", "carnivores"), decisions,
+                    (cell.herbivores, cell.carnivores)):
+                for index, (destination, animal) in enumerate(moves):
+                    animal.has_moved = False
+                    if destination is None:
+                        continue
+                    animals.remove(animal)
+                    destination = (destination[0] + self.top,
+                                   destination[1] + self.left)
+                    animal.coordinates = destination
+                    migrant = ((source, index), species, destination, animal)
+                    if self.owns(destination):
+                        self.moves.append(migrant)
+                    else:
+                        migrants.append(migrant)
+        return migrants
+
+    def second_half(self, arrivals):
+        """
+        Places the migrants kept by migrate and the arriving migrants, all in
+        the order of their keys, then runs ageing, weightloss and death.
+
+        :param arrivals: List of migrants from other tiles with destination
+        in this tile
+        """
+        names = {"herbivores": "Herbivore", "carnivores": "Carnivore"}
+        migrants = sorted(self.moves + list(arrivals), key=lambda a: a[0])
+        self.moves = []
+        for _, species, destination, animal in migrants:
+            animal.params = self.island.animal_params(names[species])
+            getattr(self.cell(destination), species).append(animal)
+        island = self.island
+        island.aging()
+        island.loss_of_weight()
+        island.death()
+        island.year += 1
+
+    def write_state(self, counts, food):
+        """
+        Writes the number of animals and the food of the owned cells into
+        the shared arrays.
+
+        :param counts: Array of shape (2, rows, columns) for herbivores and
+        carnivores
+        :param food: Array of shape (rows, columns)
+        """
+        row_start, row_stop, col_start, col_stop = self.region
+        for y in range(row_start, row_stop):
+            for x in range(col_start, col_stop):
+                cell = self.cell((y, x))
+                counts[0, y, x] = len(cell.herbivores)
+                counts[1, y, x] = len(cell.carnivores)
+                food[y, x] = cell.available_food_herb
+
+
+def shared_views(shared_counts, shared_food, shape):
+    """
+    :return: numpy views (counts, food) of the shared memory arrays
+    """
+    counts = np.frombuffer(shared_counts, dtype=np.int32).reshape(
+        (2,) + tuple(shape))
+    food = np.frombuffer(shared_food, dtype=float).reshape(shape)
+    return counts, food
+
+
+def tile_worker(connection, tile, shared_counts, shared_food, shape):
+    """
+    Runs a tile in a worker process, following commands sent from the
+    TiledIsland through a connection.
+
+    :param connection: End of a multiprocessing Pipe
+    :param tile: Tile instance owned by this worker
+    :param shared_counts: Shared array with animal counts
+    :param shared_food: Shared array with food
+    :param shape: Shape of the whole island
+    """
+    counts, food = shared_views(shared_counts, shared_food, shape)
+    tile.write_state(counts, food)
+    while True:
+        command, argument = connection.recv()
+        if command == "add":
+            tile.add_animals(argument)
+            tile.write_state(counts, food)
+            connection.send(None)
+        elif command == "breed":
+            connection.send(tile.breed())
+        elif command == "migrate":
+            connection.send(tile.migrate(argument))
+        elif command == "second_half":
+            tile.second_half(argument)
+            tile.write_state(counts, food)
+            connection.send(None)
+        elif command == "cells":
+            connection.send([((y + tile.top, x + tile.left), cell)
+                             for (y, x), cell in tile.island.occupied_cells()])
+        elif command == "stop":
+            connection.close()
+            break
+
+
+class TiledIsland(object):
+    """
+    Class object: TiledIsland.
+    Splits an island into rectangular tiles, each simulated by its own worker
+    process. All phases run in the workers; only migrants crossing tile
+    borders are sent between processes (halo exchange), migrants moving
+    inside a tile never leave its worker. The number of animals and the
+    food in each cell are kept in shared memory and can be read without
+    asking the workers.
+    Results are identical to a seeded Island with the same seed and
+    parameters, animal ids included: ids are handed out here and sent to
+    the workers.
+        - <var> = TiledIsland(island_map, seed, tiles=(2, 2))
+        - <var>.add_population(population)
+        - <var>.one_year()
+        - <var>.close() stops the workers
+    """
+
+    def __init__(self, island_map, seed, tiles=(2, 2), parameters=None,
+                 fmax=None, alpha=None):
+        """
+        :param island_map: Map of island as string of "biomes"
+        :param seed: Seed for the per-cell random streams
+        :param tiles: Number of tiles (down, across)
+        :param parameters: Optional Parameters instance, default is a copy of
+        the class parameters
+        :param fmax: Optional array with "fmax" for each cell
+        :param alpha: Optional array with "alpha" for each cell
+        """
+        geography = island_map.replace(" ", "").split("\n")
+        if len(set(len(row) for row in geography)) != 1:
+            raise ValueError('All rows of the map must have the same length!')
+        self.shape = (len(geography), len(geography[0]))
+        if parameters is None:
+            parameters = Parameters()
+        if fmax is not None:
+            fmax = np.asarray(fmax, dtype=float)
+        if alpha is not None:
+            alpha = np.asarray(alpha, dtype=float)
+
+        size = self.shape[0] * self.shape[1]
+        self.shared_counts = multiprocessing.RawArray('i', 2 * size)
+        self.shared_food = multiprocessing.RawArray('d', size)
+        self.counts, self.food = shared_views(self.shared_counts,
+                                              self.shared_food, self.shape)
+        self.year = 0
+        self.next_id = 0
+
+        self.owners = np.zeros(self.shape, dtype=int)
+        self.connections = []
+        self.workers = []
+        for index, region in enumerate(split_tiles(self.shape, tiles)):
+            row_start, row_stop, col_start, col_stop = region
+            self.owners[row_start:row_stop, col_start:col_stop] = index
+            tile = Tile(geography, region, seed, parameters, fmax, alpha)
+            connection, worker_end = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=tile_worker, args=(worker_end, tile, self.shared_counts,
+                                          self.shared_food, self.shape))
+            worker.daemon = True
+            worker.start()
+            self.connections.append(connection)
+            self.workers.append(worker)
+
+    def owner(self, coordinates):
+        """
+        :param coordinates: Global coordinates (y, x)
+        :return: Index of the tile owning the cell
+        """
+        if not (0 <= coordinates[0] < self.shape[0] and
+                0 <= coordinates[1] < self.shape[1]):
+            raise ValueError('Coordinates {} are outside the island!'
+                             .format(coordinates))
+        return self.owners[coordinates[0], coordinates[1]]
+
+    def add_population(self, population):
+        """
+        Adds given population to cells, see BioSim.add_population.
+
+        :param population: list of populations
+        """
+        animals = [[] for _ in self.connections]
+        for species in population:
+            coordinates = tuple(n - 1 for n in species['loc'])
+            owner = self.owner(coordinates)
+            for ani in species['pop']:
+                animals[owner].append(
+                    (ani['species'], ani['age'], ani['weight'], coordinates,
+                     self.next_id))
+                self.next_id += 1
+        for connection, tile_animals in zip(self.connections, animals):
+            connection.send(("add", tile_animals))
+        for connection in self.connections:
+            connection.recv()
+
+    def one_year(self):
+        """
+        Simulates one year on all tiles.
+
+        :return: Array of shape (2, rows, columns) with the number of
+        herbivores and carnivores in each cell
+        """
+        for connection in self.connections:
+            connection.send(("breed", None))
+        births = sorted(birth for connection in self.connections
+                        for birth in connection.recv())
+        first_ids = {}
+        for cell, newborns in births:
+            first_ids[cell] = self.next_id
+            self.next_id += newborns
+        for connection in self.connections:
+            connection.send(("migrate", first_ids))
+        arrivals = [[] for _ in self.connections]
+        for connection in self.connections:
+            for migrant in connection.recv():
+                arrivals[self.owner(migrant[2])].append(migrant)
+        for connection, tile_arrivals in zip(self.connections, arrivals):
+            connection.send(("second_half", tile_arrivals))
+        for connection in self.connections:
+            connection.recv()
+        self.year += 1
+        return self.counts.copy()
+
+    def cells(self):
+        """
+        Collects the occupied cells from all workers.
+
+        :return: Dictionary mapping global coordinates to Landscape instances
+        """
+        for connection in self.connections:
+            connection.send(("cells", None))
+        cells = {}
+        for connection in self.connections:
+            cells.update(connection.recv())
+        return cells
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        for connection in self.connections:
+            connection.send(("stop", None))
+        for worker in self.workers:
+            worker.join()
@@ -0,0 +1,207 @@
+# -*- Utf-8 -*-
+
+import numpy as np
+
+"""
+Visualization module
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+MAP_COLOURS = {'O': (0.0, 0.0, 1.0),
+               'M': (0.5, 0.5, 0.5),
+               'J': (0.0, 0.6, 0.0),
+               'S': (0.5, 1.0, 0.5),
+               'D': (1.0, 1.0, 0.5)}
+LANDSCAPES = ('Ocean', 'Mountain', 'Jungle', 'Savannah', 'Desert')
+
+
+class Visualization(object):
+    """
+    Class object: Visualization.
+    Draws the map, the number of herbivores and carnivores over the years
+    and a heatmap of each species. The figure and its artists are made
+    once, and each year only the data of the heatmaps, lines and title is
+    changed and drawn over a saved background (blitting). The yearly totals
+    are kept in buffers that double in size when full. The whole figure is
+    only redrawn when the axes must grow, or the window is resized.
+        - <var> = Visualization(island_map)
+        - <var>.setup(last_year, ymax, colour_herb, colour_carn) before
+          each simulate call
+        - <var>.update(year, counts) for a year to show
+    """
+
+    def __init__(self, island_map, ymax=None, colour_herb=None,
+                 colour_carn=None, cmax=None):
+        """
+        :param island_map: Map of the island as string
+        :param ymax: Top of the population axis, default grows as needed
+        :param colour_herb: Colour map of the herbivore heatmap
+        :param colour_carn: Colour map of the carnivore heatmap
+        :param cmax: Top of the heatmap colour scales, default is the most
+        animals in a cell each year
+        """
+        import matplotlib.pyplot as plt
+        self.plt = plt
+        rows = island_map.replace(" ", "").split()
+        self.shape = (len(rows), len(rows[0]))
+        self.ymax = ymax
+        self.cmax = cmax
+        self.years = np.zeros(0, dtype=int)
+        self.totals = np.zeros((0, 2), dtype=int)
+        self.length = 0
+        self.background = None
+
+        self.fig = plt.figure()
+        map_axes = self.fig.add_subplot(2, 2, 1)
+        map_axes.set_title('Rossum Island')
+        map_axes.imshow([[MAP_COLOURS[cell] for cell in row]
+                         for row in rows], interpolation='nearest')
+        self.ticks(map_axes, 4)
+        legend = self.fig.add_axes([0.0, 0.5, 0.025, 0.5])
+        legend.axis('off')
+        for index, name in enumerate(LANDSCAPES):
+            legend.add_patch(plt.Rectangle((0., index * 0.2), 0.3, 0.1,
+                                           edgecolor='none',
+                                           facecolor=MAP_COLOURS[name[0]]))
+            legend.text(0.35, index * 0.2, name, transform=legend.transAxes)
+
+        self.line_axes = self.fig.add_subplot(2, 2, 2)
+        self.line_axes.grid()
+        self.line_axes.set_xlim(0, 1)
+        self.line_axes.set_ylim(0, ymax or 1)
+        self.title = self.line_axes.set_title('')
+        self.lines = [self.line_axes.plot([], [], style, label=label)[0]
+                      for style, label in (('g-', 'Herbivores'),
+                                           ('r-', 'Carnivores'))]
+        self.line_axes.legend(loc=1, prop={'size': 7})
+
+        self.heatmaps = []
+        for position, name, colours in ((3, 'Herbivores', colour_herb),
+                                        (4, 'Carnivores', colour_carn)):
+            axes = self.fig.add_subplot(2, 2, position)
+            axes.set_title(name)
+            self.ticks(axes, 2)
+            image = axes.imshow(np.zeros(self.shape), interpolation='nearest',
+                                cmap=colours, vmin=0, vmax=cmax or 1)
+            self.fig.colorbar(image, ax=axes, orientation='horizontal',
+                              ticks=[])
+            self.heatmaps.append(image)
+
+        self.artists = self.lines + self.heatmaps + [self.title]
+        for artist in self.artists:
+            artist.set_animated(True)
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def ticks(self, axes, step):
+        """
+        Labels every <step> row and column of a map, counting from 1.
+        """
+        axes.set_xticks(range(0, self.shape[1], step))
+        axes.set_xticklabels(range(1, 1 + self.shape[1], step))
+        axes.set_yticks(range(0, self.shape[0], step))
+        axes.set_yticklabels(range(1, 1 + self.shape[0], step))
+
+    def on_draw(self, event):
+        """
+        Saves the background after the figure is drawn in full, and draws
+        the animated artists on it.
+        """
+        canvas = self.fig.canvas
+        if hasattr(canvas, 'copy_from_bbox'):
+            self.background = canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        """
+        Draws the artists that change every year.
+        """
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+
+    def setup(self, last_year, ymax=None, colour_herb=None,
+              colour_carn=None):
+        """
+        Makes room for the years up to last_year, applies the axis and
+        colour options of this call and shows the figure.
+
+        :param last_year: Last year that will be shown
+        :param ymax: Top of the population axis, default grows as needed
+        :param colour_herb: Colour map of the herbivore heatmap
+        :param colour_carn: Colour map of the carnivore heatmap
+        """
+        self.reserve(last_year)
+        self.ymax = ymax
+        if ymax is not None:
+            self.line_axes.set_ylim(0, ymax)
+        for image, colours in zip(self.heatmaps, (colour_herb, colour_carn)):
+            image.set_cmap(colours)
+        if self.line_axes.get_xlim()[1] < last_year:
+            self.line_axes.set_xlim(0, last_year)
+        self.plt.show(block=False)
+        self.fig.canvas.draw()
+
+    def reserve(self, length):
+        """
+        Grows the buffers of the totals to at least length years, doubling
+        their size.
+        """
+        if length > len(self.years):
+            size = max(length, 2 * len(self.years))
+            years = np.zeros(size, dtype=int)
+            totals = np.zeros((size, 2), dtype=int)
+            years[:self.length] = self.years[:self.length]
+            totals[:self.length] = self.totals[:self.length]
+            self.years, self.totals = years, totals
+
+    def update(self, year, counts):
+        """
+        Shows a year.
+
+        :param year: The year
+        :param counts: Number of herbivores and carnivores in each cell, an
+        array of shape (2, rows, columns), see Island.counts
+        """
+        self.reserve(self.length + 1)
+        self.years[self.length] = year
+        self.totals[self.length] = counts.sum(axis=(1, 2))
+        self.length += 1
+        for index, line in enumerate(self.lines):
+            line.set_data(self.years[:self.length],
+                          self.totals[:self.length, index])
+        for image, species_counts in zip(self.heatmaps, counts):
+            image.set_data(species_counts)
+            if self.cmax is None:
+                image.set_clim(0, max(species_counts.max(), 1))
+        self.title.set_text('Year: {:5}'.format(year))
+
+        redraw = False
+        top = self.totals[self.length - 1].max()
+        if self.ymax is None and top > self.line_axes.get_ylim()[1]:
+            self.line_axes.set_ylim(0, 1.5 * top)
+            redraw = True
+        if year > self.line_axes.get_xlim()[1]:
+            self.line_axes.set_xlim(0, 2 * year)
+            redraw = True
+        canvas = self.fig.canvas
+        if redraw or self.background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self.background)
+            self.draw_artists()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def save(self, path):
+        """
+        Saves the figure as an image, with the artists of the last year.
+        The figure is redrawn after, as saving replaces the background.
+        """
+        for artist in self.artists:
+            artist.set_animated(False)
+        self.fig.savefig(path)
+        for artist in self.artists:
+            artist.set_animated(True)
+        self.fig.canvas.draw()
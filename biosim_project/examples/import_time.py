@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+import time
+
+"""
+Measures the time of "python -c 'import biosim.simulation'" in fresh
+processes, and checks it against the import-time budget of README.rst
+"""
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+BUDGET = 0.15
+REPEATS = 20
+HEAVY_MODULES = ('matplotlib', 'pandas', 'multiprocessing')
+
+
+def import_time(statement, repeats=REPEATS):
+    """
+    :param statement: Python statement run in each new process
+    :param repeats: Number of processes
+    :return: Median wall time in seconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', statement])
+        times.append(time.time() - start)
+    return sorted(times)[len(times) // 2]
+
+
+if __name__ == '__main__':
+    interpreter = import_time('pass')
+    numpy = import_time('import numpy')
+    simulation = import_time('import biosim.simulation')
+    loaded = subprocess.check_output(
+        [sys.executable, '-c', 'import sys, biosim.simulation; '
+                               'print(" ".join(sorted(set(name.split(".")[0] '
+                               'for name in sys.modules))))']).split()
+    heavy = [name for name in HEAVY_MODULES if name in loaded]
+    print('python -c pass:                   {:.3f} s'.format(interpreter))
+    print('python -c "import numpy":         {:.3f} s'.format(numpy))
+    print('python -c "import biosim.simulation": {:.3f} s (budget {:.3f} s)'
+          .format(simulation, BUDGET))
+    if heavy:
+        print('Imported at startup: {}'.format(', '.join(heavy)))
+    if simulation > BUDGET or heavy:
+        sys.exit(1)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import textwrap
+
+from biosim.simulation import BioSim
+
+"""
+Benchmark of parallel execution against serial simulation.
+
+Runs the same seeded simulation serially and with worker processes after
+a warm-up that lets the population grow, and prints the wall time of each
+run and the CPU time used by the main process. The results are identical,
+so the runs only differ in speed.
+
+    python parallel_benchmark.py [years] [processes ...]
+"""
+
+__author__ = 'Marius Kristiansen, Kristian Frafjord'
+__email__ = 'mariukri@nmbu.no, krfr@nmbu.no'
+
+
+def warmed_up(geogr, warm_up):
+    """
+    :return: BioSim after <warm_up> years
+    """
+    ini_herbs = [{'loc': (10, 10),
+                  'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                          for _ in xrange(150)]},
+                 {'loc': (3, 3),
+                  'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                          for _ in xrange(150)]}]
+    sim = BioSim(island_map=geogr, ini_pop=ini_herbs, seed=123456)
+    sim.run(warm_up)
+    return sim
+
+
+def timed(sim, years, processes=None):
+    """
+    Runs <years> years and returns (wall time, main process CPU time, final
+    counts).
+    """
+    if processes is not None:
+        sim.use_parallel(processes)
+    wall, cpu = time.time(), time.clock()
+    totals = sim.run(years)
+    wall, cpu = time.time() - wall, time.clock() - cpu
+    sim.close_parallel()
+    return wall, cpu, (totals["herbivores"][-1], totals["carnivores"][-1])
+
+
+if __name__ == '__main__':
+    geogr = """OOOOOOOOOOOOOOOOOOOOO
+               OOOOOOOOSMMMMJJJJJJJO
+               OSSSSSJJJJMMJJJJJJJOO
+               OSSSSSSSSSMMJJJJJJOOO
+               OSSSSSJJJJJJJJJJJJOOO
+               OSSSSSJJJDDJJJSJJJOOO
+               OSSJJJJJDDDJJJSSSSOOO
+               OOSSSSJJJDDJJJSOOOOOO
+               OSSSJJJJJDDJJJJJJJOOO
+               OSSSSJJJJDDJJJJOOOOOO
+               OOSSSSJJJJJJJJOOOOOOO
+               OOOSSSSJJJJJJJOOOOOOO
+               OOOOOOOOOOOOOOOOOOOOO"""
+    geogr = textwrap.dedent(geogr)
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    counts = [int(n) for n in sys.argv[2:]] or [2, 4]
+
+    base = warmed_up(geogr, 60)
+    print 'Animals after warm-up: {}'.format(base.num_animals)
+    serial_wall, serial_cpu, serial_counts = timed(base.fork(), years)
+    print '{:>10} {:8.2f} s wall {:8.2f} s main'.format(
+        'serial', serial_wall, serial_cpu)
+    for processes in counts:
+        wall, cpu, final = timed(base.fork(), years, processes)
+        if final != serial_counts:
+            raise RuntimeError('Parallel results differ from serial!')
+        print '{:>10} {:8.2f} s wall {:8.2f} s main {:6.2f} x'.format(
+            'proc{}'.format(processes), wall, cpu, serial_wall / wall)